@@ -2,6 +2,7 @@
 
 import numpy as np
 from gui.logger_gui import Logger
+from calib import utils as calib_utils
 
 def project_point_cloud_points(data_dict: dict, cfg_dict: dict):
     """
@@ -30,24 +31,15 @@ def project_point_cloud_points(data_dict: dict, cfg_dict: dict):
         logger.log('[algo->camera.pyproject_point_cloud_points]: current_calib_data not found in data_dict', Logger.ERROR)
         return
     
-    # Extract required calibration data
-    Tr_velo_to_cam = data_dict['current_calib_data']['Tr_velo_to_cam']
-    
-    if 'R0_rect' in data_dict['current_calib_data']:
-        R0_rect = data_dict['current_calib_data']['R0_rect']
-    else:
-        R0_rect = np.eye(4,4)
-    
-    P2 = data_dict['current_calib_data']['P2']
-    
-    # Convert lidar coordinates to homogeneous coordinates
-    lidar_coords_Nx4 = np.hstack((data_dict['current_point_cloud_numpy'][:,:3], np.ones((data_dict['current_point_cloud_numpy'].shape[0], 1))))
+    # Extract the lidar to pixel transform, it is precomputed once per unique calibration
+    Tr_velo_to_pixel = calib_utils.get_velo_to_pixel_transform(data_dict['current_calib_data'])
     
     # Project lidar points onto the image plane
-    pixel_coords = P2 @ R0_rect @ Tr_velo_to_cam @ lidar_coords_Nx4.T
+    lidar_coords_Nx3 = data_dict['current_point_cloud_numpy'][:, :3]
+    pixel_coords = Tr_velo_to_pixel[:, :3] @ lidar_coords_Nx3.T + Tr_velo_to_pixel[:, 3:]
     
     # Compute lidar depths
-    lidar_depths = np.linalg.norm(lidar_coords_Nx4[:, :3], axis=1)
+    lidar_depths = np.linalg.norm(lidar_coords_Nx3, axis=1)
     
     # Filter out points that are behind the camera
     front_pixel_coords = pixel_coords[:, pixel_coords[2] > 0]
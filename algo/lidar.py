@@ -6,6 +6,7 @@ import sys
 import numpy as np
 
 from gui.logger_gui import Logger
+from calib import utils as calib_utils
 
 def crop(data_dict: dict, cfg_dict: dict):
     """
@@ -29,18 +30,37 @@ def crop(data_dict: dict, cfg_dict: dict):
         return
     
     # get point cloud and crop limits
+    from pcd.utils import get_crop_mask, rasterize_bev_polygons
     pcd = data_dict['current_point_cloud_numpy']
-    min_xyz = cfg_dict['proc']['lidar']['crop']['min_xyz']
-    max_xyz = cfg_dict['proc']['lidar']['crop']['max_xyz']
+    crop_cfg = cfg_dict['proc']['lidar']['crop']
+    min_xyz = crop_cfg['min_xyz']
+    max_xyz = crop_cfg['max_xyz']
     
-    # create conditions for cropping
-    x_condition = np.logical_and(min_xyz[0] <= pcd[:, 0], pcd[:, 0] <= max_xyz[0])
-    y_condition = np.logical_and(min_xyz[1] <= pcd[:, 1], pcd[:, 1] <= max_xyz[1])
-    z_condition = np.logical_and(min_xyz[2] <= pcd[:, 2], pcd[:, 2] <= max_xyz[2])
+    # rasterize the bird's-eye view region of interest polygons once, they are rasterized again only if the configuration changes
+    roi_polygons = crop_cfg.get('roi_polygons', None)
+    roi_cell_size = crop_cfg.get('roi_cell_size', 0.1)
+    roi_grid = None
+    if roi_polygons:
+        roi_key = (str(roi_polygons), roi_cell_size, tuple(min_xyz[:2]), tuple(max_xyz[:2]))
+        if data_dict.get('crop_roi_grid_key', None) != roi_key:
+            data_dict['crop_roi_grid'] = rasterize_bev_polygons(roi_polygons, min_xyz, max_xyz, roi_cell_size)
+            data_dict['crop_roi_grid_key'] = roi_key
+        roi_grid = data_dict['crop_roi_grid']
+    
+    # compute the mask in a single pass using scratch buffers that are kept between frames
+    if 'crop_buffers' not in data_dict: data_dict['crop_buffers'] = dict()
+    mask = get_crop_mask(pcd, min_xyz, max_xyz, roi_grid, roi_cell_size, data_dict['crop_buffers'])
     
     # Update the point cloud in data_dict
-    data_dict['current_point_cloud_numpy'] = pcd[x_condition & y_condition & z_condition]
-    data_dict['current_point_cloud_point_colors'] = np.ones((data_dict['current_point_cloud_numpy'].shape[0], 3), dtype=np.float32)
+    data_dict['current_point_cloud_numpy'] = np.compress(mask, pcd, axis=0)
+    
+    # the default colors are a writable view into a buffer that is only reallocated when the point cloud grows, it is reset to ones
+    # every frame so that colors painted in-place by later processes do not leak into the next frame
+    num_points = data_dict['current_point_cloud_numpy'].shape[0]
+    if 'crop_colors_buffer' not in data_dict or data_dict['crop_colors_buffer'].shape[0] < num_points:
+        data_dict['crop_colors_buffer'] = np.empty((max(num_points, 1), 3), dtype=np.float32)
+    data_dict['current_point_cloud_point_colors'] = data_dict['crop_colors_buffer'][:num_points]
+    data_dict['current_point_cloud_point_colors'].fill(1.0)
     
 def project_image_pixel_colors(data_dict: dict, cfg_dict: dict):
     """
@@ -69,18 +89,14 @@ def project_image_pixel_colors(data_dict: dict, cfg_dict: dict):
         logger.log('[algo->lidar.py->project_image_pixel_colors]: current_calib_data not found in data_dict', Logger.ERROR)
         return
     
-    # Extract required data
+    # Extract required data, the lidar to pixel transform is precomputed once per unique calibration
     img_np = data_dict['current_image_numpy']
-    Tr_velo_to_cam = data_dict['current_calib_data']['Tr_velo_to_cam']
-    R0_rect = data_dict['current_calib_data']['R0_rect']
-    P2 = data_dict['current_calib_data']['P2']
+    Tr_velo_to_pixel = calib_utils.get_velo_to_pixel_transform(data_dict['current_calib_data'])
     
     data_dict['current_point_cloud_point_colors'] = np.ones((data_dict['current_point_cloud_numpy'].shape[0], 3), dtype=np.float32) # N X 3(RGB)
-    # Convert lidar coordinates to homogeneous coordinates
-    lidar_coords_Nx4 = np.hstack((data_dict['current_point_cloud_numpy'][:,:3], np.ones((data_dict['current_point_cloud_numpy'].shape[0], 1))))
     
     # Project lidar points onto the image plane
-    pixel_coords = P2 @ R0_rect @ Tr_velo_to_cam @ lidar_coords_Nx4.T
+    pixel_coords = Tr_velo_to_pixel[:, :3] @ data_dict['current_point_cloud_numpy'][:, :3].T + Tr_velo_to_pixel[:, 3:]
     
     # Normalize pixel coordinates
     normalized_pixel_coords_2d = pixel_coords[:2] / (pixel_coords[2] + 1e-8)
@@ -116,41 +132,80 @@ def BGFilterSTDF(data_dict: dict, cfg_dict: dict):
     skip_frames_key = f'{algo_name}_skip_frames'
     params_key = f'{algo_name}_params'
     filter_key = f'{algo_name}_filter'
+    accumulator_key = f'{algo_name}_accumulator'
+    last_update_key = f'{algo_name}_last_update_frame_index'
 
     # get params
     params = cfg_dict['proc']['lidar']['BGFilterSTDF'].copy()
-    live_editable_params = ['background_density_threshold'] # list of params that can be live edited and do not require re-computation of filter
+    live_editable_params = ['background_density_threshold', 'online_decay', 'online_save_interval', 'save_filter'] # list of params that can be live edited and do not require re-computation of filter
+
+    # path of the saved filter, relative paths are relative to the data path
+    filter_path = params.get('filter_path', os.path.join('cache', 'BGFilterSTDF', 'filter.npz'))
+    if not os.path.isabs(filter_path) and (params.get('save_filter', False) or params.get('load_filter', False)): filter_path = os.path.join(cfg_dict['data']['path'], filter_path)
     
     # generate keys for query and skip frames
     all_query_frames_keys = [f'{query_frames_key}_{i}' for i in range(params['number_of_frame_gather_iters'])]
-    all_skip_frames_keys = [f'{skip_frames_key}_{i}' for i in range(params['number_of_skip_frames_after_each_iter'])]
+    all_skip_frames_keys = [f'{skip_frames_key}_{i}' for i in range(params['number_of_frame_gather_iters'])]
 
     # generate filter if not exists
     if filter_key not in data_dict:
         data_dict[params_key] = params
 
-        # get util functions
-        from algo.utils import gather_point_clouds, skip_frames, combine_gathers
-        from pcd.utils import get_fixed_sized_point_cloud
+        # cartesian bins are created by the filters themselves, spherical bins are created here
+        from algo.non_nn.STDF import STDFFilter, SphericalBins, are_bins_equal
+        if params.get('binning', 'cartesian') == 'spherical':
+            bins = SphericalBins(params['lidar_range_in_unit_length'], params['min_range_in_unit_length'], params['number_of_range_bins'], params['number_of_azimuth_bins'], params['vertical_fov'], params['number_of_elevation_bins'])
+        else: bins = None
+
+        # load a previously saved filter if it was computed with the same bins
+        loaded_filter = None
+        if params.get('load_filter', False):
+            if os.path.exists(filter_path):
+                loaded_filter, loaded_params = STDFFilter.load(filter_path)
+                expected_bins = bins if bins is not None else np.linspace(-params['lidar_range_in_unit_length'], params['lidar_range_in_unit_length'], int(params['lidar_range_in_unit_length'] * params['bins_per_unit_length'])+1)
+                if not are_bins_equal(loaded_filter.bins, expected_bins):
+                    logger.log(f'[algo->lidar.py->BGFilterSTDF]: Saved filter {filter_path} was computed with different bins (binning: {loaded_params.get("binning", "cartesian")}), ignoring it', Logger.WARNING)
+                    loaded_filter = None
+                else: logger.log(f'[algo->lidar.py->BGFilterSTDF]: Filter loaded from {filter_path}', Logger.INFO)
+            else: logger.log(f'[algo->lidar.py->BGFilterSTDF]: Saved filter {filter_path} not found, generating a new one', Logger.WARNING)
+
+        # in online mode the filter is updated from every frame, so it is usable immediately and no frames are gathered
+        if params.get('online', False):
+            from algo.non_nn.STDF import OnlineSTDF
+            data_dict[filter_key] = OnlineSTDF(params['lidar_range_in_unit_length'], params['bins_per_unit_length'], params['online_decay'], params['online_prune_density'], bins)
+            if loaded_filter is not None: data_dict[filter_key].set_sparse_densities(*loaded_filter.get_sparse_densities())
+            logger.log(f'[algo->lidar.py->BGFilterSTDF]: Online filter created', Logger.INFO)
+            data_dict['BGFilterSTDF_set'] = True
+        # a loaded filter bypasses the gather and skip phase
+        elif loaded_filter is not None:
+            data_dict[filter_key] = loaded_filter
+            data_dict['BGFilterSTDF_set'] = True
+        else:
+            # get util functions
+            from algo.utils import accumulate_point_clouds, skip_frames
+            from algo.non_nn.STDF import STDFAccumulator
+            from pcd.utils import get_fixed_sized_point_cloud
         
-        # gather frames
-        for i in range(params['number_of_frame_gather_iters']):
-            gathering_done = gather_point_clouds(data_dict, cfg_dict, all_query_frames_keys[i], params['number_of_frames_in_each_gather_iter'])
-            if not gathering_done: return
-            skipping_done = skip_frames(data_dict, cfg_dict, all_skip_frames_keys[i], params['number_of_skip_frames_after_each_iter'])
-            if not skipping_done: return
-            
-        # combine gathered frames
-        combine_gathers(data_dict, cfg_dict, query_frames_key, all_query_frames_keys)
-        assert len(data_dict[query_frames_key]) == params['number_of_frame_gather_iters'] * params['number_of_frames_in_each_gather_iter']
+            # the voxel counts are accumulated as each frame is gathered, so that the frames are not kept in memory
+            if accumulator_key not in data_dict: data_dict[accumulator_key] = STDFAccumulator(params['lidar_range_in_unit_length'], params['bins_per_unit_length'], bins)
+            accumulate_fn = lambda point_cloud: data_dict[accumulator_key].add(get_fixed_sized_point_cloud(point_cloud, params['number_of_points_per_frame']))
         
-        # generate filter
-        logger.log(f'[algo->lidar.py->BGFilterSTDF]: Generating filter', Logger.INFO)
-        from algo.non_nn.STDF import STDF
-        data_dict[query_frames_key] = [get_fixed_sized_point_cloud(frame, params['number_of_points_per_frame']) for frame in data_dict[query_frames_key]]
-        data_dict[filter_key] = STDF(data_dict[query_frames_key], params['lidar_range_in_unit_length'], params['bins_per_unit_length'])
-        logger.log(f'[algo->lidar.py->BGFilterSTDF]: Filter generated', Logger.INFO)
-        data_dict['BGFilterSTDF_set'] = True
+            # gather frames
+            for i in range(params['number_of_frame_gather_iters']):
+                gathering_done = accumulate_point_clouds(data_dict, cfg_dict, all_query_frames_keys[i], params['number_of_frames_in_each_gather_iter'], accumulate_fn)
+                if not gathering_done: return
+                skipping_done = skip_frames(data_dict, cfg_dict, all_skip_frames_keys[i], params['number_of_skip_frames_after_each_iter'])
+                if not skipping_done: return
+            assert data_dict[accumulator_key].number_of_frames == params['number_of_frame_gather_iters'] * params['number_of_frames_in_each_gather_iter']
+        
+            # generate filter
+            logger.log(f'[algo->lidar.py->BGFilterSTDF]: Generating filter', Logger.INFO)
+            data_dict[filter_key] = data_dict.pop(accumulator_key).get_filter(params.get('sparse', False))
+            logger.log(f'[algo->lidar.py->BGFilterSTDF]: Filter generated', Logger.INFO)
+            if params.get('save_filter', False):
+                data_dict[filter_key].save(filter_path, params)
+                logger.log(f'[algo->lidar.py->BGFilterSTDF]: Filter saved to {filter_path}', Logger.INFO)
+            data_dict['BGFilterSTDF_set'] = True
     else:
         # recompute filter if non-live-editable params are changed
         condition = False
@@ -164,13 +219,87 @@ def BGFilterSTDF(data_dict: dict, cfg_dict: dict):
             return
     
     # if filter exists, apply it
-    if filter_key in data_dict:
+    if filter_key in data_dict and params.get('online', False):
+        # filter with the background of the previous frames, then update the background with the current frame once per frame
+        online_filter = data_dict[filter_key]
+        online_filter.decay = params['online_decay']
+        point_cloud = data_dict['current_point_cloud_numpy']
+        mask = online_filter(point_cloud, params['background_density_threshold'])
+        if data_dict.get(last_update_key, None) != data_dict.get('current_frame_index', None):
+            online_filter.update(point_cloud)
+            data_dict[last_update_key] = data_dict.get('current_frame_index', None)
+            # the online filter is saved periodically so that a restart does not begin with an empty background
+            if params.get('save_filter', False) and online_filter.number_of_updates % params.get('online_save_interval', 100) == 0:
+                online_filter.save(filter_path, params)
+        data_dict['current_point_cloud_numpy'] = point_cloud[mask]
+    elif filter_key in data_dict:
         # get util functions
         from pcd.utils import get_fixed_sized_point_cloud
         # apply filter
         data_dict['current_point_cloud_numpy'] = get_fixed_sized_point_cloud(data_dict['current_point_cloud_numpy'], params['number_of_points_per_frame'])
         data_dict['current_point_cloud_numpy'] = data_dict['current_point_cloud_numpy'][data_dict[filter_key](data_dict['current_point_cloud_numpy'], params['background_density_threshold'])]
 
+def BGFilterRIBF(data_dict: dict, cfg_dict: dict):
+    """
+    Applies Background Filter using a Range Image Background Filter (BGFilterRIBF) to the point cloud data, for structured lidars such as Ouster OS1-64.
+
+    Args:
+        data_dict (dict): A dictionary containing the input data and intermediate results.
+        cfg_dict (dict): A dictionary containing the configuration parameters.
+
+    Returns:
+        None
+    """
+
+    # get logger object from data_dict
+    if 'logger' in data_dict: logger:Logger = data_dict['logger']
+    else: print('[algo->lidar.py->BGFilterRIBF]: No logger object in data_dict. It is abnormal behavior as logger object is created by default. Please check if some script is removing the logger key in data_dict.'); return
+
+    # check if required data is present in data_dict
+    if "current_point_cloud_numpy" not in data_dict:
+        logger.log('[algo->lidar.py->BGFilterRIBF]: current_point_cloud_numpy not found in data_dict', Logger.ERROR)
+        return
+
+    # algo name
+    algo_name = 'BGFilterRIBF'
+
+    # dict keys
+    params_key = f'{algo_name}_params'
+    filter_key = f'{algo_name}_filter'
+    last_update_key = f'{algo_name}_last_update_frame_index'
+
+    # get params
+    params = cfg_dict['proc']['lidar']['BGFilterRIBF'].copy()
+    live_editable_params = ['range_threshold', 'update_step'] # list of params that can be live edited and do not require re-computation of filter
+
+    # create filter if not exists, recreate it if non-live-editable params are changed
+    if filter_key in data_dict and any(data_dict[params_key][key] != params[key] for key in params if key not in live_editable_params):
+        keys_to_remove = [key for key in data_dict.keys() if key.startswith(algo_name)]
+        for key in keys_to_remove: data_dict.pop(key)
+    if filter_key not in data_dict:
+        from algo.non_nn.RIBF import RIBF
+        data_dict[params_key] = params
+        data_dict[filter_key] = RIBF(params['image_height'], params['image_width'], params['vertical_fov'], params['number_of_learning_frames'], params['background_percentile'], params['update_step'], params.get('ring_major_order', False))
+        logger.log(f'[algo->lidar.py->BGFilterRIBF]: Learning background from {params["number_of_learning_frames"]} frames', Logger.INFO)
+
+    # update the background once per frame
+    range_image_filter = data_dict[filter_key]
+    range_image_filter.update_step = params['update_step']
+    point_cloud = data_dict['current_point_cloud_numpy']
+    if range_image_filter.ring_major_order and len(point_cloud) != params['image_height'] * params['image_width']:
+        logger.log(f'[algo->lidar.py->BGFilterRIBF]: ring_major_order is set but the point cloud has {len(point_cloud)} points instead of image_height x image_width = {params["image_height"] * params["image_width"]}, skipping the frame', Logger.ERROR)
+        return
+    learned = range_image_filter.background_range is not None
+    if data_dict.get(last_update_key, None) != data_dict.get('current_frame_index', None):
+        range_image_filter.update(point_cloud)
+        data_dict[last_update_key] = data_dict.get('current_frame_index', None)
+        if not learned and range_image_filter.background_range is not None:
+            logger.log(f'[algo->lidar.py->BGFilterRIBF]: Background learned', Logger.INFO)
+            data_dict['BGFilterRIBF_set'] = True
+
+    # apply filter once the background is learned, the frame is filtered with the background before it was updated with the frame
+    if learned: data_dict['current_point_cloud_numpy'] = point_cloud[range_image_filter(point_cloud, params['range_threshold'])]
+
 def Clusterer_TEPP_DBSCAN(data_dict: dict, cfg_dict: dict):
     """
     Perform TEPP DBSCAN clustering on the current point cloud.
@@ -197,31 +326,44 @@ def Clusterer_TEPP_DBSCAN(data_dict: dict, cfg_dict: dict):
         logger.log('[algo->lidar.py->Clusterer_TEPP_DBSCAN]: current_point_cloud_numpy not found in data_dict', Logger.ERROR)
         return
     
-    try: DBSCAN = __import__('dbscan', fromlist=['DBSCAN']).DBSCAN
-    except:
-        logger.log('[algo->lidar.py->Clusterer_TEPP_DBSCAN]: dbscan package not found, please install the `dbscan` package using `pip install dbscan`.', Logger.ERROR)
-        return
-    
     # get params
     params = cfg_dict['proc']['lidar']['Clusterer_TEPP_DBSCAN']
-
-    # perform clustering
-    cluster_label_for_each_point_index, _ = DBSCAN(data_dict['current_point_cloud_numpy'], params['eps'], params['min_samples'])
-    point_indices_for_each_cluster_label = [label == cluster_label_for_each_point_index for label in np.unique(cluster_label_for_each_point_index)]
-
-    # create 'current_label_list' if not exists
-    if 'current_label_list' not in data_dict:
-        data_dict['current_label_list'] = []
-        logger.log('[algo->lidar.py->Clusterer_TEPP_DBSCAN]: current_label_list not found in data_dict, creating a new one', Logger.DEBUG)
-
-    # update label list
-    for point_indices in point_indices_for_each_cluster_label:
-        data_dict['current_label_list'].append({'lidar_cluster': {'point_indices': point_indices}})
+    backend = params.get('backend', 'auto')
+    
+    # use the `dbscan` package if available, otherwise the built-in grid DBSCAN
+    DBSCAN = None
+    if backend in ['auto', 'dbscan']:
+        try: DBSCAN = __import__('dbscan', fromlist=['DBSCAN']).DBSCAN
+        except:
+            if backend == 'dbscan':
+                logger.log('[algo->lidar.py->Clusterer_TEPP_DBSCAN]: dbscan package not found, please install the `dbscan` package using `pip install dbscan` or set backend to `grid`.', Logger.ERROR)
+                return
+            logger.log('[algo->lidar.py->Clusterer_TEPP_DBSCAN]: dbscan package not found, using the built-in grid DBSCAN', Logger.DEBUG)
+    if DBSCAN is None:
+        from algo.non_nn.GridDBSCAN import GridDBSCAN
+        DBSCAN = lambda points, eps, min_samples: GridDBSCAN(points, eps, min_samples, params.get('num_threads', 1))
+
+    # perform clustering on the selected columns, e.g. xyz without intensity
+    features = np.ascontiguousarray(data_dict['current_point_cloud_numpy'][:, params.get('feature_columns', [0, 1, 2])])
+    cluster_label_for_each_point_index, _ = DBSCAN(features, params['eps'], params['min_samples'])
+
+    # store the clusters as one int32 label array, noise is -1, and the point indices of each cluster in CSR form
+    from pcd.utils import get_cluster_point_indices
+    cluster_labels = np.full(len(cluster_label_for_each_point_index), -1, dtype=np.int32)
+    clustered = cluster_label_for_each_point_index >= 0
+    cluster_labels[clustered] = np.unique(cluster_label_for_each_point_index[clustered], return_inverse=True)[1]
+    point_indices, cluster_offsets = get_cluster_point_indices(cluster_labels)
+    data_dict['current_point_cloud_cluster_labels'] = cluster_labels
+    data_dict['current_point_cloud_cluster_point_indices'] = point_indices
+    data_dict['current_point_cloud_cluster_offsets'] = cluster_offsets
+    # the track ids of the clusters are set by a tracker, -1 for untracked clusters
+    data_dict['current_point_cloud_cluster_track_ids'] = np.full(len(cluster_offsets) - 1, -1, dtype=np.int64)
     data_dict['Clusterer_TEPP_DBSCAN_set'] = True
 
 def Cluster2Object(data_dict: dict, cfg_dict: dict):
     """
-    Converts lidar clusters to object labels and adds them to the current label list.
+    Converts the lidar clusters of Clusterer_TEPP_DBSCAN, read from `current_point_cloud_cluster_point_indices` and `current_point_cloud_cluster_offsets`,
+    to object labels and adds them to the current label list.
 
     Args:
         data_dict (dict): A dictionary containing data for processing.
@@ -239,75 +381,133 @@ def Cluster2Object(data_dict: dict, cfg_dict: dict):
     if "current_point_cloud_numpy" not in data_dict:
         logger.log('[algo->lidar.py->Cluster2Object]: current_point_cloud_numpy not found in data_dict', Logger.ERROR)
         return
-    if 'current_label_list' not in data_dict:
-        logger.log('[algo->lidar.py->Cluster2Object]: current_label_list not found in data_dict', Logger.ERROR)
+    if 'current_point_cloud_cluster_point_indices' not in data_dict or 'current_point_cloud_cluster_offsets' not in data_dict:
+        logger.log('[algo->lidar.py->Cluster2Object]: current_point_cloud_cluster_point_indices or current_point_cloud_cluster_offsets not found in data_dict', Logger.ERROR)
         return
     
     # get params
     params = cfg_dict['proc']['lidar']['Cluster2Object']
 
-    import open3d as o3d
+    # create 'current_label_list' if not exists
+    from lbl.columnar import ColumnarLabelList
+    if 'current_label_list' not in data_dict:
+        data_dict['current_label_list'] = ColumnarLabelList()
+        logger.log('[algo->lidar.py->Cluster2Object]: current_label_list not found in data_dict, creating a new one', Logger.DEBUG)
+    label_list = ColumnarLabelList.from_label_list(data_dict['current_label_list'])
+    data_dict['current_label_list'] = label_list
     
-    for label_dict in data_dict['current_label_list']:
-        if 'lidar_cluster' not in label_dict: continue
-        
-        # get cluster
-        lidar_cluster_dict = label_dict['lidar_cluster']
-        point_indices = lidar_cluster_dict['point_indices']
-        cluster = data_dict['current_point_cloud_numpy'][point_indices][:, :3]
-        
-        # create bounding box and get its center, extent, and euler angles
-        if params['oriented']:
-            try: bbox = o3d.geometry.OrientedBoundingBox.create_from_points(o3d.utility.Vector3dVector(cluster))
-            except:
-                logger.log('[algo->lidar.py->Cluster2Object]: failed to create an OrientedBoundingBox, skipping ...', Logger.WARNING)
-                continue
-            lidar_xyz_center = bbox.get_center().astype(np.float32)
-            lidar_xyz_extent = bbox.extent.astype(np.float32)
-            rotation_matrix = bbox.R.astype(np.float32)
-            lidar_xyz_euler_angles = np.array(
-                [0.0, # np.arctan2(rotation_matrix[2,1], rotation_matrix[2,2]),
-                 0.0, # np.arctan2(-rotation_matrix[2,0], np.sqrt(rotation_matrix[2,1]**2 + rotation_matrix[2,2]**2)),
-                 np.arctan2(rotation_matrix[1,0], rotation_matrix[0,0])], dtype=np.float32)
-        else:
-            try: bbox = o3d.geometry.AxisAlignedBoundingBox.create_from_points(o3d.utility.Vector3dVector(cluster))
-            except: continue
-            lidar_xyz_center = bbox.get_center().astype(np.float32)
-            lidar_xyz_extent = (bbox.get_max_bound() - bbox.get_min_bound()).astype(np.float32)
-            lidar_xyz_euler_angles = np.array([0, 0, 0], dtype=np.float32)
-        
-        # get base length and height of the bounding box
-        base_length = lidar_xyz_extent[0] if lidar_xyz_extent[0] > lidar_xyz_extent[1] else lidar_xyz_extent[1]
-        height = lidar_xyz_extent[2]
-
-        # check if the cluster belongs to any class
-        selected_obj_class = None
-        for obj_class, size_constraint in params['size_constraints'].items():
-            base_length_range = size_constraint['base_length']
-            height_range = size_constraint['height']
-            if base_length_range[0] <= base_length < base_length_range[1]: # and height_range[0] <= height < height_range[1]:
-                selected_obj_class = obj_class
-                break
-        
-        # if the cluster does not belong to any class, skip it, otherwise add it to the label list
-        if selected_obj_class == None:
-            logger.log(f'[algo->lidar.py->Cluster2Object]: class could not be determined for cluster with base_length: {base_length} and height: {height}, skipping ...', Logger.WARNING)
-            continue
-        else:
-            if selected_obj_class in params['class_colors']:
-                lidar_bbox_color = np.array(params['class_colors'][selected_obj_class], dtype=np.float32)
-                camera_bbox_color = (lidar_bbox_color.copy() * 255.0).astype(np.uint8)
-            else:
-                logger.log(f'[algo->lidar.py->Cluster2Object]: class color not found for class: {selected_obj_class}, using default color', Logger.WARNING)
-                lidar_bbox_color = np.array([0, 0, 0], dtype=np.float32)
-                camera_bbox_color = (lidar_bbox_color.copy() * 255.0).astype(np.uint8)
-            
-            label = dict()
-            label['class'] = selected_obj_class
-            label['lidar_bbox'] = {'lidar_xyz_center': lidar_xyz_center, 'lidar_xyz_extent': lidar_xyz_extent, 'lidar_xyz_euler_angles': lidar_xyz_euler_angles, 'rgb_bbox_color': lidar_bbox_color, 'predicted': True}
-            label['camera_bbox'] = {'lidar_xyz_center': lidar_xyz_center, 'lidar_xyz_extent': lidar_xyz_extent, 'lidar_xyz_euler_angles': lidar_xyz_euler_angles, 'rgb_bbox_color': camera_bbox_color, 'predicted': True}
-            
-            data_dict['current_label_list'].append(label)
+    # the points of all the clusters are read at once from the CSR point indices, the clusters of the clusterer are never empty
+    cluster_offsets = data_dict['current_point_cloud_cluster_offsets']
+    if len(cluster_offsets) < 2: return
+    cluster_ids = np.arange(len(cluster_offsets) - 1)
+    cluster_points = data_dict['current_point_cloud_numpy'][data_dict['current_point_cloud_cluster_point_indices']][:, :3]
+    
+    # create bounding boxes and get their centers, extents, and euler angles
+    if params['oriented']:
+        # yaw-only boxes fitted in bird's-eye view, roll and pitch are kept 0
+        from pcd.utils import fit_bev_oriented_boxes
+        lidar_xyz_centers, lidar_xyz_extents, lidar_xyz_euler_angles = fit_bev_oriented_boxes(cluster_points, cluster_offsets, params.get('oriented_method', 'min_area'))
+    else:
+        # axis-aligned bounding boxes of all the clusters at once
+        min_bounds = np.minimum.reduceat(cluster_points, cluster_offsets[:-1], axis=0)
+        max_bounds = np.maximum.reduceat(cluster_points, cluster_offsets[:-1], axis=0)
+        lidar_xyz_centers = ((min_bounds + max_bounds) / 2).astype(np.float32)
+        lidar_xyz_extents = (max_bounds - min_bounds).astype(np.float32)
+        lidar_xyz_euler_angles = np.zeros_like(lidar_xyz_centers)
+    
+    # get base lengths and heights of the bounding boxes
+    base_lengths = np.maximum(lidar_xyz_extents[:, 0], lidar_xyz_extents[:, 1])
+    heights = lidar_xyz_extents[:, 2]
+
+    # a cluster belongs to the first class whose base length range contains its base length
+    class_names = list(params['size_constraints'].keys())
+    base_length_ranges = np.array([params['size_constraints'][obj_class]['base_length'] for obj_class in class_names], dtype=np.float32).reshape(-1, 2)
+    matches = (base_length_ranges[:, 0] <= base_lengths[:, None]) & (base_lengths[:, None] < base_length_ranges[:, 1]) # and height_range[0] <= height < height_range[1]
+    classified = np.any(matches, axis=1)
+    class_indices = np.argmax(matches, axis=1)[classified]
+    
+    # if a cluster does not belong to any class, skip it, otherwise add it to the label list
+    if not np.all(classified):
+        logger.log(f'[algo->lidar.py->Cluster2Object]: class could not be determined for {np.count_nonzero(~classified)} clusters with base_lengths: {base_lengths[~classified].tolist()} and heights: {heights[~classified].tolist()}, skipping ...', Logger.WARNING)
+    if len(class_indices) == 0: return
+    class_colors = np.zeros((len(class_names), 3), dtype=np.float32)
+    for i, obj_class in enumerate(class_names):
+        if obj_class in params['class_colors']: class_colors[i] = params['class_colors'][obj_class]
+        elif np.any(class_indices == i): logger.log(f'[algo->lidar.py->Cluster2Object]: class color not found for class: {obj_class}, using default color', Logger.WARNING)
+    class_ids = np.full(len(class_names), -1, dtype=np.int32)
+    for i in np.unique(class_indices).tolist(): class_ids[i] = label_list.get_class_id(class_names[i])
+    # each object keeps the id of its cluster, e.g. for a tracker to pass its track id to the cluster
+    extras = [{'lidar_cluster_id': cluster_id} for cluster_id in cluster_ids[classified].tolist()]
+    label_list.extend_boxes(lidar_xyz_centers[classified], lidar_xyz_extents[classified], lidar_xyz_euler_angles[classified], class_ids[class_indices], lidar_colors=class_colors[class_indices], extras=extras)
+
+def Tracker_CV_Kalman(data_dict: dict, cfg_dict: dict):
+    """
+    Tracks the predicted lidar bounding boxes across frames with constant-velocity Kalman filters and adds a `track_id` to their labels.
+    The clusters the boxes were created from (by Cluster2Object) get the same track id in `current_point_cloud_cluster_track_ids`.
+
+    Args:
+        data_dict (dict): A dictionary containing data for processing.
+        cfg_dict (dict): A dictionary containing configuration parameters.
+
+    Returns:
+        None
+    """
+
+    # get logger object from data_dict
+    if 'logger' in data_dict: logger:Logger = data_dict['logger']
+    else: print('[algo->lidar.py->Tracker_CV_Kalman]: No logger object in data_dict. It is abnormal behavior as logger object is created by default. Please check if some script is removing the logger key in data_dict.'); return
+
+    # check if required data is present in data_dict
+    if 'current_label_list' not in data_dict:
+        logger.log('[algo->lidar.py->Tracker_CV_Kalman]: current_label_list not found in data_dict', Logger.ERROR)
+        return
+
+    # algo name
+    algo_name = 'Tracker_CV_Kalman'
+
+    # dict keys
+    params_key = f'{algo_name}_params'
+    tracker_key = f'{algo_name}_tracker'
+    last_update_key = f'{algo_name}_last_update_frame_index'
+    state_before_last_update_key = f'{algo_name}_state_before_last_update'
+
+    # get params
+    params = cfg_dict['proc']['lidar']['Tracker_CV_Kalman'].copy()
+    params.setdefault('min_iou', 0.0)
+    live_editable_params = ['max_distance', 'max_age', 'min_hits', 'process_noise', 'measurement_noise', 'use_hungarian', 'min_iou'] # list of params that can be live edited and do not require re-creation of tracker
+
+    # create tracker if not exists, recreate it if non-live-editable params are changed
+    if tracker_key in data_dict and any(data_dict[params_key][key] != params[key] for key in params if key not in live_editable_params):
+        keys_to_remove = [key for key in data_dict.keys() if key.startswith(algo_name)]
+        for key in keys_to_remove: data_dict.pop(key)
+    if tracker_key not in data_dict:
+        from algo.non_nn.CVTracker import CVTracker
+        data_dict[params_key] = params
+        data_dict[tracker_key] = CVTracker(params['max_distance'], params['max_age'], params['min_hits'], params['process_noise'], params['measurement_noise'], params['use_hungarian'], params['min_iou'])
+    tracker = data_dict[tracker_key]
+    for key in live_editable_params: setattr(tracker, key, params[key])
+
+    from lbl.columnar import ColumnarLabelList
+    label_list = ColumnarLabelList.from_label_list(data_dict['current_label_list'])
+    data_dict['current_label_list'] = label_list
+
+    # if the frame is processed again (e.g. its boxes changed after a param edit), the tracker is restored to its state before the frame was tracked,
+    # so the frame is not predicted twice and its hits and misses are not counted twice
+    box_indices = np.flatnonzero(label_list.has_lidar_bbox & label_list.predicted)
+    frame_index = data_dict.get('current_frame_index', None)
+    if frame_index is not None and state_before_last_update_key in data_dict and data_dict.get(last_update_key, None) == frame_index: tracker.set_state(data_dict[state_before_last_update_key])
+    else: data_dict[state_before_last_update_key] = tracker.get_state()
+    classes = label_list.classes
+    track_ids = tracker(label_list.centers[box_indices], label_list.extents[box_indices], label_list.yaws[box_indices], [classes[i] for i in box_indices.tolist()], frame_index)
+    data_dict[last_update_key] = frame_index
+
+    # add the track ids to the boxes and to the clusters they were created from
+    cluster_track_ids = data_dict.get('current_point_cloud_cluster_track_ids', None)
+    for i, track_id in zip(box_indices.tolist(), track_ids.tolist()):
+        if track_id < 0: continue
+        label_list.extras[i]['track_id'] = track_id
+        cluster_id = label_list.extras[i].get('lidar_cluster_id', None)
+        if cluster_track_ids is not None and cluster_id is not None and cluster_id < len(cluster_track_ids): cluster_track_ids[cluster_id] = track_id
 
 def PointPillarDetection(data_dict: dict, cfg_dict: dict):
     """
@@ -345,15 +545,32 @@ def PointPillarDetection(data_dict: dict, cfg_dict: dict):
     ids_class_key = f'{algo_name}_ids_class'
     pcd_limit_range_key = f'{algo_name}_pcd_limit_range'
     class_color_key = f'{algo_name}_class_color'
+    latency_key = f'{algo_name}_latency'
+    params_key = f'{algo_name}_params'
     
     # get params
-    params = cfg_dict['proc']['lidar'][algo_name]
+    params = cfg_dict['proc']['lidar'][algo_name].copy()
+    live_editable_params = ['score_threshold', 'num_threads', 'num_interop_threads'] # list of params that can be live edited and do not require re-creation of model
+
+    # reload model if non-live-editable params are changed
+    if params_key in data_dict and any(data_dict[params_key].get(key, None) != params[key] for key in params if key not in live_editable_params):
+        keys_to_remove = [key for key in data_dict.keys() if key.startswith(algo_name)]
+        for key in keys_to_remove: data_dict.pop(key)
+    data_dict[params_key] = params
     
     # imports
+    import time
     import torch
+    from algo.utils import get_cached_model
+
+    # cpu threads, the inter-op threads can only be set before the first parallel work of torch
+    if params.get('num_threads', 0) > 0 and torch.get_num_threads() != params['num_threads']: torch.set_num_threads(params['num_threads'])
+    if params.get('num_interop_threads', 0) > 0 and torch.get_num_interop_threads() != params['num_interop_threads']:
+        try: torch.set_num_interop_threads(params['num_interop_threads'])
+        except RuntimeError: logger.log(f'[algo->lidar.py->PointPillarDetection]: num_interop_threads can only be set before torch starts parallel work, restart to apply it', Logger.WARNING)
 
-    # create model if not exists
-    if 'PointPillarDetection_model' not in data_dict:
+    # create model if not exists, the model is cached across resets and is only loaded once per configuration
+    if model_key not in data_dict:
         data_dict[class_ids_key] = {'Pedestrian': 0, 'Cyclist': 1, 'Car': 2}
         data_dict[ids_class_key] = {v:k for k, v in data_dict[class_ids_key].items()}
         min_xyz = cfg_dict['proc']['lidar']['crop']['min_xyz']
@@ -363,41 +580,58 @@ def PointPillarDetection(data_dict: dict, cfg_dict: dict):
 
         path = os.path.abspath(os.path.join(data_dict['root_path'], params['path_to_github_repo']))
         if path not in sys.path: sys.path.append(path)
-        from algo.nn.PointPillars.model import PointPillars
-
-        data_dict[model_key] = PointPillars(nclasses=len(data_dict[class_ids_key]))
         model_path = os.path.abspath(os.path.join(path, 'pretrained/epoch_160.pth'))
-        if torch.cuda.is_available():
-            data_dict[model_key].cuda()
-            data_dict[model_key].load_state_dict(torch.load(model_path))
-        else:
-             data_dict[model_key].load_state_dict(torch.load(model_path), map_location=torch.device('cpu'))
-
-        data_dict[model_key].eval()
+        device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
+        compile_mode = params.get('compile', 'none')
+        channels_last = params.get('channels_last', False)
+
+        def create_model():
+            from algo.nn.PointPillars.model import PointPillars
+            model = PointPillars(nclasses=len(data_dict[class_ids_key]))
+            model.load_state_dict(torch.load(model_path, map_location=device))
+            model = model.to(device).eval()
+            if channels_last: model = model.to(memory_format=torch.channels_last)
+
+            # warm-up passes on random points within the point cloud range, so that the first frames are not slowed down by lazy initializations (and compilation)
+            rng = np.random.default_rng(0)
+            warmup_points = np.zeros((params.get('number_of_warmup_points', 20000), 4), dtype=np.float32)
+            warmup_points[:, :3] = rng.uniform(data_dict[pcd_limit_range_key][:3], data_dict[pcd_limit_range_key][3:], (len(warmup_points), 3))
+            def warm_up(model):
+                with torch.inference_mode():
+                    for _ in range(params.get('number_of_warmup_iters', 2)): model(batched_pts=[torch.from_numpy(warmup_points).to(device)], mode='test')
+                return model
+
+            # optional compilation, the eager model is used if the model can not be compiled
+            if compile_mode in ['jit', 'compile']:
+                try: return warm_up(torch.jit.script(model) if compile_mode == 'jit' else torch.compile(model))
+                except Exception as e: logger.log(f'[algo->lidar.py->PointPillarDetection]: {compile_mode} of the model failed, using the eager model:\n{e}', Logger.WARNING)
+            return warm_up(model)
+
+        model_cache_key = (model_path, str(device), compile_mode, channels_last)
+        data_dict[model_key] = get_cached_model(algo_name, model_cache_key, create_model)
     
-    with torch.no_grad():
-        pc_torch = torch.from_numpy(data_dict['current_point_cloud_numpy'])
+    # contiguous float32 xyz + intensity, inference without autograd tracking
+    start_time = time.perf_counter()
+    with torch.inference_mode():
+        pc_torch = torch.from_numpy(np.ascontiguousarray(data_dict['current_point_cloud_numpy'][:, :4], dtype=np.float32))
         if torch.cuda.is_available(): pc_torch = pc_torch.cuda()
         result_filter = data_dict[model_key](batched_pts=[pc_torch], mode='test')[0]
+    data_dict[latency_key] = time.perf_counter() - start_time
+    logger.log(f'[algo->lidar.py->PointPillarDetection]: inference latency: {data_dict[latency_key] * 1000:.1f} ms', Logger.INFO)
 
     lidar_bboxes = result_filter['lidar_bboxes']
     labels, scores = result_filter['labels'], result_filter['scores']
 
-    for i in range(len(labels)):
-        if scores[i] < params['score_threshold']: continue
-        lidar_bbox = lidar_bboxes[i]
-        lidar_xyz_center = lidar_bbox[:3]
-        lidar_xyz_center[2] += lidar_bbox[5] / 2
-        lidar_xyz_extent = lidar_bbox[3:6]
-        lidar_xyz_euler_angles = np.array([0, 0, lidar_bbox[6]], dtype=np.float32)
-        obj_class = data_dict[ids_class_key][labels[i]]
-        lidar_bbox_color = np.array(data_dict[class_color_key][obj_class], dtype=np.float32)
-        camera_bbox_color = np.array([i * 255.0 for i in data_dict[class_color_key][obj_class]], dtype=np.uint8)
-
-        label = dict()
-        label['class'] = obj_class
-        label['lidar_bbox'] = {'lidar_xyz_center': lidar_xyz_center, 'lidar_xyz_extent': lidar_xyz_extent, 'lidar_xyz_euler_angles': lidar_xyz_euler_angles, 'rgb_bbox_color': lidar_bbox_color, 'predicted': True}
-        label['camera_bbox'] = {'lidar_xyz_center': lidar_xyz_center, 'lidar_xyz_extent': lidar_xyz_extent, 'lidar_xyz_euler_angles': lidar_xyz_euler_angles, 'rgb_bbox_color': camera_bbox_color, 'predicted': True}
-
-        if 'current_label_list' not in data_dict: data_dict['current_label_list'] = []
-        data_dict['current_label_list'].append(label)
\ No newline at end of file
+    # keep the confident detections
+    keep = scores >= params['score_threshold']
+    lidar_bboxes, labels, scores = lidar_bboxes[keep].reshape(-1, 7), labels[keep], scores[keep]
+    lidar_xyz_centers = lidar_bboxes[:, :3].copy()
+    lidar_xyz_centers[:, 2] += lidar_bboxes[:, 5] / 2
+    obj_classes = [data_dict[ids_class_key][label] for label in labels.tolist()]
+    lidar_bbox_colors = np.array([data_dict[class_color_key][obj_class] for obj_class in obj_classes], dtype=np.float32).reshape(-1, 3)
+
+    # add all the detections to the label list at once
+    from lbl.columnar import ColumnarLabelList
+    if 'current_label_list' not in data_dict: data_dict['current_label_list'] = ColumnarLabelList()
+    data_dict['current_label_list'] = ColumnarLabelList.from_label_list(data_dict['current_label_list'])
+    data_dict['current_label_list'].extend_boxes(lidar_xyz_centers, lidar_bboxes[:, 3:6], lidar_bboxes[:, 6], obj_classes, lidar_bbox_colors, predicted=True, scores=scores)
\ No newline at end of file
@@ -0,0 +1,245 @@
+import numpy as np
+
+"""
+Constant Velocity Tracker (CVTracker)
+
+It is a multi-object tracker for the bounding boxes of a static (e.g. roadside) lidar, in the spirit of SORT.
+Every track is a constant-velocity Kalman filter over its bird's-eye view center (x, y, vx, vy), the filters of all the tracks are stored as stacked arrays,
+so predicting, associating, and updating hundreds of tracks are a few batched numpy operations per frame.
+
+The algorithm is summarized in the following steps:
+1. The states of all the tracks are predicted to the current frame, the velocity is in lidar unit length per frame.
+2. The cost of associating a track to a box is the bird's-eye view distance between their centers, pairs farther than max_distance or of different classes are not allowed.
+   If min_iou is positive, the pairs whose bird's-eye view IoU (between the predicted track box, with the extents and yaw of its last box, and the box) is lower are not allowed either.
+3. The tracks are assigned to the boxes with the Hungarian algorithm if scipy is installed, otherwise greedily from the lowest cost.
+4. The assigned tracks are updated with their box centers, the other boxes start new tracks, and the tracks not assigned for more than max_age frames are removed.
+
+A track id is reported for a box once its track was assigned to boxes in at least min_hits frames.
+"""
+
+class CVTracker:
+    """
+    Multi-object tracker, an object of this class is called as tracker(centers, extents, yaws, classes, frame_index) and returns the track id of each box.
+
+    Args:
+        max_distance (float): Maximum bird's-eye view distance in lidar unit length between a predicted track and a box for them to be associated.
+        max_age (int): Number of frames a track is kept without being associated to a box.
+        min_hits (int): Number of frames a track has to be associated to a box before its id is reported.
+        process_noise (float): Standard deviation of the acceleration in lidar unit length per frame squared.
+        measurement_noise (float): Standard deviation of the box centers in lidar unit length.
+        use_hungarian (bool): Use the Hungarian algorithm of scipy if it is installed, otherwise the greedy assignment.
+        min_iou (float): Minimum bird's-eye view IoU between a predicted track and a box for them to be associated, 0 to gate by distance only.
+
+    Attributes:
+        states (np.ndarray): Tx4 states (x, y, vx, vy) of the tracks.
+        covariances (np.ndarray): Tx4x4 state covariances of the tracks.
+        z (np.ndarray): T z centers of the tracks, from their last box.
+        extents (np.ndarray): Tx3 extents of the tracks, from their last box.
+        yaws (np.ndarray): T yaws of the tracks, from their last box.
+        class_ids (np.ndarray): T class ids of the tracks.
+        track_ids (np.ndarray): T unique ids of the tracks.
+        hits (np.ndarray): T number of frames each track was associated to a box.
+        misses (np.ndarray): T number of consecutive frames each track was not associated to a box.
+        last_frame_index (int): Index of the last frame the tracker was called with.
+
+    Methods:
+        predict(self, number_of_frames: int): Predicts the states of all the tracks a number of frames ahead.
+        get_cost_matrix(self, centers: np.ndarray, extents: np.ndarray, yaws: np.ndarray, class_ids: np.ndarray): Returns the TxD association cost matrix.
+        assign(self, cost_matrix: np.ndarray): Returns the assigned (track, box) index pairs.
+        get_state(self): Returns a copy of the state of the tracker.
+        set_state(self, state: dict): Restores a state returned by get_state.
+        update(self, centers: np.ndarray, extents: np.ndarray, yaws: np.ndarray, classes: list, frame_index: int): Tracks a frame of boxes and returns their track ids.
+        __call__(self, centers: np.ndarray, extents: np.ndarray, yaws: np.ndarray, classes: list, frame_index: int): Same as update.
+    """
+    def __init__(self, max_distance: float, max_age: int, min_hits: int, process_noise: float = 0.5, measurement_noise: float = 0.2, use_hungarian: bool = True, min_iou: float = 0.0):
+        self.max_distance = max_distance
+        self.max_age = max_age
+        self.min_hits = min_hits
+        self.process_noise = process_noise
+        self.measurement_noise = measurement_noise
+        self.use_hungarian = use_hungarian
+        self.min_iou = min_iou
+        self.class_name_ids = {}
+        self.next_track_id = 0
+        self.last_frame_index = None
+        self.states = np.zeros((0, 4), dtype=np.float64)
+        self.covariances = np.zeros((0, 4, 4), dtype=np.float64)
+        self.z = np.zeros(0, dtype=np.float64)
+        self.extents = np.zeros((0, 3), dtype=np.float64)
+        self.yaws = np.zeros(0, dtype=np.float64)
+        self.class_ids = np.zeros(0, dtype=np.int64)
+        self.track_ids = np.zeros(0, dtype=np.int64)
+        self.hits = np.zeros(0, dtype=np.int64)
+        self.misses = np.zeros(0, dtype=np.int64)
+
+    def predict(self, number_of_frames: int):
+        """
+        Predicts the states of all the tracks a number of frames ahead with the constant velocity model.
+
+        Args:
+            number_of_frames (int): Number of frames since the last update.
+        """
+        dt = float(number_of_frames)
+        transition = np.eye(4)
+        transition[0, 2] = transition[1, 3] = dt
+        # white acceleration noise of each axis
+        q = self.process_noise ** 2 * np.array([[dt ** 4 / 4, dt ** 3 / 2], [dt ** 3 / 2, dt ** 2]])
+        noise = np.zeros((4, 4))
+        noise[np.ix_([0, 2], [0, 2])] = q
+        noise[np.ix_([1, 3], [1, 3])] = q
+        self.states = self.states @ transition.T
+        self.covariances = transition @ self.covariances @ transition.T + noise
+
+    def get_cost_matrix(self, centers: np.ndarray, extents: np.ndarray, yaws: np.ndarray, class_ids: np.ndarray):
+        """
+        Returns the association cost matrix, the bird's-eye view distance between each predicted track and each box, inf for the pairs that are not allowed.
+
+        Args:
+            centers (np.ndarray): Dx3 box centers.
+            extents (np.ndarray): Dx3 box extents.
+            yaws (np.ndarray): D box yaws.
+            class_ids (np.ndarray): D box class ids.
+
+        Returns:
+            np.ndarray: TxD cost matrix.
+        """
+        cost_matrix = np.hypot(self.states[:, 0, None] - centers[None, :, 0], self.states[:, 1, None] - centers[None, :, 1])
+        cost_matrix[(cost_matrix > self.max_distance) | (self.class_ids[:, None] != class_ids[None, :])] = np.inf
+        if self.min_iou > 0:
+            # the IoU is only computed for the pairs that passed the distance and class gates
+            from pcd.utils import get_bev_ious
+            track_indices, box_indices = np.nonzero(np.isfinite(cost_matrix))
+            ious = get_bev_ious(self.states[track_indices, :2], self.extents[track_indices], self.yaws[track_indices], centers[box_indices], extents[box_indices], yaws[box_indices])
+            gated = ious < self.min_iou
+            cost_matrix[track_indices[gated], box_indices[gated]] = np.inf
+        return cost_matrix
+
+    def assign(self, cost_matrix: np.ndarray):
+        """
+        Returns the assigned (track, box) index pairs of a cost matrix, pairs with an infinite cost are never assigned.
+
+        Args:
+            cost_matrix (np.ndarray): TxD cost matrix.
+
+        Returns:
+            tuple: Tuple containing the track indices and the box indices of the assigned pairs.
+        """
+        allowed = np.isfinite(cost_matrix)
+        if not np.any(allowed): return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+        linear_sum_assignment = None
+        if self.use_hungarian:
+            try: linear_sum_assignment = __import__('scipy.optimize', fromlist=['linear_sum_assignment']).linear_sum_assignment
+            except ImportError: pass
+        if linear_sum_assignment is not None:
+            # pairs that are not allowed get a cost higher than any allowed assignment and are dropped afterwards
+            track_indices, box_indices = linear_sum_assignment(np.where(allowed, cost_matrix, cost_matrix[allowed].sum() + 1.0))
+            assigned = allowed[track_indices, box_indices]
+            return track_indices[assigned].astype(np.int64), box_indices[assigned].astype(np.int64)
+        # greedy assignment, the allowed pairs are visited from the lowest cost
+        track_indices, box_indices = np.nonzero(allowed)
+        order = np.argsort(cost_matrix[track_indices, box_indices], kind='stable')
+        assigned_tracks, assigned_boxes = np.zeros(cost_matrix.shape[0], dtype=bool), np.zeros(cost_matrix.shape[1], dtype=bool)
+        assigned = []
+        for i, j in zip(track_indices[order].tolist(), box_indices[order].tolist()):
+            if assigned_tracks[i] or assigned_boxes[j]: continue
+            assigned_tracks[i] = assigned_boxes[j] = True
+            assigned.append((i, j))
+        assigned = np.array(assigned, dtype=np.int64).reshape(-1, 2)
+        return assigned[:, 0], assigned[:, 1]
+
+    def get_state(self):
+        """
+        Returns a copy of the state of the tracker, e.g. to track a frame again with other boxes.
+
+        Returns:
+            dict: State of the tracker.
+        """
+        state = {name: getattr(self, name).copy() for name in ['states', 'covariances', 'z', 'extents', 'yaws', 'class_ids', 'track_ids', 'hits', 'misses']}
+        state.update({'class_name_ids': dict(self.class_name_ids), 'next_track_id': self.next_track_id, 'last_frame_index': self.last_frame_index})
+        return state
+
+    def set_state(self, state: dict):
+        """
+        Restores a state returned by get_state, the state can be restored several times.
+
+        Args:
+            state (dict): State of the tracker.
+        """
+        for name, value in state.items(): setattr(self, name, value.copy() if hasattr(value, 'copy') else value)
+
+    def update(self, centers: np.ndarray, extents: np.ndarray, yaws: np.ndarray, classes: list, frame_index: int = None):
+        """
+        Tracks a frame of boxes and returns their track ids.
+
+        Args:
+            centers (np.ndarray): Dx3 box centers.
+            extents (np.ndarray): Dx3 box extents.
+            yaws (np.ndarray): D box yaws.
+            classes (list): D box class names.
+            frame_index (int, optional): Index of the frame, the time step of the prediction is the number of frames since the last call. Defaults to None (1 frame).
+
+        Returns:
+            np.ndarray: D track ids, -1 for the boxes whose track has less than min_hits hits.
+        """
+        centers = np.asarray(centers, dtype=np.float64).reshape(-1, 3)
+        extents = np.asarray(extents, dtype=np.float64).reshape(-1, 3)
+        yaws = np.asarray(yaws, dtype=np.float64).reshape(-1)
+        class_ids = np.array([self.class_name_ids.setdefault(class_name, len(self.class_name_ids)) for class_name in classes], dtype=np.int64)
+
+        # predict the tracks to the current frame
+        number_of_frames = 1
+        if frame_index is not None and self.last_frame_index is not None and frame_index > self.last_frame_index: number_of_frames = frame_index - self.last_frame_index
+        self.last_frame_index = frame_index
+        self.predict(number_of_frames)
+
+        # associate the tracks to the boxes
+        track_indices, box_indices = self.assign(self.get_cost_matrix(centers, extents, yaws, class_ids))
+
+        # kalman update of the assigned tracks, only x and y are measured
+        measurement_noise = self.measurement_noise ** 2 * np.eye(2)
+        covariances = self.covariances[track_indices]
+        innovation_covariances = covariances[:, :2, :2] + measurement_noise
+        gains = covariances[:, :, :2] @ np.linalg.inv(innovation_covariances)
+        innovations = centers[box_indices, :2] - self.states[track_indices, :2]
+        self.states[track_indices] += np.einsum('tij,tj->ti', gains, innovations)
+        self.covariances[track_indices] = covariances - gains @ covariances[:, :2, :]
+        self.z[track_indices] = centers[box_indices, 2]
+        self.extents[track_indices] = extents[box_indices]
+        self.yaws[track_indices] = yaws[box_indices]
+        self.hits[track_indices] += 1
+        self.misses += 1
+        self.misses[track_indices] = 0
+
+        # the boxes that are not assigned start new tracks, at rest with an uncertain velocity
+        new_boxes = np.ones(len(centers), dtype=bool)
+        new_boxes[box_indices] = False
+        new_boxes = np.flatnonzero(new_boxes)
+        number_of_new_tracks = len(new_boxes)
+        new_covariances = np.zeros((number_of_new_tracks, 4, 4))
+        new_covariances[:, [0, 1], [0, 1]] = self.measurement_noise ** 2
+        new_covariances[:, [2, 3], [2, 3]] = self.max_distance ** 2
+        new_track_ids = np.arange(self.next_track_id, self.next_track_id + number_of_new_tracks, dtype=np.int64)
+        self.next_track_id += number_of_new_tracks
+        self.states = np.concatenate((self.states, np.column_stack((centers[new_boxes, :2], np.zeros((number_of_new_tracks, 2))))))
+        self.covariances = np.concatenate((self.covariances, new_covariances))
+        self.z = np.concatenate((self.z, centers[new_boxes, 2]))
+        self.extents = np.concatenate((self.extents, extents[new_boxes]))
+        self.yaws = np.concatenate((self.yaws, yaws[new_boxes]))
+        self.class_ids = np.concatenate((self.class_ids, class_ids[new_boxes]))
+        self.track_ids = np.concatenate((self.track_ids, new_track_ids))
+        self.hits = np.concatenate((self.hits, np.ones(number_of_new_tracks, dtype=np.int64)))
+        self.misses = np.concatenate((self.misses, np.zeros(number_of_new_tracks, dtype=np.int64)))
+
+        # track id of each box
+        box_track_ids = np.full(len(centers), -1, dtype=np.int64)
+        box_track_ids[box_indices] = np.where(self.hits[track_indices] >= self.min_hits, self.track_ids[track_indices], -1)
+        if self.min_hits <= 1: box_track_ids[new_boxes] = new_track_ids
+
+        # remove the tracks that were not associated for too long
+        keep = self.misses <= self.max_age
+        if not np.all(keep):
+            for name in ['states', 'covariances', 'z', 'extents', 'yaws', 'class_ids', 'track_ids', 'hits', 'misses']: setattr(self, name, getattr(self, name)[keep])
+        return box_track_ids
+
+    def __call__(self, centers: np.ndarray, extents: np.ndarray, yaws: np.ndarray, classes: list, frame_index: int = None):
+        return self.update(centers, extents, yaws, classes, frame_index)
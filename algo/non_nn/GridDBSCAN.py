@@ -0,0 +1,166 @@
+import numpy as np
+
+"""
+Grid DBSCAN
+
+A built-in DBSCAN that does not depend on the `dbscan` package, it gives the same clusters as DBSCAN for the core points, border points are assigned to the cluster of
+their lowest-index core neighbor, so the result is deterministic.
+
+The algorithm is summarized in the following steps:
+1. The neighbor pairs (points closer than or at eps) are found with a KD-tree if scipy is installed, otherwise with a voxel grid of cell size eps,
+   where the neighbors of a point can only be in its own cell or in the adjacent cells.
+2. The points with at least min_samples neighbors (the point itself included) are core points.
+3. The connected components of the core points are found with a union-find over the core-core pairs, they are the clusters.
+4. The non-core points with a core neighbor are border points and get the cluster of their lowest-index core neighbor, the other points are noise.
+
+The neighbor search can be split into spatial tiles along the first feature that are processed in parallel threads, each tile also sees the points within eps
+of its borders and keeps the pairs whose lowest-index point it owns, so every pair is found exactly once and the clusters do not depend on the tiling.
+"""
+
+def get_grid_neighbor_pairs(points: np.ndarray, # NxD features
+                            eps: float, # maximum distance between neighbors
+):
+    """
+    Returns the (i, j) index pairs, i < j, of the points that are closer than or at eps, using a voxel grid of cell size eps.
+    The cells are keyed by their int64 index in the grid, or, if the grid has more cells than int64 can index (e.g. small eps with many features),
+    by the big-endian bytes of their coordinates, which sort in the same lexicographic order as the coordinates.
+    """
+    number_of_points, dimensions = points.shape
+    if number_of_points == 0: return np.zeros((0, 2), dtype=np.int64)
+    # cell coordinates of each point, with a margin of one cell so that the adjacent cells never wrap around
+    cells = np.floor((points - points.min(axis=0)) / eps)
+    if cells.max() >= 2 ** 62: raise ValueError(f'eps {eps} is too small for the extent of the points')
+    cells = cells.astype(np.int64) + 1
+    grid_shape = cells.max(axis=0) + 2
+    if np.prod(grid_shape.astype(np.float64)) < 2 ** 62:
+        # pack the cell coordinates into an integer key
+        strides = np.cumprod(np.concatenate(([1], grid_shape[:0:-1])))[::-1]
+        get_keys = lambda cells: cells @ strides
+    else:
+        # the keys would overflow, the coordinates are packed into fixed-size byte strings instead
+        get_keys = lambda cells: np.ascontiguousarray(cells.astype('>u8')).view(f'S{8 * dimensions}').ravel()
+    keys = get_keys(cells)
+    # sort the points by cell, the points of a cell are then contiguous
+    order = np.argsort(keys, kind='stable')
+    sorted_keys = keys[order]
+    sorted_cells = cells[order]
+    sorted_points = points[order]
+    cell_keys, cell_starts, cell_counts = np.unique(sorted_keys, return_index=True, return_counts=True)
+
+    # only half of the adjacent cells are visited, the other half gives the same pairs in the other order
+    offsets = np.stack(np.meshgrid(*[[-1, 0, 1]] * dimensions, indexing='ij'), axis=-1).reshape(-1, dimensions)
+    offsets = offsets[[tuple(offset) >= (0,) * dimensions for offset in offsets.tolist()]]
+    pairs = []
+    for offset in offsets:
+        # locate the adjacent cell of each point
+        neighbor_keys = get_keys(sorted_cells + offset)
+        neighbor_cells = np.minimum(np.searchsorted(cell_keys, neighbor_keys), len(cell_keys) - 1)
+        found = cell_keys[neighbor_cells] == neighbor_keys
+        i = np.flatnonzero(found)
+        starts, counts = cell_starts[neighbor_cells[i]], cell_counts[neighbor_cells[i]]
+        # pair each point with all the points of its adjacent cell
+        i = np.repeat(i, counts)
+        j = np.repeat(starts - np.concatenate(([0], np.cumsum(counts)[:-1])), counts) + np.arange(len(i))
+        if not np.any(offset): keep = i < j
+        else: keep = np.ones(len(i), dtype=bool)
+        keep &= np.einsum('ij,ij->i', sorted_points[i] - sorted_points[j], sorted_points[i] - sorted_points[j]) <= eps * eps
+        pairs.append(np.stack((order[i[keep]], order[j[keep]]), axis=1))
+    pairs = np.concatenate(pairs)
+    return np.stack((pairs.min(axis=1), pairs.max(axis=1)), axis=1)
+
+def get_neighbor_pairs(points: np.ndarray, # NxD features
+                       eps: float, # maximum distance between neighbors
+                       use_scipy: bool = True, # use the scipy KD-tree if scipy is installed
+):
+    """
+    Returns the (i, j) index pairs, i < j, of the points that are closer than or at eps.
+    """
+    if use_scipy:
+        try: cKDTree = __import__('scipy.spatial', fromlist=['cKDTree']).cKDTree
+        except ImportError: cKDTree = None
+        if cKDTree is not None: return cKDTree(points).query_pairs(eps, output_type='ndarray').astype(np.int64).reshape(-1, 2)
+    return get_grid_neighbor_pairs(points, eps)
+
+def get_tiled_neighbor_pairs(points: np.ndarray, # NxD features
+                             eps: float, # maximum distance between neighbors
+                             number_of_tiles: int, # number of tiles along the first feature
+                             num_threads: int, # number of threads processing the tiles
+                             use_scipy: bool = True, # use the scipy KD-tree if scipy is installed
+):
+    """
+    Returns the (i, j) index pairs, i < j, of the points that are closer than or at eps, the neighbor search is done in tiles along the first feature in parallel.
+    The tiles have the same number of points and each tile owns the pairs whose lowest-index point is in it, so every pair is returned exactly once.
+    """
+    if number_of_tiles <= 1 or len(points) < 2 * number_of_tiles: return get_neighbor_pairs(points, eps, use_scipy)
+    from concurrent.futures import ThreadPoolExecutor
+    tile_borders = np.quantile(points[:, 0], np.linspace(0, 1, number_of_tiles + 1)[1:-1])
+    owner_tiles = np.searchsorted(tile_borders, points[:, 0], side='right')
+    tile_borders = np.concatenate(([-np.inf], tile_borders, [np.inf]))
+
+    def get_tile_pairs(tile: int):
+        # the tile points and the points within eps of the tile borders
+        tile_indices = np.flatnonzero((tile_borders[tile] - eps <= points[:, 0]) & (points[:, 0] <= tile_borders[tile + 1] + eps))
+        tile_pairs = tile_indices[get_neighbor_pairs(points[tile_indices], eps, use_scipy)]
+        tile_pairs = np.stack((tile_pairs.min(axis=1), tile_pairs.max(axis=1)), axis=1)
+        return tile_pairs[owner_tiles[tile_pairs[:, 0]] == tile]
+
+    with ThreadPoolExecutor(max_workers=max(1, num_threads)) as executor: pairs = list(executor.map(get_tile_pairs, range(number_of_tiles)))
+    return np.concatenate(pairs)
+
+def get_connected_components(number_of_nodes: int, # number of nodes
+                             edges: np.ndarray, # Ex2 node index pairs
+):
+    """
+    Returns the root of the connected component of each node, the root is the lowest node index of the component.
+    It is a vectorized union-find: every edge hooks the larger root to the smaller one and the parent pointers are then compressed, until no edge connects two roots.
+    """
+    parents = np.arange(number_of_nodes)
+    while len(edges):
+        roots_i, roots_j = parents[edges[:, 0]], parents[edges[:, 1]]
+        different = roots_i != roots_j
+        if not np.any(different): break
+        edges, roots_i, roots_j = edges[different], roots_i[different], roots_j[different]
+        np.minimum.at(parents, np.maximum(roots_i, roots_j), np.minimum(roots_i, roots_j))
+        # pointer jumping until every node points to its root
+        while True:
+            grand_parents = parents[parents]
+            if np.array_equal(grand_parents, parents): break
+            parents = grand_parents
+    return parents
+
+def GridDBSCAN(points: np.ndarray, # NxD features
+               eps: float, # maximum distance between neighbors
+               min_samples: int, # minimum number of neighbors, the point itself included, of a core point
+               num_threads: int = 1, # number of threads for the neighbor search, the points are split into as many tiles
+               use_scipy: bool = True, # use the scipy KD-tree if scipy is installed
+):
+    """
+    Clusters the points with DBSCAN, same core points and core clusters as the `dbscan` package, border points get the cluster of their lowest-index core neighbor.
+
+    Returns:
+        tuple: Tuple containing the cluster label of each point (int32, -1 for noise, clusters are numbered by their lowest point index) and the core point mask.
+    """
+    points = np.ascontiguousarray(points, dtype=np.float64)
+    number_of_points = len(points)
+    pairs = get_tiled_neighbor_pairs(points, eps, num_threads, num_threads, use_scipy)
+
+    # core points
+    number_of_neighbors = np.bincount(pairs.ravel(), minlength=number_of_points) + 1
+    core_mask = number_of_neighbors >= min_samples
+
+    # clusters are the connected components of the core points
+    core_i, core_j = core_mask[pairs[:, 0]], core_mask[pairs[:, 1]]
+    roots = get_connected_components(number_of_points, pairs[core_i & core_j])
+
+    # border points get the cluster of their lowest-index core neighbor
+    border_pairs = np.concatenate((pairs[core_i & ~core_j], pairs[~core_i & core_j][:, ::-1]))
+    lowest_core_neighbor = np.full(number_of_points, number_of_points, dtype=np.int64)
+    np.minimum.at(lowest_core_neighbor, border_pairs[:, 1], border_pairs[:, 0])
+    border_mask = ~core_mask & (lowest_core_neighbor < number_of_points)
+    roots[border_mask] = roots[lowest_core_neighbor[border_mask]]
+
+    # number the clusters by their lowest point index, which is also their root
+    labels = np.full(number_of_points, -1, dtype=np.int32)
+    clustered = core_mask | border_mask
+    labels[clustered] = np.unique(roots[clustered], return_inverse=True)[1]
+    return labels, core_mask
@@ -0,0 +1,151 @@
+import numpy as np
+
+"""
+Range Image Background Filter (RIBF)
+
+It is a background filter for roadside LIDAR "structured" point cloud data.
+This (that is the term structured) means that every point of a frame belongs to a fixed (ring, azimuth) cell, so a frame can be represented by a fixed size HxW range image.
+
+For example:
+    - Ouster lidars yield HxW points per frame in ring-major order, including the cells without a return (at the origin).
+    - Other spinning lidars can be mapped to a range image from the elevation and azimuth angles of their points.
+
+The algorithm is summarized in the following steps:
+1. The background range of each pixel is learned as a percentile of its ranges over the first frames.
+2. Optionally, the background keeps adapting with a running (frugal) percentile estimate that moves it a small step towards every new range.
+3. A point is considered as foreground if it is closer than the background range of its pixel by more than a threshold, i.e. if it occludes the background.
+   Pixels that never had a return (e.g. sky) have an infinite background range, so any point falling in them is foreground.
+
+All steps are O(H·W) per frame and the memory is one HxW image, plus the learning frames until the background is learned.
+"""
+
+class RIBF:
+    """
+    Range image background model, an object of this class is called as filter(point_cloud, range_threshold) and returns the foreground mask.
+
+    Args:
+        image_height (int): Number of rings of the range image.
+        image_width (int): Number of azimuth columns of the range image.
+        vertical_fov (list): Minimum and maximum elevation in degrees, used to map the points to rings if they are not in ring-major order.
+        number_of_learning_frames (int): Number of frames the background range is learned from.
+        background_percentile (float): Percentile of the ranges of a pixel that is taken as its background range.
+        update_step (float): Step in lidar unit length by which the background range moves towards each new range after learning, 0 to freeze the background.
+        ring_major_order (bool): True if every frame has HxW points in ring-major order, otherwise the pixel of each point is computed from its elevation and azimuth.
+
+    Attributes:
+        image_height (int): Number of rings of the range image.
+        image_width (int): Number of azimuth columns of the range image.
+        vertical_fov (list): Minimum and maximum elevation in degrees.
+        ring_major_order (bool): True if every frame has HxW points in ring-major order.
+        background_percentile (float): Percentile of the ranges of a pixel that is taken as its background range.
+        update_step (float): Step by which the background range moves towards each new range, it can be changed between updates.
+        learning_frames (np.ndarray): Range images of the learning frames, None once the background is learned.
+        number_of_updates (int): Number of frames the model was updated with.
+        background_range (np.ndarray): HxW background range image, None until the background is learned.
+
+    Methods:
+        get_pixel_indices(self, point_cloud: np.ndarray): Returns the raveled range image pixel index of each point.
+        get_range_image(self, point_cloud: np.ndarray, pixel_indices: np.ndarray): Returns the range image of a point cloud.
+        update(self, point_cloud: np.ndarray): Updates the background range with a frame.
+        filter(self, point_cloud: np.ndarray, range_threshold: float): Returns the foreground mask of a point cloud.
+        __call__(self, point_cloud: np.ndarray, range_threshold: float): Same as filter.
+    """
+    def __init__(self, image_height: int, image_width: int, vertical_fov: list, number_of_learning_frames: int, background_percentile: float = 90, update_step: float = 0.0, ring_major_order: bool = False):
+        self.image_height = image_height
+        self.image_width = image_width
+        self.vertical_fov = vertical_fov
+        self.ring_major_order = ring_major_order
+        self.background_percentile = background_percentile
+        self.update_step = update_step
+        self.learning_frames = np.full((number_of_learning_frames, image_height * image_width), np.nan, dtype=np.float32)
+        self.number_of_updates = 0
+        self.background_range = None
+
+    def get_pixel_indices(self, point_cloud: np.ndarray):
+        """
+        Returns the raveled range image pixel index of each point. If ring_major_order is True, the i-th point is in the i-th pixel,
+        otherwise the ring and the column of each point are computed from its elevation and azimuth.
+
+        Args:
+            point_cloud (np.ndarray): Nx3 or Nx4 point cloud.
+
+        Returns:
+            np.ndarray: Raveled pixel index of each point.
+
+        Raises:
+            ValueError: If ring_major_order is True and the point cloud doesn't have HxW points.
+        """
+        if self.ring_major_order:
+            if len(point_cloud) != self.image_height * self.image_width: raise ValueError(f'expected {self.image_height * self.image_width} points in ring-major order, got {len(point_cloud)}')
+            return np.arange(len(point_cloud))
+        xyz = point_cloud[:,:3].astype(np.float64)
+        azimuth = np.arctan2(xyz[:,1], xyz[:,0])
+        elevation = np.degrees(np.arctan2(xyz[:,2], np.hypot(xyz[:,0], xyz[:,1])))
+        # the first ring is the top one, the first column is at azimuth -pi
+        rows = np.clip(np.floor((self.vertical_fov[1] - elevation) / (self.vertical_fov[1] - self.vertical_fov[0]) * self.image_height), 0, self.image_height - 1).astype(np.int64)
+        cols = np.floor((azimuth + np.pi) / (2 * np.pi) * self.image_width).astype(np.int64) % self.image_width
+        return rows * self.image_width + cols
+
+    def get_range_image(self, point_cloud: np.ndarray, pixel_indices: np.ndarray):
+        """
+        Returns the raveled range image of a point cloud, the closest point is kept if several points fall in the same pixel and pixels without a return are NaN.
+
+        Args:
+            point_cloud (np.ndarray): Nx3 or Nx4 point cloud.
+            pixel_indices (np.ndarray): Raveled pixel index of each point.
+
+        Returns:
+            np.ndarray: Raveled HxW range image.
+        """
+        ranges = np.linalg.norm(point_cloud[:,:3], axis=1).astype(np.float32)
+        range_image = np.full(self.image_height * self.image_width, np.inf, dtype=np.float32)
+        np.minimum.at(range_image, pixel_indices, ranges)
+        range_image[(range_image == 0) | np.isinf(range_image)] = np.nan
+        return range_image
+
+    def update(self, point_cloud: np.ndarray):
+        """
+        Updates the background range with a frame.
+
+        Args:
+            point_cloud (np.ndarray): Nx3 or Nx4 point cloud.
+        """
+        range_image = self.get_range_image(point_cloud, self.get_pixel_indices(point_cloud))
+        if self.learning_frames is not None:
+            self.learning_frames[self.number_of_updates] = range_image
+            self.number_of_updates += 1
+            # learn the background once all the learning frames are collected, pixels that never had a return have an infinite background range
+            if self.number_of_updates == len(self.learning_frames):
+                valid = np.any(~np.isnan(self.learning_frames), axis=0)
+                self.background_range = np.full(self.image_height * self.image_width, np.inf, dtype=np.float32)
+                self.background_range[valid] = np.nanpercentile(self.learning_frames[:, valid], self.background_percentile, axis=0)
+                self.learning_frames = None
+            return
+        self.number_of_updates += 1
+        if self.update_step <= 0: return
+        # frugal percentile estimate, the background moves up by step * q when the range is farther and down by step * (1 - q) otherwise,
+        # pixels without a learned background keep an infinite background range so that objects passing through them stay foreground
+        valid = ~np.isnan(range_image) & ~np.isinf(self.background_range)
+        background_range = self.background_range[valid]
+        q = self.background_percentile / 100.0
+        farther = range_image[valid] > background_range
+        background_range += np.where(farther, self.update_step * q, -self.update_step * (1.0 - q)).astype(np.float32)
+        self.background_range[valid] = background_range
+
+    def filter(self, point_cloud: np.ndarray, range_threshold: float):
+        """
+        Returns the foreground mask of a point cloud, points without a return (at the origin) are never foreground.
+
+        Args:
+            point_cloud (np.ndarray): Nx3 or Nx4 point cloud.
+            range_threshold (float): A point closer than the background range of its pixel by more than this threshold is considered as foreground.
+
+        Returns:
+            np.ndarray: Boolean mask, True for foreground points.
+        """
+        ranges = np.linalg.norm(point_cloud[:,:3], axis=1)
+        if self.background_range is None: return ranges > 0
+        return (ranges > 0) & (ranges < self.background_range[self.get_pixel_indices(point_cloud)] - range_threshold)
+
+    def __call__(self, point_cloud: np.ndarray, range_threshold: float):
+        return self.filter(point_cloud, range_threshold)
@@ -25,6 +25,10 @@ Since the number of points in each frame is not fixed, all the point clouds (gat
         - If the density is less than the threshold, the point is considered as foreground,
         - otherwise background.
 
+The bins are either uniform cartesian cubes, or spherical bins over (range, azimuth, elevation) with log-spaced ranges (see SphericalBins), which follow the
+sampling density of a lidar: the cells grow with the range like the spacing between the lidar rays, so there are far fewer cells than with cubes and the
+far-field cells are not almost empty.
+
 """
 
 def STDF(point_cloud_set: list, # a list of point clouds, points in each frame must be equal
@@ -39,13 +43,370 @@ def STDF(point_cloud_set: list, # a list of point clouds, points in each frame m
     histogram_3d, edges = np.histogramdd(point_cloud_set[:,:3], bins=(bins, bins, bins), range=[histogram_range, histogram_range, histogram_range])
     normalized_histogram_3d = histogram_3d / number_of_frames
     
-    def filter(point_cloud: np.ndarray, # Nx3 or Nx4,
-               background_density_threshold: float # if the point falls in a bin with density less than this threshold, it is considered as foreground
-    ):
-        voxel_indices = np.digitize(point_cloud[:,:3], bins) - 1
-        voxel_indices = np.clip(voxel_indices, 0, bins_per_side-1)
-        mask = normalized_histogram_3d[voxel_indices[:,0], voxel_indices[:,1], voxel_indices[:,2]] < background_density_threshold
-        return mask
+    return STDFFilter(bins, histogram=normalized_histogram_3d)
+
+class SphericalBins:
+    """
+    Spherical bins over (range, azimuth, elevation), the range edges are log-spaced between min_range_in_unit_length and lidar_range_in_unit_length so that the size
+    of a cell grows with the range like the spacing between the lidar rays. For ring-aligned bins, set vertical_fov and number_of_elevation_bins to the ones of the lidar.
+
+    Args:
+        lidar_range_in_unit_length (float): Maximum range of lidar in lidar unit length.
+        min_range_in_unit_length (float): Range of the first range edge.
+        number_of_range_bins (int): Number of range bins.
+        number_of_azimuth_bins (int): Number of azimuth bins over 360 degrees.
+        vertical_fov (list): Minimum and maximum elevation in degrees.
+        number_of_elevation_bins (int): Number of elevation bins.
+
+    Attributes:
+        range_edges (np.ndarray): Log-spaced range edges.
+        number_of_azimuth_bins (int): Number of azimuth bins over 360 degrees.
+        vertical_fov (list): Minimum and maximum elevation in degrees.
+        number_of_elevation_bins (int): Number of elevation bins.
+        shape (tuple): Number of range, azimuth and elevation bins.
+
+    Methods:
+        get_spherical_coordinates(self, points: np.ndarray): Returns the range, azimuth and elevation of the points.
+        get_in_range_mask(self, points: np.ndarray): Returns the mask of the points inside the bins.
+        get_voxel_keys(self, points: np.ndarray): Returns the packed integer key of the voxel of each point.
+        to_dict(self): Returns the parameters of the bins, they are used to save the bins.
+    """
+    def __init__(self, lidar_range_in_unit_length: float, min_range_in_unit_length: float, number_of_range_bins: int, number_of_azimuth_bins: int, vertical_fov: list, number_of_elevation_bins: int):
+        self.range_edges = np.geomspace(min_range_in_unit_length, lidar_range_in_unit_length, number_of_range_bins+1)
+        self.number_of_azimuth_bins = int(number_of_azimuth_bins)
+        self.vertical_fov = [float(vertical_fov[0]), float(vertical_fov[1])]
+        self.number_of_elevation_bins = int(number_of_elevation_bins)
+        self.shape = (number_of_range_bins, self.number_of_azimuth_bins, self.number_of_elevation_bins)
+
+    def get_spherical_coordinates(self, points: np.ndarray):
+        """
+        Returns the range, the azimuth in radians and the elevation in degrees of the points, in float64.
+        """
+        xyz = points[:,:3].astype(np.float64)
+        horizontal_range = np.hypot(xyz[:,0], xyz[:,1])
+        return np.hypot(horizontal_range, xyz[:,2]), np.arctan2(xyz[:,1], xyz[:,0]), np.degrees(np.arctan2(xyz[:,2], horizontal_range))
+
+    def get_in_range_mask(self, points: np.ndarray):
+        """
+        Returns the mask of the points inside the range edges and the vertical field of view, the last edges are inclusive.
+        """
+        ranges, _, elevations = self.get_spherical_coordinates(points)
+        return (self.range_edges[0] <= ranges) & (ranges <= self.range_edges[-1]) & (self.vertical_fov[0] <= elevations) & (elevations <= self.vertical_fov[1])
+
+    def get_voxel_keys(self, points: np.ndarray):
+        """
+        Returns the packed integer key (range_index * number_of_azimuth_bins + azimuth_index) * number_of_elevation_bins + elevation_index of the voxel of each point,
+        points outside the bins are clipped to the border voxels.
+        """
+        ranges, azimuths, elevations = self.get_spherical_coordinates(points)
+        number_of_range_bins = self.shape[0]
+        log_range_ratio = np.log(self.range_edges[-1] / self.range_edges[0])
+        range_indices = np.clip(np.floor(np.log(np.maximum(ranges, self.range_edges[0]) / self.range_edges[0]) / log_range_ratio * number_of_range_bins), 0, number_of_range_bins-1).astype(np.int64)
+        azimuth_indices = np.floor((azimuths + np.pi) / (2 * np.pi) * self.number_of_azimuth_bins).astype(np.int64) % self.number_of_azimuth_bins
+        elevation_indices = np.clip(np.floor((elevations - self.vertical_fov[0]) / (self.vertical_fov[1] - self.vertical_fov[0]) * self.number_of_elevation_bins), 0, self.number_of_elevation_bins-1).astype(np.int64)
+        return (range_indices * self.number_of_azimuth_bins + azimuth_indices) * self.number_of_elevation_bins + elevation_indices
+
+    def to_dict(self):
+        """
+        Returns the parameters of the bins, SphericalBins(**bins.to_dict()) creates the same bins.
+        """
+        return {'lidar_range_in_unit_length': float(self.range_edges[-1]), 'min_range_in_unit_length': float(self.range_edges[0]), 'number_of_range_bins': self.shape[0],
+                'number_of_azimuth_bins': self.number_of_azimuth_bins, 'vertical_fov': self.vertical_fov, 'number_of_elevation_bins': self.number_of_elevation_bins}
+
+def get_histogram_shape(bins, # bin edges, same for x, y and z, or SphericalBins
+):
+    """
+    Returns the shape of the dense histogram of the bins, the packed voxel keys are indices in the raveled histogram.
+    """
+    if isinstance(bins, SphericalBins): return bins.shape
+    bins_per_side = len(bins) - 1
+    return (bins_per_side, bins_per_side, bins_per_side)
+
+def are_bins_equal(bins_a, # bin edges, same for x, y and z, or SphericalBins
+                   bins_b, # bin edges, same for x, y and z, or SphericalBins
+):
+    """
+    Returns True if both bins are of the same kind and give the same voxels.
+    """
+    if isinstance(bins_a, SphericalBins) or isinstance(bins_b, SphericalBins):
+        return isinstance(bins_a, SphericalBins) and isinstance(bins_b, SphericalBins) and np.allclose(bins_a.range_edges, bins_b.range_edges) and bins_a.to_dict() == bins_b.to_dict()
+    return np.array_equal(bins_a, bins_b)
+
+def get_in_range_mask(points: np.ndarray, # Nx3 or Nx4
+                      bins: np.ndarray, # bin edges, same for x, y and z, or SphericalBins
+):
+    """
+    Returns the mask of the points inside the bins, as in np.histogramdd the last edge is inclusive.
+    """
+    if isinstance(bins, SphericalBins): return bins.get_in_range_mask(points)
+    return np.all((bins[0] <= points[:,:3]) & (points[:,:3] <= bins[-1]), axis=1)
+
+def get_voxel_keys(points: np.ndarray, # Nx3 or Nx4
+                   bins: np.ndarray, # bin edges, same for x, y and z, or SphericalBins
+):
+    """
+    Returns the packed integer key (x_index * bins_per_side + y_index) * bins_per_side + z_index of the voxel of each point, points outside the bins are clipped to the border voxels.
+    The key of a voxel is also its index in the raveled dense histogram.
+
+    The bins are uniform, so instead of a binary search over the bins (np.digitize) the index along each axis is computed as floor((x - bins[0]) / bin_width),
+    in float64 so that points close to a bin edge fall in the same bin as with np.digitize, and the keys are accumulated axis by axis.
+
+    Points with a NaN or infinite coordinate are in no voxel, their key is -1.
+    """
+    # non-finite coordinates are replaced before packing, so that the integer casts are defined
+    finite = np.isfinite(points[:,:3]).all(axis=1)
+    if not np.all(finite):
+        voxel_keys = get_voxel_keys(np.where(finite[:,None], points[:,:3], 0), bins)
+        voxel_keys[~finite] = -1
+        return voxel_keys
+    if isinstance(bins, SphericalBins): return bins.get_voxel_keys(points)
+    bins_per_side = len(bins) - 1
+    bins_per_unit_length = bins_per_side / (bins[-1] - bins[0])
+    voxel_keys = np.zeros(len(points), dtype=np.int64)
+    voxel_indices = np.empty(len(points), dtype=np.float64)
+    for axis in range(3):
+        np.subtract(points[:,axis], bins[0], out=voxel_indices, dtype=np.float64)
+        voxel_indices *= bins_per_unit_length
+        np.floor(voxel_indices, out=voxel_indices)
+        np.clip(voxel_indices, 0, bins_per_side-1, out=voxel_indices)
+        voxel_keys *= bins_per_side
+        voxel_keys += voxel_indices.astype(np.int64)
+    return voxel_keys
+
+def lookup_voxel_densities(voxel_keys: np.ndarray, # sorted keys of the stored voxels
+                           voxel_densities: np.ndarray, # densities of the stored voxels
+                           query_keys: np.ndarray, # keys to look up
+):
+    """
+    Returns the density of each query key, keys that are not stored have zero density.
+    """
+    if len(voxel_keys) == 0: return np.zeros(len(query_keys), dtype=np.float32)
+    positions = np.minimum(np.searchsorted(voxel_keys, query_keys), len(voxel_keys)-1)
+    return np.where(voxel_keys[positions] == query_keys, voxel_densities[positions], 0)
+
+class STDFAccumulator:
+    """
+    Accumulates the voxel counts of the frames one by one, so that a filter equal to the one of STDF is computed without stacking the frames,
+    the memory is one frame plus the counts of the occupied voxels.
+
+    Args:
+        lidar_range_in_unit_length (float): Maximum range of lidar in lidar unit length.
+        bins_per_unit_length (int): Number of bins per unit length.
+        bins (SphericalBins, optional): Spherical bins used instead of the cartesian bins. Defaults to None.
+
+    Attributes:
+        bins (np.ndarray): Bin edges, same for x, y and z, or SphericalBins.
+        voxel_keys (np.ndarray): Sorted keys of the occupied voxels.
+        voxel_counts (np.ndarray): Number of points accumulated in the occupied voxels.
+        number_of_frames (int): Number of accumulated frames.
+
+    Methods:
+        add(self, point_cloud: np.ndarray): Adds the voxel counts of a frame.
+        get_filter(self, sparse: bool): Returns the filter of the accumulated frames.
+    """
+    def __init__(self, lidar_range_in_unit_length: float, bins_per_unit_length: int, bins: SphericalBins = None):
+        bins_per_side = int(lidar_range_in_unit_length * bins_per_unit_length)
+        self.bins = bins if bins is not None else np.linspace(-lidar_range_in_unit_length, lidar_range_in_unit_length, bins_per_side+1)
+        self.voxel_keys = np.zeros(0, dtype=np.int64)
+        self.voxel_counts = np.zeros(0, dtype=np.int64)
+        self.number_of_frames = 0
+
+    def add(self, point_cloud: np.ndarray):
+        """
+        Adds the voxel counts of a frame.
+
+        Args:
+            point_cloud (np.ndarray): Nx3 or Nx4 point cloud.
+        """
+        frame_keys, frame_counts = np.unique(get_voxel_keys(point_cloud[get_in_range_mask(point_cloud, self.bins)], self.bins), return_counts=True)
+        # add the counts of the voxels that are already occupied, and insert the new voxels at their sorted positions
+        positions = np.searchsorted(self.voxel_keys, frame_keys)
+        occupied = positions < len(self.voxel_keys)
+        occupied[occupied] = self.voxel_keys[positions[occupied]] == frame_keys[occupied]
+        self.voxel_counts[positions[occupied]] += frame_counts[occupied]
+        self.voxel_keys = np.insert(self.voxel_keys, positions[~occupied], frame_keys[~occupied])
+        self.voxel_counts = np.insert(self.voxel_counts, positions[~occupied], frame_counts[~occupied])
+        self.number_of_frames += 1
+
+    def get_filter(self, sparse: bool = False):
+        """
+        Returns the filter of the accumulated frames.
+
+        Args:
+            sparse (bool, optional): If True the filter stores only the occupied voxels, so the memory depends on the number of occupied voxels instead of the cube of the number of bins per side, otherwise a dense histogram as in STDF. Defaults to False.
+
+        Returns:
+            STDFFilter: The filter.
+        """
+        if sparse: return STDFFilter(self.bins, voxel_keys=self.voxel_keys.copy(), voxel_densities=(self.voxel_counts / self.number_of_frames).astype(np.float32))
+        normalized_histogram_3d = np.zeros(get_histogram_shape(self.bins), dtype=np.float64)
+        normalized_histogram_3d.ravel()[self.voxel_keys] = self.voxel_counts / self.number_of_frames
+        return STDFFilter(self.bins, histogram=normalized_histogram_3d)
+
+class STDFFilter:
+    """
+    Background filter returned by STDF and STDFAccumulator, it is called as filter(point_cloud, background_density_threshold) and returns the foreground mask.
+
+    The voxel densities are stored either as a dense histogram or as sorted packed voxel keys with their densities, the densities of query points are then looked up
+    with a binary search over the keys and voxels that are not stored have zero density. A filter can be saved to a compressed .npz file,
+    with its bin edges and the parameters it was computed with, and loaded again, so that the frames do not have to be gathered again for a fixed sensor installation.
+    The file always stores the occupied voxels only.
+
+    Args:
+        bins (np.ndarray): Bin edges, same for x, y and z, or SphericalBins.
+        voxel_keys (np.ndarray, optional): Sorted keys of the occupied voxels. Defaults to None.
+        voxel_densities (np.ndarray, optional): Densities of the occupied voxels. Defaults to None.
+        histogram (np.ndarray, optional): Dense histogram of densities, used instead of voxel_keys and voxel_densities. Defaults to None.
+
+    Attributes:
+        bins (np.ndarray): Bin edges, same for x, y and z, or SphericalBins.
+        voxel_keys (np.ndarray): Sorted keys of the occupied voxels, None if the densities are dense.
+        voxel_densities (np.ndarray): Densities of the occupied voxels, None if the densities are dense.
+        histogram (np.ndarray): Dense histogram of densities, None if the densities are sparse.
+
+    Methods:
+        filter(self, point_cloud: np.ndarray, background_density_threshold: float): Returns the foreground mask of a point cloud.
+        __call__(self, point_cloud: np.ndarray, background_density_threshold: float): Same as filter.
+        get_sparse_densities(self): Returns the keys and densities of the occupied voxels.
+        save(self, file_path: str, params: dict): Saves the filter to a file.
+        load(file_path: str): Loads a filter from a file.
+    """
+    def __init__(self, bins: np.ndarray, voxel_keys: np.ndarray = None, voxel_densities: np.ndarray = None, histogram: np.ndarray = None):
+        self.bins = bins
+        self.voxel_keys = voxel_keys
+        self.voxel_densities = voxel_densities
+        self.histogram = histogram
+
+    def filter(self, point_cloud: np.ndarray, background_density_threshold: float):
+        """
+        Returns the foreground mask of a point cloud.
+
+        Args:
+            point_cloud (np.ndarray): Nx3 or Nx4 point cloud.
+            background_density_threshold (float): If the point falls in a bin with density less than this threshold, it is considered as foreground.
+
+        Returns:
+            np.ndarray: Boolean mask, True for foreground points.
+        """
+        query_keys = get_voxel_keys(point_cloud, self.bins)
+        # points with a non-finite coordinate (key -1) have zero density, i.e., they are foreground
+        if self.histogram is not None: densities = np.where(query_keys >= 0, self.histogram.ravel()[query_keys], 0)
+        else: densities = lookup_voxel_densities(self.voxel_keys, self.voxel_densities, query_keys)
+        return densities < background_density_threshold
+
+    def __call__(self, point_cloud: np.ndarray, background_density_threshold: float):
+        return self.filter(point_cloud, background_density_threshold)
+
+    def get_sparse_densities(self):
+        """
+        Returns the keys and densities of the occupied voxels.
+
+        Returns:
+            tuple: Tuple containing the sorted voxel keys (int64) and their densities (float32).
+        """
+        if self.histogram is None: return self.voxel_keys, self.voxel_densities
+        voxel_keys = np.flatnonzero(self.histogram).astype(np.int64)
+        return voxel_keys, self.histogram.ravel()[voxel_keys].astype(np.float32)
+
+    def save(self, file_path: str, params: dict = None):
+        """
+        Saves the filter to a compressed .npz file, the file is replaced atomically.
+
+        Args:
+            file_path (str): Path of the file.
+            params (dict, optional): Parameters the filter was computed with, they are stored for reference. Defaults to None.
+        """
+        import os
+        import json
+        voxel_keys, voxel_densities = self.get_sparse_densities()
+        os.makedirs(os.path.dirname(os.path.abspath(file_path)), exist_ok=True)
+        with open(file_path + '.tmp', 'wb') as f:
+            # cartesian bins are stored as their edges and spherical bins as their parameters
+            if isinstance(self.bins, SphericalBins): bins, spherical_bins = np.zeros(0), json.dumps(self.bins.to_dict())
+            else: bins, spherical_bins = self.bins, json.dumps(None)
+            np.savez_compressed(f, bins=bins, spherical_bins=spherical_bins, voxel_keys=voxel_keys, voxel_densities=voxel_densities, params=json.dumps(params if params is not None else dict()))
+        os.replace(file_path + '.tmp', file_path)
+
+    @staticmethod
+    def load(file_path: str):
+        """
+        Loads a filter saved with save.
+
+        Args:
+            file_path (str): Path of the file.
+
+        Returns:
+            tuple: Tuple containing the loaded STDFFilter, with sparse densities, and the dictionary of parameters it was computed with.
+        """
+        import json
+        with np.load(file_path) as data:
+            spherical_bins = json.loads(str(data['spherical_bins'])) if 'spherical_bins' in data else None
+            bins = SphericalBins(**spherical_bins) if spherical_bins is not None else data['bins']
+            stdf_filter = STDFFilter(bins, voxel_keys=data['voxel_keys'], voxel_densities=data['voxel_densities'])
+            params = json.loads(str(data['params']))
+        return stdf_filter, params
+
+class OnlineSTDF(STDFFilter):
+    """
+    Online version of the sparse STDFFilter, the voxel densities are updated from every incoming frame with an exponential moving average instead of being computed once from gathered frames.
+
+    After each update the density of a voxel is (1 - decay) * density + decay * number_of_points_in_voxel, so a voxel that gets the same number of points in every frame converges
+    to the same density as in STDF, and the background adapts to changes (e.g. parked cars) within about 1 / decay frames. Voxels whose density decays below prune_density are
+    removed, which keeps the memory bounded by the number of recently occupied voxels. An object of this class can be used in place of the filter returned by STDF.
+
+    Args:
+        lidar_range_in_unit_length (float): Maximum range of lidar in lidar unit length.
+        bins_per_unit_length (int): Number of bins per unit length.
+        decay (float): Weight of the newest frame in the moving average.
+        prune_density (float): Voxels with a density below this value are removed.
+        bins (SphericalBins, optional): Spherical bins used instead of the cartesian bins. Defaults to None.
+
+    Attributes:
+        bins (np.ndarray): Bin edges, same for x, y and z, or SphericalBins.
+        decay (float): Weight of the newest frame in the moving average, it can be changed between updates.
+        prune_density (float): Voxels with a density below this value are removed.
+        voxel_keys (np.ndarray): Sorted keys of the stored voxels.
+        voxel_densities (np.ndarray): Densities of the stored voxels.
+        number_of_updates (int): Number of frames the model was updated with.
+
+    Methods:
+        update(self, point_cloud: np.ndarray): Updates the voxel densities with a frame.
+        set_sparse_densities(self, voxel_keys: np.ndarray, voxel_densities: np.ndarray): Replaces the voxel densities, e.g. with the ones of a loaded filter.
+        filter(self, point_cloud: np.ndarray, background_density_threshold: float): Returns the foreground mask of a point cloud.
+        __call__(self, point_cloud: np.ndarray, background_density_threshold: float): Same as filter.
+    """
+    def __init__(self, lidar_range_in_unit_length: float, bins_per_unit_length: int, decay: float = 0.01, prune_density: float = 0.001, bins: SphericalBins = None):
+        bins_per_side = int(lidar_range_in_unit_length * bins_per_unit_length)
+        if bins is None: bins = np.linspace(-lidar_range_in_unit_length, lidar_range_in_unit_length, bins_per_side+1)
+        super().__init__(bins, voxel_keys=np.zeros(0, dtype=np.int64), voxel_densities=np.zeros(0, dtype=np.float32))
+        self.decay = decay
+        self.prune_density = prune_density
+        self.number_of_updates = 0
+
+    def update(self, point_cloud: np.ndarray):
+        """
+        Updates the voxel densities with a frame.
+
+        Args:
+            point_cloud (np.ndarray): Nx3 or Nx4 point cloud.
+        """
+        frame_keys, frame_counts = np.unique(get_voxel_keys(point_cloud[get_in_range_mask(point_cloud, self.bins)], self.bins), return_counts=True)
+        # merge the decayed densities with the counts of the frame, both key arrays are sorted and unique
+        all_keys = np.concatenate((self.voxel_keys, frame_keys))
+        all_densities = np.concatenate(((1.0 - self.decay) * self.voxel_densities, self.decay * frame_counts))
+        voxel_keys, inverse = np.unique(all_keys, return_inverse=True)
+        voxel_densities = np.bincount(inverse, weights=all_densities, minlength=len(voxel_keys)).astype(np.float32)
+        # prune voxels that are not occupied any more
+        keep = voxel_densities >= self.prune_density
+        self.voxel_keys, self.voxel_densities = voxel_keys[keep], voxel_densities[keep]
+        self.number_of_updates += 1
 
-    return filter
+    def set_sparse_densities(self, voxel_keys: np.ndarray, voxel_densities: np.ndarray):
+        """
+        Replaces the voxel densities, e.g. with the ones of a loaded filter computed with the same bins.
 
+        Args:
+            voxel_keys (np.ndarray): Sorted keys of the occupied voxels.
+            voxel_densities (np.ndarray): Densities of the occupied voxels.
+        """
+        self.voxel_keys, self.voxel_densities = voxel_keys.astype(np.int64), voxel_densities.astype(np.float32)
@@ -28,11 +28,12 @@ def create_per_object_pcdet_dataset(data_dict: dict, cfg_dict: dict):
     # imports
     import os
     import numpy as np
-    import open3d as o3d
+    from lbl.columnar import ColumnarLabelList
+    from pcd.utils import points_in_boxes
     
     # Get required data from data_dict
     current_point_cloud_numpy = data_dict['current_point_cloud_numpy']
-    current_label_list = data_dict['current_label_list']
+    current_label_list = ColumnarLabelList.from_label_list(data_dict['current_label_list'])
     current_label_path = os.path.basename(data_dict['current_point_cloud_path']).replace(cfg_dict['data']['lidar']['pcd_type'], '.txt')
     
     # Create output directories if they do not exist
@@ -43,22 +44,19 @@ def create_per_object_pcdet_dataset(data_dict: dict, cfg_dict: dict):
     lbl_output_dir = os.path.join(output_path, 'label')
     os.makedirs(lbl_output_dir, exist_ok=True)
     
-    for idx, label_dict in enumerate(current_label_list):
-        if 'lidar_bbox' not in label_dict: continue
+    # Get the points within the bounding boxes of all the labels at once
+    label_indices = np.flatnonzero(current_label_list.has_lidar_bbox)
+    inside_points, box_offsets = points_in_boxes(current_point_cloud_numpy, current_label_list.centers[label_indices], current_label_list.extents[label_indices], current_label_list.euler_angles[label_indices])
+    obj_classes = current_label_list.classes
+    
+    for box_idx, idx in enumerate(label_indices.tolist()):
         # Get bounding box center, extent, and euler angles
-        bbox_center = label_dict['lidar_bbox']['lidar_xyz_center'].copy()
-        bbox_extent = label_dict['lidar_bbox']['lidar_xyz_extent']
-        bbox_euler_angles = label_dict['lidar_bbox']['lidar_xyz_euler_angles']
-        R = o3d.geometry.OrientedBoundingBox.get_rotation_matrix_from_xyz(bbox_euler_angles)
+        bbox_center = current_label_list.centers[idx].copy()
+        bbox_extent = current_label_list.extents[idx]
+        bbox_euler_angles = current_label_list.euler_angles[idx]
         
-        # Create an oriented bounding box
-        try: rotated_bbox = o3d.geometry.OrientedBoundingBox(bbox_center, R, bbox_extent)
-        except:
-            logger.log(f'[algo->post.py->create_per_object_pcdet_dataset]: failed to create an OrientedBoundingBox, skipping ...', Logger.WARNING)
-            continue
         # Get points within the bounding box
-        inside_points = rotated_bbox.get_point_indices_within_bounding_box(o3d.utility.Vector3dVector(current_point_cloud_numpy[:, :3]))
-        object_point_cloud = current_point_cloud_numpy[inside_points]
+        object_point_cloud = current_point_cloud_numpy[inside_points[box_offsets[box_idx]:box_offsets[box_idx + 1]]]
         
         # Center the point cloud
         point_cloud_mean = np.mean(object_point_cloud[:, :3], axis=0)
@@ -76,7 +74,7 @@ def create_per_object_pcdet_dataset(data_dict: dict, cfg_dict: dict):
             lbl_str += str(bbox_center[0]) + ' ' + str(bbox_center[1]) + ' ' + str(bbox_center[2]) + ' '
             lbl_str += str(bbox_extent[0]) + ' ' + str(bbox_extent[1]) + ' ' + str(bbox_extent[2]) + ' '
             lbl_str += str(bbox_euler_angles[2]) + ' '
-            if 'class' in label_dict: lbl_str += label_dict['class']
+            if obj_classes[idx] is not None: lbl_str += obj_classes[idx]
             else: lbl_str += 'Unknown'
             f.write(lbl_str)
 
@@ -96,10 +94,11 @@ def create_pcdet_dataset(data_dict: dict, cfg_dict: dict):
     # imports
     import os
     import numpy as np
+    from lbl.columnar import ColumnarLabelList
 
     # Get required data from data_dict
     current_point_cloud_numpy = data_dict['current_point_cloud_numpy']
-    current_label_list = data_dict['current_label_list']
+    current_label_list = ColumnarLabelList.from_label_list(data_dict['current_label_list'])
     current_label_path = os.path.basename(data_dict['current_point_cloud_path']).replace(cfg_dict['data']['lidar']['pcd_type'], '.txt')
     
     # Create output directories if they do not exist
@@ -114,19 +113,11 @@ def create_pcdet_dataset(data_dict: dict, cfg_dict: dict):
     npy_path = os.path.join(pcd_output_dir, os.path.basename(current_label_path).replace('.txt', '.npy'))
     np.save(npy_path, current_point_cloud_numpy)
     
-    lbl_str = ''
-    for label_dict in current_label_list:
-        if 'lidar_bbox' not in label_dict: continue
-        # Get bounding box center, extent, and euler angles
-        bbox_center = label_dict['lidar_bbox']['lidar_xyz_center'].copy()
-        bbox_extent = label_dict['lidar_bbox']['lidar_xyz_extent']
-        bbox_euler_angles = label_dict['lidar_bbox']['lidar_xyz_euler_angles']
-        lbl_str += str(bbox_center[0]) + ' ' + str(bbox_center[1]) + ' ' + str(bbox_center[2]) + ' '
-        lbl_str += str(bbox_extent[0]) + ' ' + str(bbox_extent[1]) + ' ' + str(bbox_extent[2]) + ' '
-        lbl_str += str(bbox_euler_angles[2]) + ' '
-        if 'class' in label_dict: lbl_str += label_dict['class']
-        else: lbl_str += 'Unknown'
-        lbl_str += '\n'
+    # Format all the labels with a lidar bounding box at once: center, extent, yaw and class
+    current_label_list = current_label_list[current_label_list.has_lidar_bbox]
+    bboxes = np.column_stack((current_label_list.centers, current_label_list.extents, current_label_list.yaws))
+    obj_classes = [obj_class if obj_class is not None else 'Unknown' for obj_class in current_label_list.classes]
+    lbl_str = ''.join(' '.join(str(v) for v in bbox) + ' ' + obj_class + '\n' for bbox, obj_class in zip(bboxes, obj_classes))
 
     # Save the label
     lbl_path = os.path.join(lbl_output_dir, os.path.basename(current_label_path))
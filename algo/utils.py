@@ -3,6 +3,7 @@ This file contains utility functions that are used by the algorithms in the pipe
 '''
 
 from gui.logger_gui import Logger
+import numpy as np
 
 def gather_point_clouds(data_dict: dict, cfg_dict: dict, key: str, count: int, global_index_key: str = None):
     """
@@ -44,6 +45,48 @@ def gather_point_clouds(data_dict: dict, cfg_dict: dict, key: str, count: int, g
     return gathering_completed
 
 
+def accumulate_point_clouds(data_dict: dict, cfg_dict: dict, key: str, count: int, accumulate_fn, global_index_key: str = None):
+    """
+    Accumulates point clouds until a specified count is reached. Unlike gather_point_clouds, the point clouds are not stored but passed to accumulate_fn as they arrive,
+    e.g. to update a histogram, so that only the accumulated result is kept in memory.
+    
+    Args:
+        data_dict (dict): The dictionary containing the data.
+        cfg_dict (dict): The dictionary containing the configuration data.
+        key (str): The key to store the accumulated point clouds count in the data dictionary.
+        count (int): The desired count of point clouds to accumulate.
+        accumulate_fn (callable): The function called with each accumulated point cloud.
+        global_index_key (str, optional): The key to store the indices of the accumulated frames in the data dictionary. Defaults to None.
+    
+    Returns:
+        bool: True if the accumulation is completed, False otherwise.
+    """
+    logger: Logger = data_dict['logger']
+    
+    accumulation_not_started = key not in data_dict
+    if accumulation_not_started:
+        data_dict[key] = 0
+        logger.log(f'[algo->utils.py->accumulate_point_clouds[{key}]]: Accumulating {count} point clouds', Logger.INFO)
+    
+    if global_index_key is None:
+        global_index_key = f'{key}_accumulated_frames_indices'
+    if global_index_key not in data_dict:
+        data_dict[global_index_key] = []
+    
+    # Check if accumulation is completed
+    accumulation_completed = data_dict[key] >= count
+    point_cloud_is_present = 'current_point_cloud_numpy' in data_dict
+    point_cloud_is_novel = data_dict['current_frame_index'] not in data_dict[global_index_key]
+    
+    # Accumulate the point cloud if accumulation is not completed and the point cloud is present and novel
+    if not accumulation_completed and point_cloud_is_present and point_cloud_is_novel:
+        accumulate_fn(data_dict['current_point_cloud_numpy'])
+        data_dict[key] += 1
+        data_dict[global_index_key].append(data_dict['current_frame_index'])
+    
+    accumulation_completed = data_dict[key] >= count
+    return accumulation_completed
+
 def combine_gathers(data_dict: dict, cfg_dict: dict, key: str, gather_keys: list):
     """
     Combines multiple gathers into a single gather.
@@ -105,4 +148,82 @@ def skip_frames(data_dict: dict, cfg_dict: dict, key: str, skip: int, global_ind
         data_dict[global_index_key].append(data_dict['current_frame_index'])
         
     skipping_completed = data_dict[key] >= skip
-    return skipping_completed
\ No newline at end of file
+    return skipping_completed
+
+def get_label_filter_mask(label_list, min_xyz: list = None, max_xyz: list = None, classes: list = None, min_score: float = None, point_cloud: np.ndarray = None, min_points: int = None) -> np.ndarray:
+    """
+    Evaluates label filtering predicates for all the labels at once. A label is kept if it satisfies all the given predicates, a predicate is skipped if its parameters are None.
+    The range and points predicates only apply to labels with a lidar bounding box, the score predicate only applies to labels with a score, other labels pass them.
+    
+    Args:
+        label_list (list or ColumnarLabelList): The labels to filter.
+        min_xyz (list, optional): Minimum x, y, z of the bounding box centers. Defaults to None.
+        max_xyz (list, optional): Maximum x, y, z of the bounding box centers. Defaults to None.
+        classes (list, optional): Classes to keep. Defaults to None.
+        min_score (float, optional): Minimum detection score. Defaults to None.
+        point_cloud (np.ndarray, optional): The point cloud used to count the points inside the bounding boxes. Defaults to None.
+        min_points (int, optional): Minimum number of points inside the bounding boxes. Defaults to None.
+    
+    Returns:
+        np.ndarray: A (K,) boolean mask, True for the labels to keep.
+    """
+    from lbl.columnar import ColumnarLabelList
+    label_list = ColumnarLabelList.from_label_list(label_list)
+    mask = np.ones(len(label_list), dtype=bool)
+    has_lidar_bbox = label_list.has_lidar_bbox
+    
+    # range predicate
+    if min_xyz is not None and max_xyz is not None:
+        min_xyz, max_xyz = np.asarray(min_xyz, dtype=np.float32), np.asarray(max_xyz, dtype=np.float32)
+        mask &= ~has_lidar_bbox | np.all((min_xyz <= label_list.centers) & (label_list.centers <= max_xyz), axis=1)
+    
+    # class predicate
+    if classes is not None:
+        class_ids = [label_list.class_name_ids[obj_class] for obj_class in classes if obj_class in label_list.class_name_ids]
+        mask &= np.isin(label_list.class_ids, class_ids)
+    
+    # score predicate
+    if min_score is not None:
+        scores = label_list.scores
+        mask &= np.isnan(scores) | (scores >= min_score)
+    
+    # points predicate, points are only counted for the labels that passed the other predicates
+    if min_points is not None and point_cloud is not None:
+        from pcd.utils import count_points_in_boxes
+        candidates = np.flatnonzero(mask & has_lidar_bbox)
+        counts = count_points_in_boxes(point_cloud, label_list.centers[candidates], label_list.extents[candidates], label_list.euler_angles[candidates])
+        mask[candidates[counts < min_points]] = False
+    
+    return mask
+
+# models are cached at module level, so that they outlive resets of data_dict, only the model of the current key is kept for each algo
+models = dict()
+
+def get_cached_model(algo_name: str, key, create_fn):
+    """
+    Returns the model cached for an algo under a key, the model is created with create_fn if the algo has no model cached under this key,
+    in which case the previous model of the algo is evicted.
+
+    Args:
+        algo_name (str): Name of the algo the model belongs to.
+        key (hashable): Key of the model, e.g., a tuple of the parameters the model is created with.
+        create_fn (callable): Function without arguments that creates the model.
+
+    Returns:
+        object: The cached model.
+    """
+    if algo_name not in models or models[algo_name][0] != key:
+        # the previous model is released before the new one is created
+        models.pop(algo_name, None)
+        models[algo_name] = (key, create_fn())
+    return models[algo_name][1]
+
+def clear_cached_models(algo_name: str = None):
+    """
+    Releases the cached model of an algo, or of all the algos.
+
+    Args:
+        algo_name (str, optional): Name of the algo, None for all the algos. Defaults to None.
+    """
+    if algo_name is None: models.clear()
+    else: models.pop(algo_name, None)
@@ -1,8 +1,12 @@
 import os
 import glob
 import time
+import hashlib
 import threading
 
+from calib.utils import add_composite_transforms
+from utils.cache import ParsedCache
+
 calib_dir = os.path.dirname(os.path.realpath(__file__))
 
 supported_calib_types = [clb_handler.split('_')[1].replace('.py','') for clb_handler in os.listdir(calib_dir) if 'handler' in clb_handler]
@@ -40,6 +44,12 @@ class FileIO:
         file_basenames.sort(key=lambda file_name: int(''.join(filter(str.isdigit, file_name))))
         self.files_basenames = file_basenames[:self.clb_count]
         
+        # identical calibration files share one calibration dictionary, keyed by the hash of the file content
+        self.unique_calibs = {}
+        # parsed calibrations of unchanged files are loaded from a binary cache instead of being parsed again
+        if cfg['data']['calib'].get('cache_parsed', False): self.parsed_cache = ParsedCache(os.path.join(cfg['data']['path'], 'cache', cfg['data']['calib_subdir'], f'parsed_{self.clb_type}.npz'))
+        else: self.parsed_cache = None
+        
         # read the calibration files in async mode
         self.data_lock = threading.Lock()
         self.data = []
@@ -59,6 +69,31 @@ class FileIO:
         clb_path = os.path.join(self.clb_dir, self.files_basenames[idx] + self.clb_ext)
         return clb_path
     
+    def __read_calib__(self, clb_abs_path: str):
+        """
+        Read a calibration file, a calibration that was already read from an identical file or cached for an unchanged file is reused,
+        otherwise the calibration is read and its composite transforms are precomputed.
+
+        Args:
+            clb_abs_path (str): Absolute path of the calibration file.
+
+        Returns:
+            dict: Calibration data shared by all the identical calibration files.
+        """
+        if not os.path.exists(clb_abs_path): return self.reader(clb_abs_path)
+        if self.parsed_cache:
+            cache_hit, calib = self.parsed_cache.get(clb_abs_path)
+            if cache_hit: return calib
+        with open(clb_abs_path, 'rb') as f: clb_hash = hashlib.sha1(f.read()).hexdigest()
+        with self.data_lock:
+            if clb_hash in self.unique_calibs: calib = self.unique_calibs[clb_hash]
+            else: calib = None
+        if calib is None:
+            calib = add_composite_transforms(self.reader(clb_abs_path))
+            with self.data_lock: calib = self.unique_calibs.setdefault(clb_hash, calib)
+        if self.parsed_cache: self.parsed_cache.put(clb_abs_path, calib)
+        return calib
+    
     def __async_read_fn__(self):
         """
         Asynchronously read all the calibration files.
@@ -66,9 +101,10 @@ class FileIO:
         for idx in range(len(self.files_basenames)):
             if self.stop.is_set(): break
             clb_abs_path = self.get_abs_path(idx)
-            calib = self.reader(clb_abs_path)
+            calib = self.__read_calib__(clb_abs_path)
             with self.data_lock: self.data.append((clb_abs_path, calib))
             time.sleep(self.cfg['threads']['io_sleep'])
+        if self.parsed_cache: self.parsed_cache.save()
         
     def __len__(self):
         """
@@ -93,7 +129,7 @@ class FileIO:
             with self.data_lock: return self.data[idx]
         except:
             clb_abs_path = self.get_abs_path(idx)
-            calib = self.reader(clb_abs_path)
+            calib = self.__read_calib__(clb_abs_path)
             return (clb_abs_path, calib)
         
     def close(self):
@@ -0,0 +1,75 @@
+import numpy as np
+
+"""
+The module utils.py contains utility functions for working with calibration data. If you think that a function can be reused in other parts of the framework, you can move it to the utils.py module.
+"""
+
+def add_composite_transforms(calib: dict) -> dict:
+    """
+    Adds the composite transforms of a calibration to the calibration dictionary, so that they are computed once per unique calibration instead of once per frame or label.
+    The following float32 matrices are added:
+        Tr_velo_to_rect (4x4): R0_rect @ Tr_velo_to_cam, lidar to rectified camera coordinates.
+        Tr_velo_to_pixel (3x4): P2 @ R0_rect @ Tr_velo_to_cam, lidar to homogeneous image pixel coordinates.
+        Tr_cam_to_velo (4x4): inverse of Tr_velo_to_cam, camera to lidar coordinates.
+        Tr_rect_to_velo (4x4): inverse of Tr_velo_to_rect, rectified camera to lidar coordinates.
+
+    Args:
+        calib (dict): Calibration dictionary containing P2, Tr_velo_to_cam and optionally R0_rect.
+
+    Returns:
+        dict: The same calibration dictionary with the composite transforms added, or the input if it is not a valid calibration.
+
+    """
+    if calib is None or 'P2' not in calib or 'Tr_velo_to_cam' not in calib: return calib
+    # compose in float64 and store in float32 like the rest of the calibration
+    P2 = np.asarray(calib['P2'], dtype=np.float64)
+    R0_rect = np.asarray(calib['R0_rect'], dtype=np.float64) if 'R0_rect' in calib else np.eye(4)
+    Tr_velo_to_cam = np.asarray(calib['Tr_velo_to_cam'], dtype=np.float64)
+    Tr_velo_to_rect = R0_rect @ Tr_velo_to_cam
+    calib['Tr_velo_to_rect'] = Tr_velo_to_rect.astype(np.float32)
+    calib['Tr_velo_to_pixel'] = (P2 @ Tr_velo_to_rect).astype(np.float32)
+    calib['Tr_cam_to_velo'] = np.linalg.inv(Tr_velo_to_cam).astype(np.float32)
+    calib['Tr_rect_to_velo'] = np.linalg.inv(Tr_velo_to_rect).astype(np.float32)
+    return calib
+
+def get_velo_to_pixel_transform(calib: dict) -> np.ndarray:
+    """
+    Returns the 3x4 lidar to homogeneous image pixel coordinates transform of a calibration, precomputed if available.
+
+    Args:
+        calib (dict): Calibration dictionary.
+
+    Returns:
+        np.ndarray: 3x4 transform.
+
+    """
+    if 'Tr_velo_to_pixel' in calib: return calib['Tr_velo_to_pixel']
+    return add_composite_transforms(dict(calib))['Tr_velo_to_pixel']
+
+def get_velo_to_rect_transform(calib: dict) -> np.ndarray:
+    """
+    Returns the 4x4 lidar to rectified camera coordinates transform of a calibration, precomputed if available.
+
+    Args:
+        calib (dict): Calibration dictionary.
+
+    Returns:
+        np.ndarray: 4x4 transform.
+
+    """
+    if 'Tr_velo_to_rect' in calib: return calib['Tr_velo_to_rect']
+    return add_composite_transforms(dict(calib))['Tr_velo_to_rect']
+
+def get_cam_to_velo_transform(calib: dict) -> np.ndarray:
+    """
+    Returns the 4x4 camera to lidar coordinates transform of a calibration, precomputed if available.
+
+    Args:
+        calib (dict): Calibration dictionary.
+
+    Returns:
+        np.ndarray: 4x4 transform.
+
+    """
+    if 'Tr_cam_to_velo' in calib: return calib['Tr_cam_to_velo']
+    return np.linalg.inv(calib['Tr_velo_to_cam'])
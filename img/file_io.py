@@ -3,6 +3,12 @@ import os
 import glob
 import time
 import threading
+import collections
+import json
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+
+supported_decode_scales = {1: cv2.IMREAD_UNCHANGED, 2: cv2.IMREAD_REDUCED_COLOR_2, 4: cv2.IMREAD_REDUCED_COLOR_4, 8: cv2.IMREAD_REDUCED_COLOR_8}
 
 class FileIO:
     """
@@ -17,15 +23,27 @@ class FileIO:
         img_type (str): File extension of the image files.
         img_count (int): Number of image files to read.
         files_basenames (list): List of file basenames (without extension) of the image files.
+        decode_threads (int): Number of threads decoding the image files in the background.
+        decode_scale (int): Images are decoded at 1/decode_scale of their resolution, can be 1, 2, 4, or 8. Reduced scales are meant for visualization-only sessions.
         reader (function): Function to read an image file.
+        cache_dir (str): Directory of the decoded frames cache, None if data:camera:decoded_cache is False.
+        cache_frames (numpy.memmap): Flat memory-mapped uint8 array of the raw bytes of the decoded RGB frames, None if the cache is disabled or not built yet.
+        cache_index (list): Byte offset in cache_frames, shape and dtype of each decoded frame.
+        cache_writer (dict): State of the cache being built on the first pass, None if the cache is disabled or already built.
+        pool (ThreadPoolExecutor): Pool of decode_threads threads decoding the images, shared by the background reading and the full resolution decoding.
+        full_resolution_futures (dict): Dictionary mapping the frame indices to the futures of their full resolution decoding, used if decode_scale is not 1.
         data_lock (threading.Lock): Lock for thread-safe access to the data list.
         data (list): List of tuples containing the file absolute path and the image data.
         stop (threading.Event): Event to signal the thread to stop.
 
     Methods:
         __init__(self, cfg: dict): Initializes the FileIO object.
-        __read_img__(self, file_abs_path: str): Reads an image file and returns the image data.
+        __read_img__(self, file_abs_path: str, decode_scale: int): Reads an image file and returns the image data.
         get_abs_path(self, idx: int): Returns the absolute path of the image file at the given index.
+        get_full_resolution(self, idx: int): Returns the image data at full resolution and file absolute path at the given index.
+        __open_cache__(self): Opens the decoded frames cache or creates it if it is missing or outdated.
+        __read_frame__(self, idx: int): Reads the image at the given index from the cache or decodes it.
+        __write_frame__(self, idx: int, img_np): Appends a decoded image to the cache being built.
         __async_read_fn__(self): Asynchronously reads the image files and populates the data list.
         __len__(self): Returns the number of image files.
         __getitem__(self, idx): Returns the image data and file absolute path at the given index.
@@ -43,29 +61,111 @@ class FileIO:
         # Sort the file basenames based on the numerical part
         file_basenames.sort(key=lambda file_name: int(''.join(filter(str.isdigit, file_name))))
         self.files_basenames = file_basenames[:self.img_count]
+        self.decode_threads = max(1, cfg['data']['camera'].get('decode_threads', 1))
+        self.decode_scale = cfg['data']['camera'].get('decode_scale', 1)
+        if self.decode_scale not in supported_decode_scales: raise NotImplementedError("Decode scale not supported. Supported decode scales: " + ', '.join([str(scale) for scale in supported_decode_scales]) + ".")
         self.reader = self.__read_img__
 
+        # decoded frames cache, reopening a dataset costs a page-cache lookup instead of a decode per frame
+        self.cache_dir = os.path.join(cfg['data']['path'], 'cache', cfg['data']['camera_subdir']) if cfg['data']['camera'].get('decoded_cache', False) else None
+        self.cache_frames, self.cache_index, self.cache_writer = None, None, None
+        if self.cache_dir and len(self.files_basenames) > 0: self.__open_cache__()
+
+        # cv2 releases the GIL while decoding, so the images are decoded in parallel
+        self.pool = ThreadPoolExecutor(max_workers=self.decode_threads)
+        self.full_resolution_futures = {}
+
         self.data_lock = threading.Lock()
         self.data = []
         self.stop = threading.Event()
         # Start the asynchronous reading thread
         threading.Thread(target=self.__async_read_fn__).start()
 
-    def __read_img__(self, file_abs_path: str):
+    def __read_img__(self, file_abs_path: str, decode_scale: int = None):
         """
         Reads an image file and returns the image data in RGB format.
 
         Args:
             file_abs_path (str): Absolute path of the image file.
+            decode_scale (int, optional): The image is decoded at 1/decode_scale of its resolution. Defaults to self.decode_scale.
 
         Returns:
             numpy.ndarray: Image data in RGB format.
 
         """
-        img_bgr = cv2.imread(file_abs_path, cv2.IMREAD_UNCHANGED)
+        if decode_scale is None: decode_scale = self.decode_scale
+        # reduced decoding is done by the codec itself, e.g. jpeg decodes only the required DCT coefficients
+        img_bgr = cv2.imread(file_abs_path, supported_decode_scales[decode_scale])
         img_rgb = cv2.cvtColor(img_bgr, cv2.COLOR_BGR2RGB)
         return img_rgb
 
+    def __open_cache__(self):
+        """
+        Opens the decoded frames cache if it was built for the current image files, otherwise starts building it. The cache consists of a flat memory-mapped
+        file holding the raw bytes of the decoded frames back to back (e.g. 16-bit images keep their depth) and an index file listing the image files with their
+        sizes and modification times, and the byte offset, shape and dtype of each frame in the flat file. The frames are written to a temporary file that replaces
+        the flat file only once all the frames are cached, so that memory maps of a previous cache stay valid, and the index is written after it.
+
+        """
+        os.makedirs(self.cache_dir, exist_ok=True)
+        cache_name = f'decoded_{self.img_type[1:]}_scale_{self.decode_scale}'
+        index_path = os.path.join(self.cache_dir, cache_name + '_index.json')
+        frames_path = os.path.join(self.cache_dir, cache_name + '_frames.bin')
+
+        files = []
+        for idx in range(len(self.files_basenames)):
+            file_stat = os.stat(self.get_abs_path(idx))
+            files.append([self.files_basenames[idx], file_stat.st_size, file_stat.st_mtime_ns])
+
+        # reuse the cache if it was built for exactly the same files
+        if os.path.exists(index_path) and os.path.exists(frames_path):
+            with open(index_path) as f: index = json.load(f)
+            if index['files'] == files and all(len(frame) == 3 for frame in index['frames']):
+                self.cache_index = index['frames']
+                self.cache_frames = np.memmap(frames_path, dtype=np.uint8, mode='r')
+                return
+
+        # otherwise build the cache while decoding the images, invalidate the old index first
+        if os.path.exists(index_path): os.remove(index_path)
+        self.cache_writer = {'index_path': index_path, 'frames_path': frames_path, 'files': files, 'frames_file': open(frames_path + '.tmp', 'wb'), 'offset': 0}
+        self.cache_index = [None] * len(files)
+
+    def __read_frame__(self, idx: int):
+        """
+        Reads the image at the given index from the decoded frames cache, or decodes it if it is not cached.
+
+        Args:
+            idx (int): Index of the image file.
+
+        Returns:
+            numpy.ndarray: Image data in RGB format, a read-only view into the cache if the image is cached.
+
+        """
+        if self.cache_frames is None: return self.reader(self.get_abs_path(idx))
+        offset, shape, dtype = self.cache_index[idx]
+        dtype = np.dtype(dtype)
+        return self.cache_frames[offset:offset + int(np.prod(shape)) * dtype.itemsize].view(np.ndarray).view(dtype).reshape(shape)
+
+    def __write_frame__(self, idx: int, img_np):
+        """
+        Appends a decoded image to the decoded frames cache that is being built, and writes the index once all the frames are cached.
+
+        Args:
+            idx (int): Index of the image file.
+            img_np (numpy.ndarray): Decoded image data.
+
+        """
+        if self.cache_writer is None: return
+        img_np = np.ascontiguousarray(img_np)
+        self.cache_writer['frames_file'].write(img_np.tobytes())
+        self.cache_index[idx] = [self.cache_writer['offset'], list(img_np.shape), img_np.dtype.str]
+        self.cache_writer['offset'] += img_np.nbytes
+        if idx < len(self.cache_index) - 1: return
+        self.cache_writer['frames_file'].close()
+        os.replace(self.cache_writer['frames_path'] + '.tmp', self.cache_writer['frames_path'])
+        with open(self.cache_writer['index_path'], 'w') as f: json.dump({'files': self.cache_writer['files'], 'frames': self.cache_index}, f)
+        self.cache_writer = None
+
     def get_abs_path(self, idx: int):
         """
         Returns the absolute path of the image file at the given index.
@@ -79,20 +179,60 @@ class FileIO:
         """
         return os.path.join(self.img_dir, self.files_basenames[idx] + self.img_type)
 
+    def get_full_resolution(self, idx: int):
+        """
+        Returns the image data at full resolution and file absolute path at the given index, if decode_scale is not 1 the image and the next decode_threads images are decoded at full resolution in the pool, keyed by their frame index.
+
+        Args:
+            idx (int): Index of the image file.
+
+        Returns:
+            tuple: Tuple containing the file absolute path and the full resolution image data.
+
+        """
+        if self.decode_scale == 1: return self[idx]
+        # the full resolution images of the next frames are decoded in the pool while the current frame is processed
+        required_idxs = range(idx, min(idx + self.decode_threads + 1, len(self.files_basenames)))
+        for required_idx in required_idxs:
+            if required_idx not in self.full_resolution_futures: self.full_resolution_futures[required_idx] = self.pool.submit(self.reader, self.get_abs_path(required_idx), 1)
+        # frames that are not required anymore (e.g. after a jump) are dropped
+        for cached_idx in [cached_idx for cached_idx in self.full_resolution_futures if cached_idx not in required_idxs]: self.full_resolution_futures.pop(cached_idx).cancel()
+        return (self.get_abs_path(idx), self.full_resolution_futures[idx].result())
+
     def __async_read_fn__(self):
         """
-        Asynchronously reads the image files and populates the data list.
+        Asynchronously decodes the image files using the pool of decode_threads threads and populates the data list in order.
 
         """
+        # keep a bounded number of images in flight to preserve the order and bound the memory
+        in_flight = collections.deque()
         for idx in range(len(self.files_basenames)):
             if self.stop.is_set():
                 break
             file_abs_path = self.get_abs_path(idx)
-            pcd_np = self.reader(file_abs_path)
+            # the pool is shut down when the reader is closed
+            try: in_flight.append((file_abs_path, self.pool.submit(self.__read_frame__, idx)))
+            except RuntimeError: break
+            if len(in_flight) < 2 * self.decode_threads: continue
+            file_abs_path, img_future = in_flight.popleft()
+            img_np = img_future.result()
+            # frames are cached in order, so the cache file is written sequentially
+            self.__write_frame__(len(self.data), img_np)
             with self.data_lock:
                 # append the file absolute path and the image data to the data list
-                self.data.append((file_abs_path, pcd_np))
+                self.data.append((file_abs_path, img_np))
             time.sleep(self.cfg['threads']['io_sleep'])
+        while len(in_flight) > 0 and not self.stop.is_set():
+            file_abs_path, img_future = in_flight.popleft()
+            img_np = img_future.result()
+            self.__write_frame__(len(self.data), img_np)
+            with self.data_lock:
+                self.data.append((file_abs_path, img_np))
+        for _, img_future in in_flight: img_future.cancel()
+        # an incomplete cache is discarded, it is rebuilt on the next open
+        if self.cache_writer is not None:
+            self.cache_writer['frames_file'].close()
+            os.remove(self.cache_writer['frames_path'] + '.tmp')
 
     def __len__(self):
         """
@@ -117,15 +257,20 @@ class FileIO:
         """
         try:
             with self.data_lock:
-                return self.data[idx]
+                file_abs_path, img_np = self.data[idx]
         except:
             file_abs_path = self.get_abs_path(idx)
-            # return the file absolute path and the image data
-            return (file_abs_path, self.reader(file_abs_path))
+            img_np = self.__read_frame__(idx)
+        # frames backed by the cache are read-only, copy them so that processes can modify them in-place
+        if not img_np.flags.writeable: img_np = img_np.copy()
+        # return the file absolute path and the image data
+        return (file_abs_path, img_np)
 
     def close(self):
         """
         Stops the asynchronous reading process.
 
         """
-        self.stop.set()
\ No newline at end of file
+        self.stop.set()
+        for img_future in self.full_resolution_futures.values(): img_future.cancel()
+        self.pool.shutdown(wait=False)
\ No newline at end of file
@@ -0,0 +1,76 @@
+import os
+import glob
+
+import cv2
+
+from utils.replay import FileReplay
+
+class Handler:
+    """
+    A class that replays image files from disk as if they were streamed by a live camera.
+
+    The files under `data:path/data:camera_subdir` are emitted by a background thread either at a fixed rate (`sensors:camera:replay_hz`)
+    or at their original timestamps (`replay_hz: 0`, falling back to 10 Hz if all timestamps are identical). Emitted frames are pushed into a bounded buffer of size `sensors:camera:replay_buffer_size`;
+    if the pipeline does not consume frames fast enough, the oldest frames are dropped just like a camera dropping frames.
+
+    The original timestamps are read from a `timestamps.txt` file (one timestamp per line, either in seconds or in `YYYY-MM-DD HH:MM:SS.fffffffff` format)
+    located in the camera subdirectory or, if it is not present, from the modification times of the files.
+
+    Args:
+        cfg (dict): Configuration dictionary containing camera settings.
+
+    Attributes:
+        manufacturer (str): The manufacturer of the camera, always `file`.
+        model (str): The model of the camera, always `replay`.
+        serial_no (str): The serial number of the camera.
+        files (list): List of absolute paths of the replayed image files.
+        emit_offsets (numpy.ndarray): Emission time of each file in seconds relative to the start of the replay.
+        stats (dict): Replay statistics, i.e., number of emitted, consumed and dropped frames, and consumer latencies in seconds.
+        replay (FileReplay): Replay of the files.
+        reader (generator): A generator that yields image arrays, it blocks until the next frame is emitted.
+
+    Raises:
+        Exception: If no image file is found in the camera subdirectory.
+    """
+
+    def __init__(self, cfg):
+        self.manufacturer = cfg['sensors']['camera']['manufacturer'].lower()
+        self.model = cfg['sensors']['camera']['model'].lower().replace('-', '')
+        self.serial_no = cfg['sensors']['camera']['serial_number'].lower()
+
+        # Replay parameters
+        self.replay_hz = cfg['sensors']['camera'].get('replay_hz', 10)
+        self.replay_loop = cfg['sensors']['camera'].get('replay_loop', True)
+        buffer_size = cfg['sensors']['camera'].get('replay_buffer_size', 1)
+
+        # List the image files
+        img_dir = os.path.join(cfg['data']['path'], cfg['data']['camera_subdir'])
+        img_type = cfg['data']['camera']['img_type']
+        files = glob.glob(os.path.join(img_dir, '*' + img_type))
+        files.sort(key=lambda file_name: int(''.join(filter(str.isdigit, os.path.basename(file_name)))))
+        self.files = files[:cfg['data']['size']]
+        if len(self.files) == 0: raise Exception(f"No {img_type} files found in {img_dir} to replay.")
+
+        # Emit the files from a background thread
+        self.replay = FileReplay(self.files, self.__read__, self.replay_hz, self.replay_loop, buffer_size, img_dir)
+        self.emit_offsets = self.replay.emit_offsets
+        self.stats = self.replay.stats
+        self.reader = self.replay.reader
+
+    def __read__(self, file_abs_path: str):
+        """
+        Reads an image file.
+
+        Args:
+            file_abs_path (str): Absolute path of the image file.
+
+        Returns:
+            numpy.ndarray: BGR image, as delivered by camera sensors.
+        """
+        return cv2.imread(file_abs_path, cv2.IMREAD_COLOR)
+
+    def close(self):
+        """
+        Stops the replay and closes the reader.
+        """
+        self.replay.close()
@@ -0,0 +1,218 @@
+import cv2
+import os
+import glob
+import threading
+import collections
+import numpy as np
+
+supported_video_types = ['.mp4', '.mkv', '.avi']
+
+class VideoIO:
+    """
+    Class for reading frames from a collection of video files as if they were a collection of image files.
+
+    The video files under data:path/data:camera_subdir are sorted by the numerical part of their names and their frames are concatenated into one sequence.
+    A frame index maps every frame to its video file, and a keyframe index (built by scanning the compressed packets, without decoding) tells where decoding
+    has to start to reach a frame. A background thread decodes sequentially ahead of the requested frame, so playing forward never seeks and jumping to a frame
+    seeks to its preceding keyframe only if the frame cannot be reached by decoding forward from the current position.
+
+    Args:
+        cfg (dict): Configuration dictionary containing the necessary parameters.
+
+    Attributes:
+        cfg (dict): Configuration dictionary.
+        img_dir (str): Directory path where the video files are located.
+        img_type (str): File extension of the video files.
+        img_count (int): Number of frames to read.
+        files (list): List of absolute paths of the video files.
+        frame_offsets (numpy.ndarray): Index of the first frame of each video file in the concatenated sequence, with the total number of frames appended.
+        keyframes (list): List of numpy arrays with the local indices of the keyframes of each video file, None for a video file whose packets could not be scanned.
+        read_ahead (int): Number of frames decoded ahead of the requested frame.
+        cursor (int): Index of the last requested frame.
+        data_lock (threading.Condition): Condition for thread-safe access to the data dictionary.
+        data (collections.OrderedDict): Dictionary mapping frame indices to tuples containing the video file absolute path and the frame data.
+        failed_frames (set): Indices of the frames that could not be decoded, they are skipped.
+        stop (threading.Event): Event to signal the thread to stop.
+
+    Methods:
+        __init__(self, cfg: dict): Initializes the VideoIO object.
+        __scan_video__(self, file_abs_path: str): Returns the number of frames and the keyframe indices of a video file.
+        __locate__(self, idx: int): Returns the video file index and the local frame index of a frame.
+        get_abs_path(self, idx: int): Returns the absolute path of the video file containing the frame at the given index.
+        __async_read_fn__(self): Asynchronously decodes the frames ahead of the cursor and populates the data dictionary.
+        __len__(self): Returns the number of frames.
+        __getitem__(self, idx): Returns the frame data and video file absolute path at the given index.
+        close(self): Stops the asynchronous reading process.
+
+    Raises:
+        NotImplementedError: If the video type is not supported.
+
+    """
+
+    def __init__(self, cfg: dict):
+        self.cfg = cfg
+        self.img_dir = os.path.join(cfg['data']['path'], cfg['data']['camera_subdir'])
+        self.img_type = cfg['data']['camera']['img_type']
+        if self.img_type not in supported_video_types: raise NotImplementedError("Video type not supported. Supported video types: " + ', '.join(supported_video_types) + ".")
+        files = glob.glob(os.path.join(self.img_dir, '*' + self.img_type))
+        # Sort the files based on the numerical part, files without digits keep their listing order
+        files.sort(key=lambda file_name: int('0' + ''.join(filter(str.isdigit, os.path.basename(file_name)))))
+        self.files = files
+
+        # build the frame and keyframe indices
+        frame_counts, self.keyframes = [], []
+        for file_abs_path in self.files:
+            frame_count, keyframes = self.__scan_video__(file_abs_path)
+            frame_counts.append(frame_count)
+            self.keyframes.append(keyframes)
+        self.frame_offsets = np.concatenate(([0], np.cumsum(frame_counts))).astype(np.int64)
+        self.img_count = min(cfg['data']['size'], int(self.frame_offsets[-1]))
+        self.read_ahead = max(1, cfg['data']['camera'].get('read_ahead', 32))
+
+        self.cursor = 0
+        self.data_lock = threading.Condition()
+        self.data = collections.OrderedDict()
+        self.failed_frames = set()
+        self.stop = threading.Event()
+        # Start the asynchronous reading thread
+        threading.Thread(target=self.__async_read_fn__).start()
+
+    def __scan_video__(self, file_abs_path: str):
+        """
+        Returns the number of frames and the keyframe indices of a video file. The compressed packets are read without decoding them,
+        if the backend does not support reading packets, the number of frames is taken from the container and no keyframe index is built.
+
+        Args:
+            file_abs_path (str): Absolute path of the video file.
+
+        Returns:
+            tuple: Tuple containing the number of frames and a numpy array of keyframe indices (or None).
+
+        """
+        if hasattr(cv2, 'CAP_PROP_LRF_HAS_KEY_FRAME'):
+            cap = cv2.VideoCapture(file_abs_path, cv2.CAP_FFMPEG, [cv2.CAP_PROP_FORMAT, -1])
+            if cap.isOpened():
+                is_keyframe = []
+                while cap.grab(): is_keyframe.append(bool(cap.get(cv2.CAP_PROP_LRF_HAS_KEY_FRAME)))
+                cap.release()
+                if len(is_keyframe) > 0:
+                    keyframes = np.flatnonzero(is_keyframe)
+                    # the first packet can always be decoded after a seek to the beginning
+                    if len(keyframes) == 0 or keyframes[0] != 0: keyframes = np.concatenate(([0], keyframes))
+                    return len(is_keyframe), keyframes
+        cap = cv2.VideoCapture(file_abs_path)
+        frame_count = max(0, int(cap.get(cv2.CAP_PROP_FRAME_COUNT)))
+        cap.release()
+        return frame_count, None
+
+    def __locate__(self, idx: int):
+        """
+        Returns the video file index and the local frame index of a frame.
+
+        Args:
+            idx (int): Index of the frame in the concatenated sequence.
+
+        Returns:
+            tuple: Tuple containing the video file index and the frame index within the video file.
+
+        """
+        file_idx = int(np.searchsorted(self.frame_offsets, idx, side='right')) - 1
+        return file_idx, idx - int(self.frame_offsets[file_idx])
+
+    def get_abs_path(self, idx: int):
+        """
+        Returns the absolute path of the video file containing the frame at the given index.
+
+        Args:
+            idx (int): Index of the frame.
+
+        Returns:
+            str: Absolute path of the video file.
+
+        """
+        return self.files[self.__locate__(idx)[0]]
+
+    def __async_read_fn__(self):
+        """
+        Asynchronously decodes the frames from the cursor up to read_ahead frames ahead of it and populates the data dictionary.
+        Frames behind the cursor are evicted to bound the memory.
+
+        """
+        cap, cap_file_idx, cap_pos = None, -1, 0 # cap_pos is the local index of the next frame returned by cap
+        while not self.stop.is_set():
+            with self.data_lock:
+                # the next frame to decode is the first missing frame ahead of the cursor
+                end = min(self.cursor + self.read_ahead, len(self))
+                idx = next((i for i in range(self.cursor, end) if i not in self.data and i not in self.failed_frames), None)
+                if idx is None:
+                    # woken up by a cursor move or close, the timeout is bounded so that io_sleep: 0 does not spin a core
+                    self.data_lock.wait(max(self.cfg['threads']['io_sleep'], 0.01))
+                    continue
+            file_idx, local_idx = self.__locate__(idx)
+            if file_idx != cap_file_idx:
+                if cap is not None: cap.release()
+                cap, cap_file_idx, cap_pos = cv2.VideoCapture(self.files[file_idx]), file_idx, 0
+            # decode forward if no keyframe lies between the current position and the frame, otherwise seek to the preceding keyframe
+            keyframes = self.keyframes[file_idx]
+            if keyframes is not None: seek_pos = int(keyframes[np.searchsorted(keyframes, local_idx, side='right') - 1])
+            else: seek_pos = local_idx
+            if cap_pos > local_idx or (keyframes is not None and seek_pos > cap_pos) or (keyframes is None and local_idx - cap_pos > self.read_ahead):
+                cap.set(cv2.CAP_PROP_POS_FRAMES, seek_pos)
+                cap_pos = seek_pos
+            while cap_pos < local_idx and cap.grab(): cap_pos += 1
+            ret, img_bgr = cap.read()
+            cap_pos += 1
+            if not ret:
+                # e.g. a corrupted frame or a frame count overestimated by the container, the frame is skipped instead of storing an empty frame
+                print(f'[img->video_io.py->VideoIO]: failed to decode frame {local_idx} of {self.files[file_idx]}, skipping it ...')
+                with self.data_lock:
+                    self.failed_frames.add(idx)
+                    self.data_lock.notify_all()
+                # reopen the video file for the next frame
+                cap.release()
+                cap, cap_file_idx = None, -1
+                continue
+            img_rgb = cv2.cvtColor(img_bgr, cv2.COLOR_BGR2RGB)
+            with self.data_lock:
+                self.data[idx] = (self.files[file_idx], img_rgb)
+                for cached_idx in [i for i in self.data if i < self.cursor or i >= self.cursor + self.read_ahead]: self.data.pop(cached_idx)
+                self.data_lock.notify_all()
+        if cap is not None: cap.release()
+
+    def __len__(self):
+        """
+        Returns the number of frames.
+
+        Returns:
+            int: Number of frames.
+
+        """
+        return self.img_count
+
+    def __getitem__(self, idx):
+        """
+        Returns the frame data and video file absolute path at the given index, it blocks until the frame is decoded.
+        The frame data is None if the frame could not be decoded.
+
+        Args:
+            idx (int): Index of the frame.
+
+        Returns:
+            tuple: Tuple containing the video file absolute path and the frame data.
+
+        """
+        with self.data_lock:
+            # move the cursor so that the background thread decodes ahead of this frame
+            self.cursor = idx
+            self.data_lock.notify_all()
+            while idx not in self.data and idx not in self.failed_frames and not self.stop.is_set(): self.data_lock.wait()
+            if idx in self.data: return self.data[idx]
+        return (self.get_abs_path(idx), None)
+
+    def close(self):
+        """
+        Stops the asynchronous reading process.
+
+        """
+        self.stop.set()
+        with self.data_lock: self.data_lock.notify_all()
@@ -3,6 +3,7 @@ import cv2
 import numpy as np
 
 from gui.logger_gui import Logger
+from calib.utils import get_velo_to_rect_transform
 
 class ImageVisualizer:
     """
@@ -103,6 +104,8 @@ class ImageVisualizer:
         
         if "current_label_list" not in data_dict: return
         if "current_calib_data" not in data_dict: return
+        # the image may be decoded at a reduced scale, the projected bboxes are scaled accordingly
+        self.img_decode_scale = data_dict.get('current_image_decode_scale', 1)
         clb = data_dict['current_calib_data']
         for lbl in data_dict['current_label_list']:
             self.__add_bbox__(lbl, clb)
@@ -126,10 +129,9 @@ class ImageVisualizer:
         else:
             color = camera_bbox_dict['rgb_bbox_color'] * 0.5 # darker color for ground truth
         
-        # calib parameters
+        # calib parameters, the lidar to rectified camera transform is precomputed once per unique calibration
         P2 = calib_dict['P2']
-        if 'R0_rect' in calib_dict: R0_rect = calib_dict['R0_rect']
-        Tr_velo_to_cam = calib_dict['Tr_velo_to_cam']
+        Tr_velo_to_rect = get_velo_to_rect_transform(calib_dict)
         
         # transforms
         rotation_matrix = o3d.geometry.OrientedBoundingBox.get_rotation_matrix_from_xyz(lidar_xyz_euler_angles)
@@ -156,16 +158,15 @@ class ImageVisualizer:
         
         # add rotation and translation
         bbox_in_world_coords = Rt_4x4 @ bbox_in_local_coords.T
-        # project to camera coordinates
-        bbox_pts_in_camera_coords = Tr_velo_to_cam @ bbox_in_world_coords
-        # rect matrix shall be applied here, for kitti
-        if 'R0_rect' in calib_dict: bbox_pts_in_camera_coords = R0_rect @ bbox_pts_in_camera_coords
+        # project to rectified camera coordinates
+        bbox_pts_in_camera_coords = Tr_velo_to_rect @ bbox_in_world_coords
         # if any point is behind camera, return
         if np.any(bbox_pts_in_camera_coords[2] < 0): return None
         # project to image pixel coordinates
         bbox_pts_in_image_pixel_coords = P2 @ bbox_pts_in_camera_coords
         # normalize
         points_in_image = bbox_pts_in_image_pixel_coords[0:2,:] / bbox_pts_in_image_pixel_coords[2:,:]
+        points_in_image = points_in_image / self.img_decode_scale
         
         # the image to draw on
         img_np = np.asarray(self.img)
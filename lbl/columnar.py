@@ -0,0 +1,426 @@
+from copy import deepcopy
+
+import numpy as np
+
+"""
+The module columnar.py contains a columnar (struct-of-arrays) container for the labels of a frame. The bounding boxes of all the labels are stored
+in contiguous arrays, so that label operations (filtering, transforming, exporting) are vectorized numpy calls instead of loops over dictionaries.
+For compatibility with dictionary based code, the container behaves like a list of label dictionaries.
+"""
+
+bbox_keys = ['lidar_xyz_center', 'lidar_xyz_extent', 'lidar_xyz_euler_angles', 'rgb_bbox_color', 'predicted']
+
+class WriteThroughDict(dict):
+    """
+    Dictionary that calls a write function after every modification, the labels (and their bbox dictionaries) returned by a ColumnarLabelList are
+    write-through dictionaries that store themselves back into the columns, so writing to a label works as with a list of label dictionaries.
+    Copies are plain dictionaries.
+
+    Args:
+        items (dict): Initial items.
+        write_fn (callable): Function called without arguments after every modification.
+
+    """
+    def __init__(self, items: dict, write_fn):
+        super().__init__(items)
+        self.write_fn = write_fn
+
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        self.write_fn()
+
+    def __delitem__(self, key):
+        super().__delitem__(key)
+        self.write_fn()
+
+    def update(self, *args, **kwargs):
+        super().update(*args, **kwargs)
+        self.write_fn()
+
+    def setdefault(self, key, default=None):
+        if key not in self: self[key] = default
+        return self[key]
+
+    def pop(self, key, *default):
+        value = super().pop(key, *default)
+        self.write_fn()
+        return value
+
+    def popitem(self):
+        item = super().popitem()
+        self.write_fn()
+        return item
+
+    def clear(self):
+        super().clear()
+        self.write_fn()
+
+    def __ior__(self, other):
+        self.update(other)
+        return self
+
+    def copy(self):
+        return dict(self)
+
+    def __copy__(self):
+        return dict(self)
+
+    def __deepcopy__(self, memo):
+        return deepcopy(dict(self), memo)
+
+    def __reduce__(self):
+        return (dict, (dict(self),))
+
+class ColumnarLabelList:
+    """
+    Columnar container for the labels of a frame.
+
+    The geometry of a label is taken from its `lidar_bbox` (or its `camera_bbox` if it has no `lidar_bbox`) and stored in the columns below. A `camera_bbox` with a geometry
+    different from the `lidar_bbox` and all the other keys of a label (e.g. `truncation`, `lidar_cluster`) are kept unchanged in a per-label extras dictionary.
+    The columns grow by doubling their capacity, so appending labels one by one is amortized O(1).
+
+    Indexing with an integer (or iterating) returns a dictionary in the usual label format whose bbox arrays are views into the columns, so in-place modifications
+    of the arrays are reflected in the container (as long as no label is appended or removed afterwards). The dictionary and its bbox dictionaries are WriteThroughDicts,
+    so assigning or removing their keys is stored back into the container too. Indexing with a slice, a boolean mask, or an array of indices returns a new
+    ColumnarLabelList with copies of the selected labels. Labels are removed in place with `del`, pop or remove_mask.
+
+    Args:
+        label_list (list, optional): List of label dictionaries to initialize the container with. Defaults to None.
+
+    Attributes:
+        centers (numpy.ndarray): (K, 3) float32 array of bbox centers in lidar coordinates.
+        extents (numpy.ndarray): (K, 3) float32 array of bbox extents.
+        euler_angles (numpy.ndarray): (K, 3) float32 array of bbox euler angles.
+        yaws (numpy.ndarray): (K,) float32 view of the yaw angles, i.e., euler_angles[:, 2].
+        class_ids (numpy.ndarray): (K,) int32 array of indices into class_names, -1 for labels without a class.
+        class_names (list): List of the class names used by the labels.
+        classes (list): List of the class names of the labels, None for labels without a class.
+        lidar_colors (numpy.ndarray): (K, 3) float32 array of lidar bbox colors in the range 0-1.
+        camera_colors (numpy.ndarray): (K, 3) uint8 array of camera bbox colors in the range 0-255.
+        predicted (numpy.ndarray): (K,) bool array, True for predicted labels.
+        has_lidar_bbox (numpy.ndarray): (K,) bool array, True for labels with a lidar_bbox.
+        has_camera_bbox (numpy.ndarray): (K,) bool array, True for labels with a camera_bbox.
+        scores (numpy.ndarray): (K,) float32 array of detection scores, NaN for labels without a score.
+        extras (list): List of dictionaries with the remaining keys of each label.
+
+    """
+    columns = {
+        'centers': (np.float32, (3,)),
+        'extents': (np.float32, (3,)),
+        'euler_angles': (np.float32, (3,)),
+        'class_ids': (np.int32, ()),
+        'lidar_colors': (np.float32, (3,)),
+        'camera_colors': (np.uint8, (3,)),
+        'predicted': (np.bool_, ()),
+        'has_lidar_bbox': (np.bool_, ()),
+        'has_camera_bbox': (np.bool_, ()),
+        'scores': (np.float32, ()),
+    }
+
+    def __init__(self, label_list: list = None):
+        self.size = 0
+        self.buffers = {name: np.zeros((0,) + shape, dtype=dtype) for name, (dtype, shape) in self.columns.items()}
+        self.class_names = []
+        self.class_name_ids = {}
+        self.extras = []
+        if label_list is not None: self.extend(label_list)
+
+    @classmethod
+    def from_label_list(cls, label_list: list):
+        """
+        Creates a ColumnarLabelList from a list of label dictionaries, a ColumnarLabelList is returned as is.
+
+        Args:
+            label_list (list): List of label dictionaries or a ColumnarLabelList.
+
+        Returns:
+            ColumnarLabelList: Container with the labels.
+
+        """
+        if isinstance(label_list, ColumnarLabelList): return label_list
+        return cls(label_list)
+
+    def to_label_list(self) -> list:
+        """
+        Returns the labels as a list of label dictionaries, the bbox arrays are copies.
+
+        Returns:
+            list: List of label dictionaries.
+
+        """
+        return [self.__get_label__(idx, copy=True) for idx in range(self.size)]
+
+    def __getattr__(self, name):
+        # columns are exposed as attributes, trimmed to the number of labels
+        buffers = self.__dict__.get('buffers', None)
+        if buffers is not None and name in buffers: return buffers[name][:self.__dict__['size']]
+        raise AttributeError(f"'{type(self).__name__}' object has no attribute '{name}'")
+
+    @property
+    def yaws(self) -> np.ndarray:
+        return self.buffers['euler_angles'][:self.size, 2]
+
+    @property
+    def classes(self) -> list:
+        return [self.class_names[class_id] if class_id >= 0 else None for class_id in self.class_ids.tolist()]
+
+    def get_class_id(self, class_name: str) -> int:
+        """
+        Returns the id of a class name, the class name is added to class_names if it is new.
+
+        Args:
+            class_name (str): Class name, None for no class.
+
+        Returns:
+            int: Class id, -1 for no class.
+
+        """
+        if class_name is None: return -1
+        if class_name not in self.class_name_ids:
+            self.class_name_ids[class_name] = len(self.class_names)
+            self.class_names.append(class_name)
+        return self.class_name_ids[class_name]
+
+    def __reserve__(self, count: int):
+        """
+        Makes sure the columns can hold count more labels, the capacity is doubled when it is exceeded.
+
+        Args:
+            count (int): Number of labels to be added.
+
+        """
+        capacity = len(self.buffers['centers'])
+        if self.size + count <= capacity: return
+        capacity = max(self.size + count, 2 * capacity, 8)
+        for name, buffer in self.buffers.items():
+            new_buffer = np.zeros((capacity,) + buffer.shape[1:], dtype=buffer.dtype)
+            new_buffer[:self.size] = buffer[:self.size]
+            self.buffers[name] = new_buffer
+
+    def __len__(self):
+        return self.size
+
+    def __iter__(self):
+        # the length is checked at every step, so labels appended while iterating are visited too, just like with a list
+        idx = 0
+        while idx < self.size:
+            yield self.__get_label__(idx)
+            idx += 1
+
+    def __getitem__(self, idx):
+        if isinstance(idx, (int, np.integer)):
+            if idx < 0: idx += self.size
+            if idx < 0 or idx >= self.size: raise IndexError('label index out of range')
+            return self.__get_label__(idx)
+        return self.select(idx)
+
+    def __setitem__(self, idx: int, label_dict: dict):
+        if idx < 0: idx += self.size
+        if idx < 0 or idx >= self.size: raise IndexError('label index out of range')
+        self.__set_label__(idx, label_dict)
+
+    def __delitem__(self, idx):
+        self.remove_mask(np.isin(np.arange(self.size), np.arange(self.size)[idx]))
+
+    def pop(self, idx: int = -1) -> dict:
+        """
+        Removes a label and returns it.
+
+        Args:
+            idx (int, optional): Index of the label. Defaults to -1.
+
+        Returns:
+            dict: Label dictionary with copies of the bbox arrays and extras.
+
+        """
+        if idx < 0: idx += self.size
+        if idx < 0 or idx >= self.size: raise IndexError('pop index out of range')
+        label = self.__get_label__(idx, copy=True)
+        del self[idx]
+        return label
+
+    def remove_mask(self, mask):
+        """
+        Removes the labels selected by a boolean mask in place, the remaining labels are moved to the front of the columns. Labels returned before the removal
+        are views into the old positions and must not be modified afterwards.
+
+        Args:
+            mask (numpy.ndarray): (K,) boolean mask, True for the labels to remove.
+
+        """
+        mask = np.asarray(mask, dtype=bool)
+        if mask.shape != (self.size,): raise ValueError(f'mask of shape {mask.shape} does not match {self.size} labels')
+        keep = np.flatnonzero(~mask)
+        for buffer in self.buffers.values(): buffer[:len(keep)] = buffer[keep]
+        self.extras = [self.extras[i] for i in keep.tolist()]
+        self.size = len(keep)
+
+    def __get_label__(self, idx: int, copy: bool = False) -> dict:
+        """
+        Returns a label in the dictionary format.
+
+        Args:
+            idx (int): Index of the label.
+            copy (bool, optional): If True, the label is a plain dictionary with copies of the bbox arrays and extras, otherwise a WriteThroughDict whose
+                bbox arrays are views into the columns and whose modifications are stored back at idx. Defaults to False.
+
+        Returns:
+            dict: Label dictionary.
+
+        """
+        b = self.buffers
+        label = dict()
+        if b['class_ids'][idx] >= 0: label['class'] = self.class_names[b['class_ids'][idx]]
+        if not np.isnan(b['scores'][idx]): label['score'] = float(b['scores'][idx])
+        geometry = [b['centers'][idx], b['extents'][idx], b['euler_angles'][idx]]
+        if copy: geometry = [array.copy() for array in geometry]
+        predicted = bool(b['predicted'][idx])
+        if b['has_lidar_bbox'][idx]:
+            lidar_color = b['lidar_colors'][idx].copy() if copy else b['lidar_colors'][idx]
+            label['lidar_bbox'] = dict(zip(bbox_keys, geometry + [lidar_color, predicted]))
+        if b['has_camera_bbox'][idx]:
+            camera_color = b['camera_colors'][idx].copy() if copy else b['camera_colors'][idx]
+            label['camera_bbox'] = dict(zip(bbox_keys, geometry + [camera_color, predicted]))
+        if copy:
+            label.update(deepcopy(self.extras[idx]))
+            return label
+        label.update(self.extras[idx])
+        # modifications of the label or of its bboxes are stored back into the columns
+        label = WriteThroughDict(label, lambda: self.__set_label__(idx, label))
+        for bbox_type in ['lidar_bbox', 'camera_bbox']:
+            if bbox_type in label: dict.__setitem__(label, bbox_type, WriteThroughDict(label[bbox_type], label.write_fn))
+        return label
+
+    def __set_label__(self, idx: int, label_dict: dict):
+        """
+        Stores a label dictionary at the given index of the columns.
+
+        Args:
+            idx (int): Index of the label.
+            label_dict (dict): Label dictionary.
+
+        """
+        b = self.buffers
+        extras = {k: v for k, v in label_dict.items() if k not in ['class', 'score', 'lidar_bbox', 'camera_bbox']}
+        b['class_ids'][idx] = self.get_class_id(label_dict.get('class', None))
+        b['scores'][idx] = label_dict.get('score', np.nan)
+        lidar_bbox, camera_bbox = label_dict.get('lidar_bbox', None), label_dict.get('camera_bbox', None)
+        bbox = lidar_bbox if lidar_bbox is not None else camera_bbox
+        b['has_lidar_bbox'][idx] = lidar_bbox is not None
+        b['has_camera_bbox'][idx] = camera_bbox is not None
+        if bbox is not None:
+            # missing bbox keys default to zeros
+            b['centers'][idx] = bbox.get('lidar_xyz_center', 0)
+            b['extents'][idx] = bbox.get('lidar_xyz_extent', 0)
+            b['euler_angles'][idx] = bbox.get('lidar_xyz_euler_angles', 0)
+            b['predicted'][idx] = bbox.get('predicted', False)
+        else:
+            b['centers'][idx], b['extents'][idx], b['euler_angles'][idx], b['predicted'][idx] = 0, 0, 0, False
+        b['lidar_colors'][idx] = lidar_bbox.get('rgb_bbox_color', 0) if lidar_bbox is not None else 0
+        b['camera_colors'][idx] = camera_bbox.get('rgb_bbox_color', 0) if camera_bbox is not None else 0
+        # a camera_bbox that does not share the geometry of the lidar_bbox is kept as is
+        if lidar_bbox is not None and camera_bbox is not None:
+            if any(not np.array_equal(lidar_bbox.get(k, 0), camera_bbox.get(k, 0)) for k in bbox_keys[:3]) or lidar_bbox.get('predicted', False) != camera_bbox.get('predicted', False):
+                b['has_camera_bbox'][idx] = False
+                # the arrays of a written back camera_bbox may be views into the columns
+                extras['camera_bbox'] = {k: v.copy() if isinstance(v, np.ndarray) else v for k, v in camera_bbox.items()}
+        if idx < len(self.extras): self.extras[idx] = extras
+        else: self.extras.append(extras)
+
+    def append(self, label_dict: dict):
+        """
+        Appends a label dictionary.
+
+        Args:
+            label_dict (dict): Label dictionary.
+
+        """
+        self.__reserve__(1)
+        self.__set_label__(self.size, label_dict)
+        self.size += 1
+
+    def extend(self, label_list):
+        """
+        Appends a list of label dictionaries or the labels of another ColumnarLabelList.
+
+        Args:
+            label_list (list or ColumnarLabelList): Labels to append.
+
+        """
+        if isinstance(label_list, ColumnarLabelList):
+            class_ids = np.array([self.get_class_id(name) for name in label_list.class_names] + [-1], dtype=np.int32)
+            self.extend_boxes(label_list.centers, label_list.extents, label_list.euler_angles, class_ids[label_list.class_ids],
+                              label_list.lidar_colors, label_list.camera_colors, label_list.predicted, label_list.scores,
+                              label_list.has_lidar_bbox, label_list.has_camera_bbox, [deepcopy(extras) for extras in label_list.extras])
+            return
+        label_list = list(label_list)
+        self.__reserve__(len(label_list))
+        for label_dict in label_list:
+            self.__set_label__(self.size, label_dict)
+            self.size += 1
+
+    def extend_boxes(self, centers, extents, euler_angles, classes, lidar_colors=None, camera_colors=None, predicted=True, scores=None,
+                     has_lidar_bbox=True, has_camera_bbox=True, extras=None):
+        """
+        Appends a batch of bounding boxes given as arrays, e.g. the output of a detector, without creating label dictionaries.
+
+        Args:
+            centers (numpy.ndarray): (M, 3) bbox centers.
+            extents (numpy.ndarray): (M, 3) bbox extents.
+            euler_angles (numpy.ndarray): (M, 3) bbox euler angles, or (M,) yaw angles.
+            classes (list or numpy.ndarray): (M,) class names, or (M,) int class ids into class_names.
+            lidar_colors (numpy.ndarray, optional): (M, 3) or (3,) lidar bbox colors in the range 0-1. Defaults to None (black).
+            camera_colors (numpy.ndarray, optional): (M, 3) or (3,) camera bbox colors in the range 0-255. Defaults to None (lidar_colors * 255).
+            predicted (bool or numpy.ndarray, optional): Predicted flags. Defaults to True.
+            scores (numpy.ndarray, optional): (M,) detection scores. Defaults to None (NaN).
+            has_lidar_bbox (bool or numpy.ndarray, optional): Lidar bbox flags. Defaults to True.
+            has_camera_bbox (bool or numpy.ndarray, optional): Camera bbox flags. Defaults to True.
+            extras (list, optional): (M,) dictionaries with the remaining keys of each label. Defaults to None.
+
+        """
+        centers = np.asarray(centers, dtype=np.float32).reshape(-1, 3)
+        count = len(centers)
+        euler_angles = np.asarray(euler_angles, dtype=np.float32)
+        if euler_angles.ndim == 1: euler_angles = np.column_stack((np.zeros((count, 2), dtype=np.float32), euler_angles))
+        if isinstance(classes, np.ndarray) and np.issubdtype(classes.dtype, np.integer): class_ids = classes
+        else: class_ids = np.array([self.get_class_id(class_name) for class_name in classes], dtype=np.int32)
+        if lidar_colors is None: lidar_colors = np.zeros(3, dtype=np.float32)
+        lidar_colors = np.asarray(lidar_colors, dtype=np.float32)
+        if camera_colors is None: camera_colors = (lidar_colors * 255.0).astype(np.uint8)
+        self.__reserve__(count)
+        b, start, end = self.buffers, self.size, self.size + count
+        b['centers'][start:end] = centers
+        b['extents'][start:end] = extents
+        b['euler_angles'][start:end] = euler_angles
+        b['class_ids'][start:end] = class_ids
+        b['lidar_colors'][start:end] = lidar_colors
+        b['camera_colors'][start:end] = camera_colors
+        b['predicted'][start:end] = predicted
+        b['scores'][start:end] = np.nan if scores is None else scores
+        b['has_lidar_bbox'][start:end] = has_lidar_bbox
+        b['has_camera_bbox'][start:end] = has_camera_bbox
+        self.extras.extend(extras if extras is not None else [{} for _ in range(count)])
+        self.size = end
+
+    def select(self, idx) -> 'ColumnarLabelList':
+        """
+        Returns a new ColumnarLabelList with the selected labels.
+
+        Args:
+            idx (slice or numpy.ndarray or list): Slice, (K,) boolean mask, or array of label indices.
+
+        Returns:
+            ColumnarLabelList: Container with the selected labels.
+
+        """
+        indices = np.arange(self.size)[idx]
+        output = ColumnarLabelList()
+        output.size = len(indices)
+        output.buffers = {name: buffer[:self.size][indices].copy() for name, buffer in self.buffers.items()}
+        output.class_names = list(self.class_names)
+        output.class_name_ids = dict(self.class_name_ids)
+        output.extras = [deepcopy(self.extras[i]) for i in indices.tolist()]
+        return output
+
+    def __repr__(self):
+        return f'ColumnarLabelList({self.size} labels, classes: {self.class_names})'
@@ -2,6 +2,10 @@ import os
 import glob
 import time
 import threading
+from copy import deepcopy
+
+from utils.cache import ParsedCache
+from lbl.columnar import ColumnarLabelList
 
 lbl_dir = os.path.dirname(os.path.realpath(__file__))
 
@@ -24,12 +28,16 @@ class FileIO:
         reader (class): Handler class for reading label files.
         clb_reader (callable): Callable object for reading calibration data.
         files_basenames (list): List of file basenames.
+        parsed_cache (ParsedCache): Cache of parsed label files, None if data:label:cache_parsed is False.
         data_lock (threading.Lock): Lock for thread safety.
         data (list): List of tuples containing label file paths and annotations.
         stop (threading.Event): Event for stopping the async read thread.
 
     Methods:
         get_abs_path(idx: int) -> str: Returns the absolute path of the label file at the given index.
+        __read_label__(idx: int) -> ColumnarLabelList: Reads the annotation of the label file at the given index, using the parsed cache if enabled.
+        __encode_annotation__(annotation: ColumnarLabelList) -> dict: Returns an annotation as a dictionary of plain arrays and lists for the parsed cache.
+        __decode_annotation__(cached_annotation: dict) -> ColumnarLabelList: Returns the annotation stored in the parsed cache.
         __async_read_fn__(): Asynchronously reads label files and annotations.
         __len__() -> int: Returns the number of label files.
         __getitem__(idx) -> tuple: Returns the label file path and annotation at the given index.
@@ -162,6 +170,10 @@ class FileIO:
         file_basenames.sort(key=lambda file_name: int(''.join(filter(str.isdigit, file_name))))
         self.files_basenames = file_basenames[:self.lbl_count]
         
+        # parsed labels of unchanged files (and unchanged calibration files) are loaded from a binary cache instead of being parsed again
+        if cfg['data']['label'].get('cache_parsed', False): self.parsed_cache = ParsedCache(os.path.join(cfg['data']['path'], 'cache', cfg['data']['label_subdir'], f'parsed_{self.lbl_type}.npz'))
+        else: self.parsed_cache = None
+        
         self.data_lock = threading.Lock()
         self.data = []
         self.stop = threading.Event()
@@ -181,6 +193,61 @@ class FileIO:
         lbl_path = os.path.join(self.lbl_dir, self.files_basenames[idx] + self.lbl_ext)
         return lbl_path
         
+    def __read_label__(self, idx: int):
+        """
+        Reads the annotation of the label file at the given index, from the parsed cache if neither the label file nor its calibration file changed.
+
+        Args:
+            idx (int): Index of the label file.
+
+        Returns:
+            ColumnarLabelList: Annotation of the label file.
+
+        """
+        lbl_abs_path = self.get_abs_path(idx)
+        clb_abs_path, clb_data = self.clb_reader(idx) if self.clb_reader else (None, None)
+        if self.parsed_cache:
+            cache_hit, cached_annotation = self.parsed_cache.get(lbl_abs_path, clb_abs_path)
+            if cache_hit: return self.__decode_annotation__(cached_annotation)
+        # labels are stored in a columnar container that behaves like a list of label dictionaries, handlers returning a list of dictionaries are converted
+        annotation = ColumnarLabelList.from_label_list(self.reader(lbl_abs_path, clb_data))
+        if self.parsed_cache: self.parsed_cache.put(lbl_abs_path, self.__encode_annotation__(annotation), clb_abs_path)
+        return annotation
+
+    @staticmethod
+    def __encode_annotation__(annotation: ColumnarLabelList) -> dict:
+        """
+        Returns the columns, class names and extras of an annotation as a dictionary of plain arrays and lists that can be stored in the parsed cache.
+
+        Args:
+            annotation (ColumnarLabelList): Annotation of a label file.
+
+        Returns:
+            dict: Dictionary containing the columns, the class names and the extras of the labels.
+
+        """
+        return {'columns': {name: getattr(annotation, name) for name in ColumnarLabelList.columns}, 'class_names': annotation.class_names, 'extras': annotation.extras}
+
+    @staticmethod
+    def __decode_annotation__(cached_annotation: dict) -> ColumnarLabelList:
+        """
+        Returns the annotation stored in the parsed cache by __encode_annotation__.
+
+        Args:
+            cached_annotation (dict): Dictionary containing the columns, the class names and the extras of the labels.
+
+        Returns:
+            ColumnarLabelList: Annotation of the label file.
+
+        """
+        annotation = ColumnarLabelList()
+        for class_name in cached_annotation['class_names']: annotation.get_class_id(class_name)
+        c = cached_annotation['columns']
+        # the cached entry is shared between reads, the labels get their own copies of the extras
+        annotation.extend_boxes(c['centers'], c['extents'], c['euler_angles'], c['class_ids'], c['lidar_colors'], c['camera_colors'], c['predicted'], c['scores'],
+                                c['has_lidar_bbox'], c['has_camera_bbox'], deepcopy(cached_annotation['extras']))
+        return annotation
+        
     def __async_read_fn__(self):
         """
         Asynchronously reads label files and annotations.
@@ -189,9 +256,10 @@ class FileIO:
         for idx in range(len(self.files_basenames)):
             if self.stop.is_set(): break
             lbl_abs_path = self.get_abs_path(idx)
-            annotation = self.reader(lbl_abs_path, self.clb_reader(idx)[1] if self.clb_reader else None)
+            annotation = self.__read_label__(idx)
             with self.data_lock: self.data.append((lbl_abs_path, annotation))
             time.sleep(self.cfg['threads']['io_sleep'])
+        if self.parsed_cache: self.parsed_cache.save()
         
     def __len__(self) -> int:
         """
@@ -218,7 +286,7 @@ class FileIO:
             with self.data_lock: return self.data[idx]
         except:
             lbl_abs_path = self.get_abs_path(idx)
-            annotation = self.reader(lbl_abs_path, self.clb_reader(idx)[1] if self.clb_reader else None)
+            annotation = self.__read_label__(idx)
             return (lbl_abs_path, annotation)
         
     def close(self):
@@ -17,75 +17,86 @@ label_file_extension = '.txt'
 import os
 import numpy as np
 
+from calib.utils import get_cam_to_velo_transform
+from lbl.columnar import ColumnarLabelList
+
+# one row of a KITTI label file, a trailing score column (detection results) is ignored
+kitti_label_dtype = np.dtype([
+    ('class', 'U32'), # Object class [Car, Van, Truck, Pedestrian, Person_sitting, Cyclist, Tram, Misc, DontCare]
+    ('truncation', np.float32), # Truncated pixel ratio [0..1]
+    ('occlusion', np.float32), # 0: fully visible, 1: partly occluded, 2: fully occluded, 3: unknown
+    ('alpha', np.float32), # Object observation angle [-pi..pi]
+    ('bbox2d', np.float32, (4,)), # 0-based 2D bounding box of object in the image (left, top, right, bottom)
+    ('dimensions', np.float32, (3,)), # Height, width, length in meters
+    ('location', np.float32, (3,)), # Location of object center in camera coordinates
+    ('rotation_y', np.float32), # Rotation around Y-axis in camera coordinates [-pi..pi]
+])
+
+def read_label_array(label_path: str) -> np.ndarray:
+    """
+    Reads all the objects of a KITTI label file in one pass.
+
+    Args:
+        label_path (str): Path to the label file.
+
+    Returns:
+        np.ndarray: Structured array of kitti_label_dtype with one row per object.
+
+    """
+    if os.path.getsize(label_path) == 0: return np.zeros(0, dtype=kitti_label_dtype)
+    return np.loadtxt(label_path, dtype=kitti_label_dtype, usecols=range(15), ndmin=1)
+
 def Handler(label_path: str, calib_data: dict):
     """
-    Process the label file and generate a list of labels.
+    Process the label file and generate the labels of all its objects at once.
 
     Args:
         label_path (str): Path to the label file.
         calib_data (dict): Calibration data.
 
     Returns:
-        list: List of labels.
+        ColumnarLabelList: Labels, built directly from the columns of the label file.
 
     """
-    output = []
+    output = ColumnarLabelList()
 
     if calib_data is None:
         return output
 
-    transform_from_lidar_to_image_0 = calib_data['Tr_velo_to_cam']
-    transform_from_image_0_to_lidar = np.linalg.inv(transform_from_lidar_to_image_0)
+    # camera to lidar transform, precomputed once per unique calibration
+    transform_from_image_0_to_lidar = get_cam_to_velo_transform(calib_data)
     
     # Read label file
     if not os.path.exists(label_path):
         return output
-    with open(label_path, 'r') as f:
-        lbls = f.readlines()
+    lbls = read_label_array(label_path)
+    if len(lbls) == 0:
+        return output
+    
+    # project all the centers to lidar coordinates at once
+    image_0_xyz = lbls['location']
+    lidar_xyz_centers = (image_0_xyz.astype(np.float64) @ transform_from_image_0_to_lidar[:3, :3].T + transform_from_image_0_to_lidar[:3, 3]).astype(np.float32)
+    # Adjust the height of the bounding box since the origin of the lidar coordinates is at the bottom of the vehicle
+    heights, widths, lengths = lbls['dimensions'].T
+    lidar_xyz_centers[:, 2] += heights / 2.0
+    # w l h -> x y z
+    lidar_xyz_extents = np.stack((widths, lengths, heights), axis=1)
+    lidar_xyz_euler_angles = np.zeros((len(lbls), 3), dtype=np.float32)
+    lidar_xyz_euler_angles[:, 2] = -lbls['rotation_y']
+    
+    # colors of all the objects at once, lidar colors are in the range 0-1 and camera colors are in the range 0-255
+    classes = lbls['class'].tolist()
+    lidar_bbox_colors = np.array([colors[obj_class] for obj_class in classes], dtype=np.float32)
+    camera_bbox_colors = (lidar_bbox_colors * 255.0).astype(np.uint8)
+    
+    # the remaining kitti fields are kept as extras of each label
+    extras = [{'truncation': truncation, 'occlusion': occlusion, 'alpha': alpha, 'image_0_bbox2d': bbox2d, 'obj_height': height, 'obj_width': width, 'obj_length': length,
+               'image_0_xyz': xyz, 'image_0_ry': ry}
+              for truncation, occlusion, alpha, bbox2d, height, width, length, xyz, ry
+              in zip(lbls['truncation'].tolist(), lbls['occlusion'].astype(int).tolist(), lbls['alpha'].tolist(), lbls['bbox2d'].tolist(),
+                     heights.tolist(), widths.tolist(), lengths.tolist(), image_0_xyz.copy(), lbls['rotation_y'].tolist())]
     
-    for line in lbls:
-        parts = line.strip().split(' ')
-        obj_class = parts[0]  # Object class [Car, Van, Truck, Pedestrian, Person_sitting, Cyclist, Tram, Misc, DontCare]
-        truncation = float(parts[1])  # Truncated pixel ratio [0..1]
-        occlusion = int(parts[2])  # 0: fully visible, 1: partly occluded, 2: fully occluded, 3: unknown
-        alpha = float(parts[3])  # Object observation angle [-pi..pi]
-        left, top, right, bottom = np.array([float(x) for x in parts[4:8]], dtype=np.float32)  # 0-based 2D bounding box of object in the image
-        height, width, length = np.array([float(x) for x in parts[8:11]], dtype=np.float32)  # Height, width, length in meters
-        image_0_xyz = np.array([float(x) for x in parts[11:14]], dtype=np.float32)  # Location of object center in camera coordinates
-        image_0_ry = float(parts[14])  # Rotation around Y-axis in camera coordinates [-pi..pi]
-        
-        label = dict()
-        label['class'] = obj_class
-        label['truncation'] = truncation
-        label['occlusion'] = occlusion
-        label['alpha'] = alpha
-        label['image_0_bbox2d'] = [left, top, right, bottom]
-        label['obj_height'] = height
-        label['obj_width'] = width
-        label['obj_length'] = length
-        label['image_0_xyz'] = image_0_xyz
-        label['image_0_ry'] = image_0_ry
-        
-        # project to lidar coordinates
-        lidar_xyz_center = transform_from_image_0_to_lidar @ np.append(image_0_xyz, 1).reshape(4, 1)
-        lidar_xyz_center = lidar_xyz_center.T[0]
-        lidar_xyz_center = lidar_xyz_center[:3]
-        # Adjust the height of the bounding box since the origin of the lidar coordinates is at the bottom of the vehicle
-        lidar_xyz_center[2] += height / 2.0
-        # w l h -> x y z
-        lidar_xyz_extent = np.array([width, length, height], dtype=np.float32)
-        lidar_xyz_euler_angles = np.array([0, 0, -image_0_ry], dtype=np.float32)
-        lidar_bbox_color = np.array(colors[obj_class], dtype=np.float32)
-        
-        # visualzer expect lidar_bbox to be present in order to visualize the bounding boxes, so we add them here
-        label['lidar_bbox'] = {'lidar_xyz_center': lidar_xyz_center, 'lidar_xyz_extent': lidar_xyz_extent, 'lidar_xyz_euler_angles': lidar_xyz_euler_angles, 'rgb_bbox_color': lidar_bbox_color, 'predicted': False}
-        
-        # camera colors are in the range 0-255
-        camera_bbox_color = np.array([i * 255.0 for i in colors[obj_class]], dtype=np.uint8)
-        
-        # visualzer expect camera_bbox to be present in order to visualize the bounding boxes, so we add them here
-        label['camera_bbox'] = {'lidar_xyz_center': lidar_xyz_center, 'lidar_xyz_extent': lidar_xyz_extent, 'lidar_xyz_euler_angles': lidar_xyz_euler_angles, 'rgb_bbox_color': camera_bbox_color, 'predicted': False}
-        
-        output.append(label)
+    # visualzer expect lidar_bbox and camera_bbox to be present in order to visualize the bounding boxes, both share the lidar geometry
+    output.extend_boxes(lidar_xyz_centers, lidar_xyz_extents, lidar_xyz_euler_angles, classes, lidar_bbox_colors, camera_bbox_colors, predicted=False, extras=extras)
     
-    return output
\ No newline at end of file
+    return output
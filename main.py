@@ -9,6 +9,7 @@ from pcd.sensor_io import SensorIO as PCD_Sensor_IO
 from pcd.viz import PointCloudVisualizer
 
 from img.file_io import FileIO as IMG_File_IO
+from img.video_io import VideoIO as IMG_Video_IO, supported_video_types
 from img.sensor_io import SensorIO as IMG_Sensor_IO
 from img.viz import ImageVisualizer
 
@@ -156,12 +157,21 @@ class LiGuard:
         if self.img_io != None: self.img_io.close()
         # if files are enabled
         if cfg['data']['camera']['enabled']:
-            try:
-                self.img_io = IMG_File_IO(cfg)
-                self.logger.log(f'[main.py->LiGuard->reset]: IMG_File_IO created', Logger.DEBUG)
-            except Exception as e:
-                self.logger.log(f'[main.py->LiGuard->reset]: IMG_File_IO creation failed:\n{e}', Logger.CRITICAL)
-                self.img_io = None
+            # video files are read by a dedicated reader
+            if cfg['data']['camera']['img_type'] in supported_video_types:
+                try:
+                    self.img_io = IMG_Video_IO(cfg)
+                    self.logger.log(f'[main.py->LiGuard->reset]: IMG_Video_IO created', Logger.DEBUG)
+                except Exception as e:
+                    self.logger.log(f'[main.py->LiGuard->reset]: IMG_Video_IO creation failed:\n{e}', Logger.CRITICAL)
+                    self.img_io = None
+            else:
+                try:
+                    self.img_io = IMG_File_IO(cfg)
+                    self.logger.log(f'[main.py->LiGuard->reset]: IMG_File_IO created', Logger.DEBUG)
+                except Exception as e:
+                    self.logger.log(f'[main.py->LiGuard->reset]: IMG_File_IO creation failed:\n{e}', Logger.CRITICAL)
+                    self.img_io = None
         # if sensors are enabled
         elif cfg['sensors']['camera']['enabled']:
             try:
@@ -309,6 +319,9 @@ class LiGuard:
             
         self.post_processes = [self.post_processes[priority] for priority in sorted(self.post_processes.keys())]
         self.logger.log(f'[main.py->LiGuard->reset]: enabled post_processes: {self.post_processes}', Logger.DEBUG)
+
+        # images decoded at a reduced scale are only meant for visualization, processes that use the image get it at full resolution
+        self.img_full_resolution_required = len(self.camera_processes) > 0 or any([proc.__name__ == 'project_image_pixel_colors' for proc in self.lidar_processes])
         
     def start(self, cfg):
         # start the LiGuard
@@ -336,14 +349,24 @@ class LiGuard:
                     current_point_cloud_path, current_point_cloud_numpy = self.pcd_io[self.data_dict['current_frame_index']]
                     self.data_dict['current_point_cloud_path'] = current_point_cloud_path
                     self.data_dict['current_point_cloud_numpy'] = current_point_cloud_numpy
+                    # the clusters of the previous frame index its points
+                    for key in [key for key in self.data_dict if key.startswith('current_point_cloud_cluster_')]: self.data_dict.pop(key)
                 elif 'current_point_cloud_numpy' in self.data_dict:
                     self.logger.log(f'[main.py->LiGuard->start]: current_point_cloud_numpy found in data_dict while pcd_io is None, removing ...', Logger.DEBUG)
                     self.data_dict.pop('current_point_cloud_numpy')
                 
                 if self.img_io:
-                    current_image_path, current_image_numpy = self.img_io[self.data_dict['current_frame_index']]
+                    if self.img_full_resolution_required and hasattr(self.img_io, 'get_full_resolution'):
+                        current_image_path, current_image_numpy = self.img_io.get_full_resolution(self.data_dict['current_frame_index'])
+                        self.data_dict['current_image_decode_scale'] = 1
+                    else:
+                        current_image_path, current_image_numpy = self.img_io[self.data_dict['current_frame_index']]
+                        self.data_dict['current_image_decode_scale'] = getattr(self.img_io, 'decode_scale', 1)
                     self.data_dict['current_image_path'] = current_image_path
-                    self.data_dict['current_image_numpy'] = current_image_numpy
+                    if current_image_numpy is not None: self.data_dict['current_image_numpy'] = current_image_numpy
+                    else:
+                        self.logger.log(f'[main.py->LiGuard->start]: image {current_image_path} of frame {self.data_dict["current_frame_index"]} could not be read, skipping it ...', Logger.ERROR)
+                        if 'current_image_numpy' in self.data_dict: self.data_dict.pop('current_image_numpy')
                 elif 'current_image_numpy' in self.data_dict:
                     self.logger.log(f'[main.py->LiGuard->start]: current_image_numpy found in data_dict while img_io is None, removing ...', Logger.DEBUG)
                     self.data_dict.pop('current_image_numpy')
@@ -0,0 +1,87 @@
+import os
+import glob
+
+import numpy as np
+
+from utils.replay import FileReplay
+
+class Handler:
+    """
+    A class that replays point cloud files from disk as if they were streamed by a live LiDAR sensor.
+
+    The files under `data:path/data:lidar_subdir` are emitted by a background thread either at a fixed rate (`sensors:lidar:replay_hz`)
+    or at their original timestamps (`replay_hz: 0`, falling back to 10 Hz if all timestamps are identical). Emitted frames are pushed into a bounded buffer of size `sensors:lidar:replay_buffer_size`;
+    if the pipeline does not consume frames fast enough, the oldest frames are dropped just like a sensor dropping packets.
+    This allows to measure real-time latency, frame drops and backpressure of a pipeline without real hardware.
+
+    The original timestamps are read from a `timestamps.txt` file (one timestamp per line, either in seconds or in `YYYY-MM-DD HH:MM:SS.fffffffff` format)
+    located in the lidar subdirectory or, if it is not present, from the modification times of the files.
+
+    Args:
+        cfg (dict): Configuration dictionary containing sensor information.
+
+    Attributes:
+        cfg (dict): Configuration dictionary containing sensor information.
+        manufacturer (str): Manufacturer of the LiDAR sensor, always `file`.
+        model (str): Model of the LiDAR sensor, always `replay`.
+        serial_no (str): Serial number of the LiDAR sensor.
+        hostname (str): Hostname of the LiDAR sensor.
+        files (list): List of absolute paths of the replayed point cloud files.
+        emit_offsets (numpy.ndarray): Emission time of each file in seconds relative to the start of the replay.
+        stats (dict): Replay statistics, i.e., number of emitted, consumed and dropped frames, and consumer latencies in seconds.
+        replay (FileReplay): Replay of the files.
+        reader (generator): Generator that yields point cloud data, it blocks until the next frame is emitted.
+
+    Raises:
+        Exception: If no point cloud file is found in the lidar subdirectory.
+    """
+
+    def __init__(self, cfg: dict):
+        self.cfg = cfg
+
+        # Extract sensor information from the configuration dictionary
+        self.manufacturer = self.cfg['sensors']['lidar']['manufacturer'].lower()
+        self.model = self.cfg['sensors']['lidar']['model'].lower().replace('-','')
+        self.serial_no = self.cfg['sensors']['lidar']['serial_number']
+        self.hostname = self.cfg['sensors']['lidar']['hostname']
+
+        # Replay parameters
+        self.replay_hz = self.cfg['sensors']['lidar'].get('replay_hz', 10)
+        self.replay_loop = self.cfg['sensors']['lidar'].get('replay_loop', True)
+        buffer_size = self.cfg['sensors']['lidar'].get('replay_buffer_size', 1)
+
+        # List the point cloud files
+        pcd_dir = os.path.join(cfg['data']['path'], cfg['data']['lidar_subdir'])
+        self.pcd_type = cfg['data']['lidar']['pcd_type']
+        files = glob.glob(os.path.join(pcd_dir, '*' + self.pcd_type))
+        files.sort(key=lambda file_name: int(''.join(filter(str.isdigit, os.path.basename(file_name)))))
+        self.files = files[:cfg['data']['size']]
+        if len(self.files) == 0: raise Exception(f"No {self.pcd_type} files found in {pcd_dir} to replay.")
+
+        # Emit the files from a background thread
+        self.replay = FileReplay(self.files, self.__read__, self.replay_hz, self.replay_loop, buffer_size, pcd_dir)
+        self.emit_offsets = self.replay.emit_offsets
+        self.stats = self.replay.stats
+        self.reader = self.replay.reader
+
+    def __read__(self, file_abs_path: str):
+        """
+        Reads a point cloud file.
+
+        Args:
+            file_abs_path (str): Absolute path of the point cloud file.
+
+        Returns:
+            numpy.ndarray: Point cloud data of shape (N, 4).
+        """
+        if self.pcd_type == '.bin': return np.fromfile(file_abs_path, dtype=np.float32).reshape(-1, 4)
+        if self.pcd_type == '.npy': return np.load(file_abs_path)
+        import open3d as o3d
+        points = np.asarray(o3d.io.read_point_cloud(file_abs_path).points, dtype=np.float32)
+        return np.hstack((points, np.ones((points.shape[0], 1), dtype=np.float32)))
+
+    def close(self):
+        """
+        Stops the replay and closes the reader.
+        """
+        self.replay.close()
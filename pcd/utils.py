@@ -56,4 +56,389 @@ def get_fixed_sized_point_cloud(point_cloud: np.ndarray, number_of_points: int)
     # crop if more points
     elif point_cloud.shape[0] > number_of_points:
         point_cloud = point_cloud[:number_of_points]
-    return point_cloud
\ No newline at end of file
+    return point_cloud
+
+def get_crop_mask(points: np.ndarray, min_xyz, max_xyz, roi_grid: np.ndarray = None, roi_cell_size: float = None, buffers: dict = None) -> np.ndarray:
+    """
+    Get the mask of the points inside an axis-aligned box and, optionally, inside a rasterized bird's-eye view region of interest.
+
+    The box test is done column by column as |p - center| <= extent / 2 into preallocated buffers, so that no (N, 3) temporaries are created.
+    The region of interest is only looked up for the points that are inside the box.
+
+    Args:
+        points (np.ndarray): Points with shape (N, 3+).
+        min_xyz (array-like): Minimum x, y, z of the box.
+        max_xyz (array-like): Maximum x, y, z of the box.
+        roi_grid (np.ndarray, optional): Boolean grid with shape (H, W) covering the box in x (columns) and y (rows), as returned by rasterize_bev_polygons. Defaults to None.
+        roi_cell_size (float, optional): Size of a roi_grid cell in meters. Defaults to None.
+        buffers (dict, optional): Dictionary holding scratch buffers that are reused between calls, they are grown when needed. Defaults to None.
+
+    Returns:
+        np.ndarray: Boolean mask with shape (N,), it is a view into the buffers if they are given.
+
+    """
+    if buffers is None: buffers = dict()
+    num_points = points.shape[0]
+    dtype = np.float32 if points.dtype == np.float32 else np.float64
+    # grow the scratch buffers if needed
+    if 'distance' not in buffers or buffers['distance'].shape[0] < num_points or buffers['distance'].dtype != dtype:
+        capacity = max(num_points, 2 * buffers['distance'].shape[0] if 'distance' in buffers else 0)
+        buffers['distance'] = np.empty(capacity, dtype=dtype)
+        buffers['mask'] = np.empty(capacity, dtype=bool)
+        buffers['condition'] = np.empty(capacity, dtype=bool)
+    distance, mask, condition = buffers['distance'][:num_points], buffers['mask'][:num_points], buffers['condition'][:num_points]
+
+    # box test, one column at a time
+    min_xyz, max_xyz = np.asarray(min_xyz, dtype=np.float64), np.asarray(max_xyz, dtype=np.float64)
+    center, half_extent = ((min_xyz + max_xyz) / 2).astype(dtype), ((max_xyz - min_xyz) / 2).astype(dtype)
+    for i in range(3):
+        np.subtract(points[:, i], center[i], out=distance)
+        np.abs(distance, out=distance)
+        if i == 0: np.less_equal(distance, half_extent[i], out=mask)
+        else:
+            np.less_equal(distance, half_extent[i], out=condition)
+            np.logical_and(mask, condition, out=mask)
+
+    # region of interest test, only for the points inside the box
+    if roi_grid is not None:
+        inside = np.flatnonzero(mask)
+        cols = np.clip(((points[inside, 0] - min_xyz[0]) / roi_cell_size).astype(np.int32), 0, roi_grid.shape[1] - 1)
+        rows = np.clip(((points[inside, 1] - min_xyz[1]) / roi_cell_size).astype(np.int32), 0, roi_grid.shape[0] - 1)
+        mask[inside] = roi_grid[rows, cols]
+    return mask
+
+def rasterize_bev_polygons(polygons: list, min_xy, max_xy, cell_size: float) -> np.ndarray:
+    """
+    Rasterize bird's-eye view polygons into a boolean lookup grid.
+
+    Args:
+        polygons (list): List of polygons, each a list of [x, y] vertices in meters.
+        min_xy (array-like): Minimum x, y covered by the grid.
+        max_xy (array-like): Maximum x, y covered by the grid.
+        cell_size (float): Size of a grid cell in meters.
+
+    Returns:
+        np.ndarray: Boolean grid with shape (H, W) where rows follow y and columns follow x, True inside any of the polygons.
+
+    """
+    import cv2
+    min_xy, max_xy = np.asarray(min_xy[:2], dtype=np.float64), np.asarray(max_xy[:2], dtype=np.float64)
+    width, height = np.floor((max_xy - min_xy) / cell_size).astype(int) + 1
+    grid = np.zeros((height, width), dtype=np.uint8)
+    # vertices are given to cv2 in fixed point with 8 fractional bits, at cell centers
+    shift = 8
+    vertices = [np.round(((np.asarray(polygon, dtype=np.float64)[:, :2] - min_xy) / cell_size - 0.5) * (1 << shift)).astype(np.int32) for polygon in polygons]
+    cv2.fillPoly(grid, vertices, 1, lineType=cv2.LINE_8, shift=shift)
+    return grid.astype(bool)
+
+def get_cluster_point_indices(cluster_labels: np.ndarray) -> tuple:
+    """
+    Get the point indices of each cluster from a cluster label array, in CSR form: the indices of the points of cluster k are point_indices[cluster_offsets[k]:cluster_offsets[k+1]].
+
+    Args:
+        cluster_labels (np.ndarray): Cluster label of each point with shape (N,), clusters are numbered from 0 and -1 is noise.
+
+    Returns:
+        tuple: Tuple containing the point indices sorted by cluster (and by index within a cluster) with shape (M,), and the cluster offsets with shape (K+1,).
+
+    """
+    clustered = np.flatnonzero(cluster_labels >= 0)
+    point_indices = clustered[np.argsort(cluster_labels[clustered], kind='stable')]
+    cluster_offsets = np.zeros(int(cluster_labels.max(initial=-1)) + 2, dtype=np.int64)
+    np.cumsum(np.bincount(cluster_labels[clustered], minlength=len(cluster_offsets) - 1), out=cluster_offsets[1:])
+    return point_indices, cluster_offsets
+
+def fit_bev_oriented_boxes(points: np.ndarray, cluster_offsets: np.ndarray, method: str = 'min_area') -> tuple:
+    """
+    Fit yaw-only oriented bounding boxes to a batch of clusters, the yaw is found in bird's-eye view and the z bounds are the min/max of the cluster.
+    With 'min_area' the yaw is the one of the minimum-area rectangle enclosing the 2D convex hull (rotating calipers, one of its sides is on a hull edge),
+    with 'pca' it is the principal axis of the xy covariance. The boxes are oriented so that their x extent (length) is not smaller than their y extent (width).
+
+    Args:
+        points (np.ndarray): Points of all the clusters with shape (M, 3+), the points of cluster k are points[cluster_offsets[k]:cluster_offsets[k+1]].
+        cluster_offsets (np.ndarray): Cluster offsets with shape (K+1,), every cluster must have at least one point.
+        method (str): 'min_area' or 'pca'.
+
+    Returns:
+        tuple: Tuple containing the centers, extents and euler angles (roll and pitch are 0) of the boxes, each with shape (K, 3) and dtype float32.
+
+    """
+    xy = np.asarray(points[:, :2], dtype=np.float64)
+    z = np.asarray(points[:, 2], dtype=np.float64)
+    cluster_offsets = np.asarray(cluster_offsets, dtype=np.int64)
+    cluster_starts, cluster_sizes = cluster_offsets[:-1], np.diff(cluster_offsets)
+    number_of_clusters = len(cluster_sizes)
+    cluster_of_points = np.repeat(np.arange(number_of_clusters), cluster_sizes)
+    # points are centered per cluster to keep the projections precise far from the lidar
+    means = np.add.reduceat(xy, cluster_starts, axis=0) / cluster_sizes[:, None]
+    xy = xy - means[cluster_of_points]
+
+    if method == 'pca':
+        covariances = np.add.reduceat(np.column_stack((xy[:, 0] * xy[:, 0], xy[:, 1] * xy[:, 1], xy[:, 0] * xy[:, 1])), cluster_starts, axis=0)
+        yaws = 0.5 * np.arctan2(2 * covariances[:, 2], covariances[:, 0] - covariances[:, 1])
+    else:
+        import cv2
+        # 2D convex hull of each cluster, the candidate yaws are the directions of the hull edges
+        hulls = [cv2.convexHull(xy[start:end].astype(np.float32)).reshape(-1, 2).astype(np.float64) for start, end in zip(cluster_offsets[:-1].tolist(), cluster_offsets[1:].tolist())]
+        hull_sizes = np.array([len(hull) for hull in hulls], dtype=np.int64)
+        hull_points = np.concatenate(hulls)
+        hull_starts = np.concatenate(([0], np.cumsum(hull_sizes)[:-1]))
+        next_indices = np.arange(len(hull_points)) + 1
+        next_indices[hull_starts + hull_sizes - 1] = hull_starts
+        edges = hull_points[next_indices] - hull_points
+        candidate_yaws = np.arctan2(edges[:, 1], edges[:, 0])
+        candidate_clusters = np.repeat(np.arange(number_of_clusters), hull_sizes)
+        # project the hull of each candidate's cluster on the candidate axes
+        counts = hull_sizes[candidate_clusters]
+        candidates = np.repeat(np.arange(len(candidate_yaws)), counts)
+        hull_indices = np.repeat(hull_starts[candidate_clusters] - np.concatenate(([0], np.cumsum(counts)[:-1])), counts) + np.arange(len(candidates))
+        cos, sin = np.cos(candidate_yaws)[candidates], np.sin(candidate_yaws)[candidates]
+        u = hull_points[hull_indices, 0] * cos + hull_points[hull_indices, 1] * sin
+        v = hull_points[hull_indices, 1] * cos - hull_points[hull_indices, 0] * sin
+        candidate_starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+        areas = (np.maximum.reduceat(u, candidate_starts) - np.minimum.reduceat(u, candidate_starts)) * (np.maximum.reduceat(v, candidate_starts) - np.minimum.reduceat(v, candidate_starts))
+        # the candidate with the smallest area of each cluster, the first one on ties
+        order = np.lexsort((np.arange(len(areas)), areas, candidate_clusters))
+        yaws = candidate_yaws[order[np.searchsorted(candidate_clusters[order], np.arange(number_of_clusters))]]
+
+    # bounds of each cluster in its box frame
+    cos, sin = np.cos(yaws), np.sin(yaws)
+    u = xy[:, 0] * cos[cluster_of_points] + xy[:, 1] * sin[cluster_of_points]
+    v = xy[:, 1] * cos[cluster_of_points] - xy[:, 0] * sin[cluster_of_points]
+    min_u, max_u = np.minimum.reduceat(u, cluster_starts), np.maximum.reduceat(u, cluster_starts)
+    min_v, max_v = np.minimum.reduceat(v, cluster_starts), np.maximum.reduceat(v, cluster_starts)
+    min_z, max_z = np.minimum.reduceat(z, cluster_starts), np.maximum.reduceat(z, cluster_starts)
+    center_u, center_v = (min_u + max_u) / 2, (min_v + max_v) / 2
+    lengths, widths = max_u - min_u, max_v - min_v
+
+    centers = np.column_stack((means[:, 0] + center_u * cos - center_v * sin, means[:, 1] + center_u * sin + center_v * cos, (min_z + max_z) / 2))
+    # the length is along the box x axis, the yaw is wrapped to [-pi/2, pi/2)
+    swap = widths > lengths
+    extents = np.column_stack((np.where(swap, widths, lengths), np.where(swap, lengths, widths), max_z - min_z))
+    yaws = np.mod(yaws + np.where(swap, np.pi / 2, 0.0) + np.pi / 2, np.pi) - np.pi / 2
+    euler_angles = np.column_stack((np.zeros(number_of_clusters), np.zeros(number_of_clusters), yaws))
+    return centers.astype(np.float32), extents.astype(np.float32), euler_angles.astype(np.float32)
+
+def get_bev_box_corners(centers: np.ndarray, extents: np.ndarray, yaws: np.ndarray) -> np.ndarray:
+    """
+    Get the bird's-eye view corners of a batch of yaw-oriented bounding boxes, in counter-clockwise order.
+
+    Args:
+        centers (np.ndarray): Box centers with shape (K, 2+).
+        extents (np.ndarray): Box extents with shape (K, 2+).
+        yaws (np.ndarray): Box yaws with shape (K,).
+
+    Returns:
+        np.ndarray: Corners with shape (K, 4, 2).
+
+    """
+    centers, extents, yaws = np.asarray(centers, dtype=np.float64), np.asarray(extents, dtype=np.float64), np.asarray(yaws, dtype=np.float64)
+    local_corners = np.array([[0.5, 0.5], [-0.5, 0.5], [-0.5, -0.5], [0.5, -0.5]]) * extents[:, None, :2]
+    cos, sin = np.cos(yaws)[:, None], np.sin(yaws)[:, None]
+    return np.stack((local_corners[..., 0] * cos - local_corners[..., 1] * sin, local_corners[..., 0] * sin + local_corners[..., 1] * cos), axis=-1) + centers[:, None, :2]
+
+def get_bev_ious(centers_a: np.ndarray, extents_a: np.ndarray, yaws_a: np.ndarray, centers_b: np.ndarray, extents_b: np.ndarray, yaws_b: np.ndarray) -> np.ndarray:
+    """
+    Get the bird's-eye view intersection over union of a batch of pairs of yaw-oriented bounding boxes, for all the pairs at once.
+    The intersection is found by clipping the rectangle a of every pair by the four edges of the rectangle b (Sutherland-Hodgman), the clipped polygons
+    are stored in fixed-size arrays of 8 vertices (the maximum for two rectangles) so every step is a batched numpy operation.
+
+    Args:
+        centers_a (np.ndarray): Centers of the first boxes of the pairs with shape (P, 2+).
+        extents_a (np.ndarray): Extents of the first boxes of the pairs with shape (P, 2+).
+        yaws_a (np.ndarray): Yaws of the first boxes of the pairs with shape (P,).
+        centers_b (np.ndarray): Centers of the second boxes of the pairs with shape (P, 2+).
+        extents_b (np.ndarray): Extents of the second boxes of the pairs with shape (P, 2+).
+        yaws_b (np.ndarray): Yaws of the second boxes of the pairs with shape (P,).
+
+    Returns:
+        np.ndarray: Intersection over union of each pair with shape (P,), 0 for pairs of empty boxes.
+
+    """
+    corners_b = get_bev_box_corners(centers_b, extents_b, yaws_b)
+    number_of_pairs = len(corners_b)
+    polygons = np.zeros((number_of_pairs, 8, 2))
+    polygons[:, :4] = get_bev_box_corners(centers_a, extents_a, yaws_a)
+    sizes = np.full(number_of_pairs, 4, dtype=np.int64)
+    pairs, vertex_indices = np.arange(number_of_pairs)[:, None], np.arange(8)[None, :]
+    # the unused vertex slots and the parallel segments give NaNs, they are never emitted
+    with np.errstate(divide='ignore', invalid='ignore'):
+        for edge in range(4):
+            edge_start, edge_end = corners_b[:, edge, None], corners_b[:, (edge + 1) % 4, None]
+            previous_indices = np.where(vertex_indices == 0, sizes[:, None] - 1, vertex_indices - 1)
+            previous_vertices = polygons[pairs, previous_indices]
+            # signed distance of the vertices to the edge, positive inside the counter-clockwise rectangle b
+            edge_direction = edge_end - edge_start
+            side = lambda vertices: edge_direction[..., 0] * (vertices[..., 1] - edge_start[..., 1]) - edge_direction[..., 1] * (vertices[..., 0] - edge_start[..., 0])
+            current_side, previous_side = side(polygons), side(previous_vertices)
+            valid = vertex_indices < sizes[:, None]
+            current_inside, previous_inside = current_side >= 0, previous_side >= 0
+            # every vertex emits the intersection of the edge with its incoming segment if the segment crosses the edge, then itself if it is inside
+            t = previous_side / (previous_side - current_side)
+            intersections = previous_vertices + t[..., None] * (polygons - previous_vertices)
+            emitted = np.stack((valid & (current_inside != previous_inside), valid & current_inside), axis=2).reshape(number_of_pairs, 16)
+            candidates = np.stack((intersections, polygons), axis=2).reshape(number_of_pairs, 16, 2)
+            # the emitted vertices are moved to the front in order
+            order = np.argsort(~emitted, axis=1, kind='stable')[:, :8]
+            polygons = candidates[pairs, order]
+            sizes = np.minimum(emitted.sum(axis=1), 8)
+        # shoelace area of the clipped polygons
+        next_vertices = polygons[pairs, np.where(vertex_indices + 1 < sizes[:, None], vertex_indices + 1, 0)]
+        cross = polygons[..., 0] * next_vertices[..., 1] - polygons[..., 1] * next_vertices[..., 0]
+        intersection_areas = 0.5 * np.abs(np.where(vertex_indices < sizes[:, None], cross, 0.0).sum(axis=1))
+        union_areas = np.prod(np.asarray(extents_a, dtype=np.float64)[:, :2], axis=1) + np.prod(np.asarray(extents_b, dtype=np.float64)[:, :2], axis=1) - intersection_areas
+        return np.where(union_areas > 0, intersection_areas / union_areas, 0.0)
+
+def get_rotation_matrices_from_xyz(euler_angles: np.ndarray) -> np.ndarray:
+    """
+    Get the rotation matrices of a batch of euler angles, using the same convention as o3d.geometry.OrientedBoundingBox.get_rotation_matrix_from_xyz, i.e., R = Rx @ Ry @ Rz.
+
+    Args:
+        euler_angles (np.ndarray): Euler angles with shape (K, 3).
+
+    Returns:
+        np.ndarray: Rotation matrices with shape (K, 3, 3).
+
+    """
+    euler_angles = np.asarray(euler_angles, dtype=np.float64).reshape(-1, 3)
+    (cx, cy, cz), (sx, sy, sz) = np.cos(euler_angles).T, np.sin(euler_angles).T
+    rotation_matrices = np.empty((len(euler_angles), 3, 3), dtype=np.float64)
+    rotation_matrices[:, 0, 0], rotation_matrices[:, 0, 1], rotation_matrices[:, 0, 2] = cy * cz, -cy * sz, sy
+    rotation_matrices[:, 1, 0], rotation_matrices[:, 1, 1], rotation_matrices[:, 1, 2] = cx * sz + sx * sy * cz, cx * cz - sx * sy * sz, -sx * cy
+    rotation_matrices[:, 2, 0], rotation_matrices[:, 2, 1], rotation_matrices[:, 2, 2] = sx * sz - cx * sy * cz, sx * cz + cx * sy * sz, cx * cy
+    return rotation_matrices
+
+# maximum number of bird's-eye-view cells of the points_in_boxes grid, beyond it the boxes are processed one by one
+max_bev_grid_cells = 1 << 22
+
+def points_in_boxes(points: np.ndarray, centers: np.ndarray, extents: np.ndarray, euler_angles: np.ndarray, bev_cell_size: float = 2.0) -> tuple:
+    """
+    Find the points inside each of a batch of oriented bounding boxes, for all the boxes in one pass.
+
+    The boxes are first rasterized into a coarse bird's-eye-view grid by their axis-aligned bounds, so every point is only tested against the few boxes registered in its grid cell.
+    The candidate (point, box) pairs are then transformed into the box frames in one batch. A point inside several (overlapping) boxes is reported for each of them.
+
+    Boxes with non-finite parameters contain no points. If the grid (or the cells of the boxes) would exceed max_bev_grid_cells, e.g. for a huge box,
+    the points are found box by box with points_in_boxes_per_box instead.
+
+    Args:
+        points (np.ndarray): Points with shape (N, 3+).
+        centers (np.ndarray): Box centers with shape (K, 3).
+        extents (np.ndarray): Box extents with shape (K, 3).
+        euler_angles (np.ndarray): Box euler angles with shape (K, 3), see get_rotation_matrices_from_xyz.
+        bev_cell_size (float, optional): Size of the bird's-eye-view grid cells. Defaults to 2.0.
+
+    Returns:
+        tuple: (point_indices, box_offsets), the indices of the points inside box k are point_indices[box_offsets[k]:box_offsets[k+1]], in increasing order.
+
+    """
+    points = np.asarray(points[:, :3], dtype=np.float32)
+    centers = np.asarray(centers, dtype=np.float32).reshape(-1, 3)
+    half_extents = np.asarray(extents, dtype=np.float32).reshape(-1, 3) / 2.0
+    num_boxes = len(centers)
+    if num_boxes == 0 or len(points) == 0: return np.zeros(0, dtype=np.int64), np.zeros(num_boxes + 1, dtype=np.int64)
+    euler_angles = np.asarray(euler_angles, dtype=np.float32).reshape(-1, 3)
+    rotation_matrices = get_rotation_matrices_from_xyz(euler_angles).astype(np.float32)
+
+    # boxes with non-finite parameters (e.g. a diverged prediction) contain no points, the points of the other boxes are found without them
+    valid = np.isfinite(centers).all(axis=1) & np.isfinite(half_extents).all(axis=1) & np.isfinite(rotation_matrices).all(axis=(1, 2))
+    if not valid.all():
+        point_indices, valid_box_offsets = points_in_boxes(points, centers[valid], half_extents[valid] * 2.0, euler_angles[valid], bev_cell_size)
+        box_counts = np.zeros(num_boxes, dtype=np.int64)
+        box_counts[valid] = np.diff(valid_box_offsets)
+        return point_indices, np.concatenate(([0], np.cumsum(box_counts)))
+
+    # axis-aligned bounds of the boxes, the half size of a rotated box along each axis is |R| @ half_extent
+    aabb_half_sizes = np.einsum('kij,kj->ki', np.abs(rotation_matrices), half_extents)
+    aabb_min, aabb_max = centers - aabb_half_sizes, centers + aabb_half_sizes
+
+    # only the points inside the bounds of all the boxes are candidates
+    grid_min, grid_max = aabb_min.min(axis=0), aabb_max.max(axis=0)
+    candidate_points = np.flatnonzero(np.all((points >= grid_min) & (points <= grid_max), axis=1))
+    if len(candidate_points) == 0: return np.zeros(0, dtype=np.int64), np.zeros(num_boxes + 1, dtype=np.int64)
+
+    # the grid and the cells of the boxes are counted in floating point first, so that huge boxes neither overflow nor exhaust the memory
+    grid_cells = np.prod(np.floor((grid_max[:2].astype(np.float64) - grid_min[:2]) / bev_cell_size) + 1)
+    box_cells = np.prod(np.floor((aabb_max[:, :2].astype(np.float64) - grid_min[:2]) / bev_cell_size) - np.floor((aabb_min[:, :2].astype(np.float64) - grid_min[:2]) / bev_cell_size) + 1, axis=1).sum()
+    if grid_cells > max_bev_grid_cells or box_cells > max_bev_grid_cells: return points_in_boxes_per_box(points, centers, half_extents * 2.0, euler_angles)
+
+    # register every box in the bird's-eye-view cells its bounds overlap
+    grid_size = np.floor((grid_max[:2] - grid_min[:2]) / bev_cell_size).astype(np.int64) + 1
+    box_cell_min = np.floor((aabb_min[:, :2] - grid_min[:2]) / bev_cell_size).astype(np.int64)
+    box_cell_max = np.floor((aabb_max[:, :2] - grid_min[:2]) / bev_cell_size).astype(np.int64)
+    box_cell_counts = box_cell_max - box_cell_min + 1
+    cells_per_box = box_cell_counts[:, 0] * box_cell_counts[:, 1]
+    box_ids = np.repeat(np.arange(num_boxes), cells_per_box)
+    # rank of each (box, cell) pair within its box, unraveled into the cell offsets of the box
+    rank = np.arange(len(box_ids)) - np.repeat(np.cumsum(cells_per_box) - cells_per_box, cells_per_box)
+    cell_x = box_cell_min[box_ids, 0] + rank // box_cell_counts[box_ids, 1]
+    cell_y = box_cell_min[box_ids, 1] + rank % box_cell_counts[box_ids, 1]
+    cell_ids = cell_x * grid_size[1] + cell_y
+    order = np.argsort(cell_ids, kind='stable')
+    cell_box_ids = box_ids[order]
+    cell_offsets = np.searchsorted(cell_ids[order], np.arange(grid_size[0] * grid_size[1] + 1))
+
+    # expand every candidate point into (point, box) pairs with the boxes of its cell
+    point_cells = np.floor((points[candidate_points, :2] - grid_min[:2]) / bev_cell_size).astype(np.int64)
+    point_cells = np.minimum(point_cells, grid_size - 1)
+    point_cell_ids = point_cells[:, 0] * grid_size[1] + point_cells[:, 1]
+    boxes_per_point = cell_offsets[point_cell_ids + 1] - cell_offsets[point_cell_ids]
+    pair_points = np.repeat(candidate_points, boxes_per_point)
+    pair_rank = np.arange(len(pair_points)) - np.repeat(np.cumsum(boxes_per_point) - boxes_per_point, boxes_per_point)
+    pair_boxes = cell_box_ids[np.repeat(cell_offsets[point_cell_ids], boxes_per_point) + pair_rank]
+
+    # transform the pairs into the box frames, row vectors are rotated by R.T, so (p - c) @ R gives R.T @ (p - c)
+    local_points = np.einsum('ni,nij->nj', points[pair_points] - centers[pair_boxes], rotation_matrices[pair_boxes])
+    inside = np.all(np.abs(local_points) <= half_extents[pair_boxes], axis=1)
+    pair_points, pair_boxes = pair_points[inside], pair_boxes[inside]
+
+    # group the points by box
+    order = np.argsort(pair_boxes, kind='stable')
+    box_offsets = np.concatenate(([0], np.cumsum(np.bincount(pair_boxes, minlength=num_boxes))))
+    return pair_points[order], box_offsets
+
+def points_in_boxes_per_box(points: np.ndarray, centers: np.ndarray, extents: np.ndarray, euler_angles: np.ndarray) -> tuple:
+    """
+    Find the points inside each of a batch of oriented bounding boxes, box by box. It is slower than points_in_boxes for many boxes but its memory does not depend
+    on the size of the boxes, points_in_boxes falls back to it for huge boxes.
+
+    Args:
+        points (np.ndarray): Points with shape (N, 3+).
+        centers (np.ndarray): Box centers with shape (K, 3).
+        extents (np.ndarray): Box extents with shape (K, 3).
+        euler_angles (np.ndarray): Box euler angles with shape (K, 3), see get_rotation_matrices_from_xyz.
+
+    Returns:
+        tuple: (point_indices, box_offsets), the indices of the points inside box k are point_indices[box_offsets[k]:box_offsets[k+1]], in increasing order.
+
+    """
+    points = np.asarray(points[:, :3], dtype=np.float32)
+    centers = np.asarray(centers, dtype=np.float32).reshape(-1, 3)
+    half_extents = np.asarray(extents, dtype=np.float32).reshape(-1, 3) / 2.0
+    rotation_matrices = get_rotation_matrices_from_xyz(euler_angles).astype(np.float32)
+    point_indices, box_counts = [np.zeros(0, dtype=np.int64)], np.zeros(len(centers), dtype=np.int64)
+    for k in range(len(centers)):
+        # only the points inside the axis-aligned bounds of the box are transformed into its frame
+        candidate_points = np.flatnonzero(np.all(np.abs(points - centers[k]) <= np.abs(rotation_matrices[k]) @ half_extents[k], axis=1))
+        local_points = (points[candidate_points] - centers[k]) @ rotation_matrices[k]
+        inside_points = candidate_points[np.all(np.abs(local_points) <= half_extents[k], axis=1)]
+        point_indices.append(inside_points)
+        box_counts[k] = len(inside_points)
+    return np.concatenate(point_indices), np.concatenate(([0], np.cumsum(box_counts)))
+
+def count_points_in_boxes(points: np.ndarray, centers: np.ndarray, extents: np.ndarray, euler_angles: np.ndarray) -> np.ndarray:
+    """
+    Count the points inside each of a batch of oriented bounding boxes.
+
+    Args:
+        points (np.ndarray): Points with shape (N, 3+).
+        centers (np.ndarray): Box centers with shape (K, 3).
+        extents (np.ndarray): Box extents with shape (K, 3).
+        euler_angles (np.ndarray): Box euler angles with shape (K, 3).
+
+    Returns:
+        np.ndarray: Number of points inside each box with shape (K,).
+
+    """
+    _, box_offsets = points_in_boxes(points, centers, extents, euler_angles)
+    return np.diff(box_offsets)
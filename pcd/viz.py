@@ -126,6 +126,7 @@ class PointCloudVisualizer:
             self.point_cloud.colors = o3d.utility.Vector3dVector(data_dict['current_point_cloud_point_colors'][:, 0:3])
         else:
             self.point_cloud.paint_uniform_color([1,1,1])
+        self.__add_clusters__(data_dict)
         self.__update_geometry__('point_cloud', self.point_cloud)
         
         self.__clear_bboxes__()
@@ -133,7 +134,8 @@ class PointCloudVisualizer:
             return
         for lbl in data_dict['current_label_list']:
             self.__add_bbox__(lbl)
-            self.__add_cluster__(lbl)
+        if self.cfg['visualization']['lidar'].get('paint_points_in_bbox', False):
+            self.__paint_points_in_bboxes__(data_dict['current_label_list'])
 
     def __add_bbox__(self, label_dict: dict):
         """
@@ -162,6 +164,29 @@ class PointCloudVisualizer:
         self.bboxes.append(lidar_xyz_bbox)
         self.__add_geometry__(f'bbox_{str(len(self.bboxes)+1).zfill(4)}', lidar_xyz_bbox, False)
         
+    def __paint_points_in_bboxes__(self, label_list):
+        """
+        Paints the points inside the bounding boxes with the colors of the bounding boxes.
+
+        Args:
+            label_list: A list of label dictionaries or a ColumnarLabelList.
+        """
+        from lbl.columnar import ColumnarLabelList
+        from pcd.utils import points_in_boxes
+        label_list = ColumnarLabelList.from_label_list(label_list)
+        label_list = label_list[label_list.has_lidar_bbox]
+        if len(label_list) == 0: return
+        # the points of all the bounding boxes are found at once
+        points = np.asarray(self.point_cloud.points)
+        inside_points, box_offsets = points_in_boxes(points, label_list.centers, label_list.extents, label_list.euler_angles)
+        # same colors as the bounding boxes, darker for ground truth
+        bbox_colors = np.where(label_list.predicted[:, None], label_list.lidar_colors, label_list.lidar_colors * 0.5)
+        colors = np.asarray(self.point_cloud.colors)
+        if colors.shape[0] != points.shape[0]: colors = np.ones_like(points)
+        colors[inside_points] = np.repeat(bbox_colors, np.diff(box_offsets), axis=0)
+        self.point_cloud.colors = o3d.utility.Vector3dVector(colors)
+        self.__update_geometry__('point_cloud', self.point_cloud)
+        
     def __clear_bboxes__(self):
         """
         Clears all the bounding boxes from the visualizer.
@@ -170,22 +195,26 @@ class PointCloudVisualizer:
             self.viz.remove_geometry(bbox, False)
         self.bboxes.clear()
 
-    def __add_cluster__(self, label_dict: dict):
+    def __add_clusters__(self, data_dict: dict):
         """
-        Adds a cluster to the visualizer.
+        Paints the points of all the clusters at once, from the cluster labels and CSR point indices set by the clusterer.
 
         Args:
-            label_dict: A dictionary containing the label information.
+            data_dict: A dictionary containing the data of the current frame.
         """
-        if 'lidar_cluster' not in label_dict:
-            return
-        # cluster params
-        lidar_cluster_dict = label_dict['lidar_cluster']
-        point_indices = lidar_cluster_dict['point_indices']
+        if 'current_point_cloud_cluster_point_indices' not in data_dict or 'current_point_cloud_cluster_offsets' not in data_dict: return
+        # the clusters index the points of the visualized point cloud, e.g. they are not painted if a process changed the points after the clusterer
+        if len(data_dict.get('current_point_cloud_cluster_labels', [])) != len(self.point_cloud.points): return
+        point_indices, cluster_offsets = data_dict['current_point_cloud_cluster_point_indices'], data_dict['current_point_cloud_cluster_offsets']
+        if len(cluster_offsets) < 2: return
         colors = np.asarray(self.point_cloud.colors)
-        if colors.shape[0] != point_indices.shape[0]:
+        if colors.shape[0] != len(self.point_cloud.points):
             colors = np.zeros_like(self.point_cloud.points)
-        colors[point_indices] = np.random.rand(3) # ToDO: use consistent color if tracking is enabled
+        # tracked clusters get a color seeded by their track id, so it is consistent across frames
+        cluster_colors = np.random.rand(len(cluster_offsets) - 1, 3)
+        cluster_track_ids = data_dict.get('current_point_cloud_cluster_track_ids', np.zeros(0, dtype=np.int64))
+        for cluster_id in np.flatnonzero(cluster_track_ids >= 0).tolist(): cluster_colors[cluster_id] = np.random.default_rng(cluster_track_ids[cluster_id]).random(3)
+        colors[point_indices] = np.repeat(cluster_colors, np.diff(cluster_offsets), axis=0)
         self.point_cloud.colors = o3d.utility.Vector3dVector(colors)
         
     def redraw(self):
@@ -44,3 +44,41 @@ def test_remove_out_of_bound_labels():
     # check if the label list is updated
     assert len(data_dict['current_label_list']) == 3, f'Expected 3 labels, got {len(data_dict["current_label_list"])}'
 
+
+def test_remove_less_point_labels():
+    import numpy as np
+    # create dummy configuration and data dictionaries
+    cfg_dict = {'logging': {'level': 0, 'path': 'logs'}}
+    data_dict = {}
+
+    # create a logger object as it is required by some algorithms
+    logger:Logger = Logger()
+    logger.reset(cfg_dict)
+
+    data_dict['logger'] = logger # add logger object to data_dict
+    
+    # import the function
+    func = __import__('algo.label', fromlist=['remove_less_point_labels']).remove_less_point_labels
+
+    # minimum number of points
+    cfg_dict['proc'] = {'label': {'remove_less_point_labels': {'min_points': 5}}}
+
+    # 10 points around (0, 0, 0) and 2 points around (5, 0, 0)
+    data_dict['current_point_cloud_numpy'] = np.array([[0.1 * i, 0, 0, 1] for i in range(-5, 5)] + [[5, 0, 0, 1], [5.2, 0, 0, 1]], dtype=np.float32)
+
+    # create dummy data
+    data_dict['current_label_list'] = []
+    # add a label with enough points
+    data_dict['current_label_list'].append({'lidar_bbox': {'lidar_xyz_center': [0, 0, 0], 'lidar_xyz_extent': [2, 2, 2], 'lidar_xyz_euler_angles': [0, 0, 0]}})
+    # add a rotated label with enough points, its x extent lies along the y axis
+    data_dict['current_label_list'].append({'lidar_bbox': {'lidar_xyz_center': [0, 0, 0], 'lidar_xyz_extent': [0.1, 2, 0.1], 'lidar_xyz_euler_angles': [0, 0, np.pi / 2]}})
+    # add a label with less points
+    data_dict['current_label_list'].append({'lidar_bbox': {'lidar_xyz_center': [5, 0, 0], 'lidar_xyz_extent': [1, 1, 1], 'lidar_xyz_euler_angles': [0, 0, 0]}})
+    # add a label without points
+    data_dict['current_label_list'].append({'lidar_bbox': {'lidar_xyz_center': [0, 5, 0], 'lidar_xyz_extent': [1, 1, 1], 'lidar_xyz_euler_angles': [0, 0, 0]}})
+
+    # run the function
+    func(data_dict, cfg_dict)
+
+    # check if the label list is updated
+    assert len(data_dict['current_label_list']) == 2, f'Expected 2 labels, got {len(data_dict["current_label_list"])}'
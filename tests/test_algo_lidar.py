@@ -40,6 +40,39 @@ def test_crop():
     # check if the point cloud is updated
     assert data_dict['current_point_cloud_numpy'].shape[0] == 3, f'Expected 3 points, got {data_dict["current_point_cloud_numpy"].shape[0]}'
 
+def test_crop_roi_polygons():
+    # create dummy configuration and data dictionaries
+    cfg_dict = {'logging': {'level': 0, 'path': 'logs'}}
+    data_dict = {}
+
+    # create a logger object as it is required by some algorithms
+    logger:Logger = Logger()
+    logger.reset(cfg_dict)
+
+    data_dict['logger'] = logger # add logger object to data_dict
+    
+    # import the function
+    func = __import__('algo.lidar', fromlist=['crop']).crop
+
+    # crop bound with a triangular region of interest covering the lower-left half of the xy plane
+    cfg_dict['proc'] = {'lidar': {'crop': {'min_xyz': [0, 0, 0], 'max_xyz': [10, 10, 10], 'roi_polygons': [[[0, 0], [10, 0], [0, 10]]], 'roi_cell_size': 0.1}}}
+
+    # create dummy data, the first two points are inside the region of interest
+    point_cloud = np.array([[1, 1, 5], [6, 2, 5], [8, 8, 5], [2, 9, 5], [11, 1, 5]], dtype=np.float32)
+
+    # run the function twice to reuse the rasterized grid and the buffers
+    for _ in range(2):
+        data_dict['current_point_cloud_numpy'] = point_cloud
+        func(data_dict, cfg_dict)
+
+        # check if the point cloud and the colors are updated
+        assert np.array_equal(data_dict['current_point_cloud_numpy'], point_cloud[:2]), f'Expected the first 2 points, got {data_dict["current_point_cloud_numpy"]}'
+        assert data_dict['current_point_cloud_point_colors'].shape == (2, 3), f'Expected colors of shape (2, 3), got {data_dict["current_point_cloud_point_colors"].shape}'
+        assert np.all(data_dict['current_point_cloud_point_colors'] == 1), 'Expected default colors to be ones'
+
+        # later processes paint the colors in-place, the paint does not leak into the next frame
+        data_dict['current_point_cloud_point_colors'][0] = [0, 1, 0]
+
 def test_project_image_pixel_colors():
     # create dummy configuration and data dictionaries
     cfg_dict = {'logging': {'level': 0, 'path': 'logs'}}
@@ -110,3 +143,341 @@ def test_project_image_pixel_colors():
     assert number_of_green_points == 81, f'Expected 81 green points, got {number_of_green_points}'
 
 
+
+def test_online_stdf():
+    from algo.non_nn.STDF import OnlineSTDF
+
+    # a static background observed in every frame
+    rng = np.random.default_rng(0)
+    background = rng.uniform(-8, 8, (200, 3)).astype(np.float32)
+    online_filter = OnlineSTDF(10, 2, decay=0.2, prune_density=0.01)
+
+    # before any update every point is foreground
+    assert np.all(online_filter(background, 0.5)), 'Expected all points to be foreground before any update'
+
+    # after enough updates the background is filtered and a new object is foreground
+    for _ in range(20): online_filter.update(background)
+    obj = np.array([[9.5, 9.5, 9.5]], dtype=np.float32)
+    assert not np.any(online_filter(background, 0.5)), 'Expected the background points to be filtered'
+    assert np.all(online_filter(obj, 0.5)), 'Expected the new object to be foreground'
+
+    # once the background disappears, its voxels decay and are pruned
+    for _ in range(40): online_filter.update(obj)
+    assert np.all(online_filter(background, 0.5)), 'Expected the disappeared background to become foreground'
+    assert len(online_filter.voxel_keys) == 1, f'Expected only the object voxel to remain, got {len(online_filter.voxel_keys)}'
+
+def test_stdf_save_load(tmp_path):
+    from algo.non_nn.STDF import STDF, STDFFilter
+
+    # create dummy configuration and data dictionaries
+    cfg_dict = {'logging': {'level': 0, 'path': 'logs'}}
+    data_dict = {}
+
+    # create a logger object as it is required by some algorithms
+    logger:Logger = Logger()
+    logger.reset(cfg_dict)
+
+    data_dict['logger'] = logger # add logger object to data_dict
+
+    # compute and save a filter from a static background
+    rng = np.random.default_rng(0)
+    background = rng.uniform(-8, 8, (200, 3)).astype(np.float32)
+    query = np.vstack((background, rng.uniform(-12, 12, (100, 3)).astype(np.float32)))
+    params = {'lidar_range_in_unit_length': 10, 'bins_per_unit_length': 2}
+    stdf_filter = STDF([background] * 3, params['lidar_range_in_unit_length'], params['bins_per_unit_length'])
+    stdf_filter.save(str(tmp_path / 'filter.npz'), params)
+
+    # the loaded filter must give the same mask
+    loaded_filter, loaded_params = STDFFilter.load(str(tmp_path / 'filter.npz'))
+    assert loaded_params == params, f'Expected params {params}, got {loaded_params}'
+    assert np.array_equal(stdf_filter(query, 0.5), loaded_filter(query, 0.5)), 'Saved and loaded masks differ'
+
+    # BGFilterSTDF must use the saved filter on the first frame without gathering
+    func = __import__('algo.lidar', fromlist=['BGFilterSTDF']).BGFilterSTDF
+    cfg_dict['data'] = {'path': str(tmp_path)}
+    cfg_dict['proc'] = {'lidar': {'BGFilterSTDF': {'number_of_frame_gather_iters': 6, 'number_of_frames_in_each_gather_iter': 10, 'number_of_skip_frames_after_each_iter': 100,
+                                                   'number_of_points_per_frame': len(query), 'background_density_threshold': 0.5,
+                                                   'filter_path': 'filter.npz', 'load_filter': True, **params}}}
+    data_dict['current_frame_index'] = 0
+    data_dict['current_point_cloud_numpy'] = query
+    func(data_dict, cfg_dict)
+    assert np.array_equal(data_dict['current_point_cloud_numpy'], query[stdf_filter(query, 0.5)]), 'Expected the loaded filter to be applied on the first frame'
+
+def test_stdf_voxel_keys():
+    from algo.non_nn.STDF import get_voxel_keys
+
+    # random points, some of them outside the bins, and points on the bin edges
+    rng = np.random.default_rng(0)
+    for lidar_range_in_unit_length, bins_per_unit_length in [(100, 2), (50, 3)]:
+        bins_per_side = int(lidar_range_in_unit_length * bins_per_unit_length)
+        bins = np.linspace(-lidar_range_in_unit_length, lidar_range_in_unit_length, bins_per_side+1)
+        points = np.vstack((rng.normal(0, lidar_range_in_unit_length / 2, (100000, 3)), np.repeat(bins[::7, None], 3, axis=1))).astype(np.float32)
+
+        # the arithmetic keys must match the ones computed with np.digitize
+        voxel_indices = np.clip(np.digitize(points, bins) - 1, 0, bins_per_side-1).astype(np.int64)
+        expected_keys = (voxel_indices[:,0] * bins_per_side + voxel_indices[:,1]) * bins_per_side + voxel_indices[:,2]
+        assert np.array_equal(get_voxel_keys(points, bins), expected_keys), f'Voxel keys differ from np.digitize for {bins_per_side} bins per side'
+
+    # points with a non-finite coordinate are in no voxel and are foreground for every filter
+    from algo.non_nn.STDF import STDFAccumulator, SphericalBins
+    points = np.array([[5, 2, 1], [np.nan, 0, 0], [0, np.inf, 0], [0, 0, -np.inf]], dtype=np.float32)
+    for bins in [np.linspace(-10, 10, 21), SphericalBins(10, 0.5, 8, 16, [-30, 30], 4)]:
+        assert get_voxel_keys(points, bins)[1:].tolist() == [-1, -1, -1], 'Expected the key -1 for non-finite points'
+        accumulator = STDFAccumulator(10, 1, bins if isinstance(bins, SphericalBins) else None)
+        accumulator.add(np.repeat(points, 10, axis=0))
+        for sparse in [False, True]: assert accumulator.get_filter(sparse)(points, 0.5).tolist() == [False, True, True, True], 'Expected non-finite points to be foreground'
+
+def test_stdf_accumulator():
+    from algo.non_nn.STDF import STDF, STDFAccumulator
+    from pcd.utils import get_fixed_sized_point_cloud
+
+    # create dummy configuration and data dictionaries
+    cfg_dict = {'logging': {'level': 0, 'path': 'logs'}}
+    data_dict = {}
+
+    # create a logger object as it is required by some algorithms
+    logger:Logger = Logger()
+    logger.reset(cfg_dict)
+
+    data_dict['logger'] = logger # add logger object to data_dict
+
+    # create dummy frames of different sizes, some points are out of range
+    rng = np.random.default_rng(0)
+    frames = [rng.uniform(-12, 12, (rng.integers(150, 250), 4)).astype(np.float32) for _ in range(6)]
+    query = rng.uniform(-12, 12, (500, 4)).astype(np.float32)
+    expected_filter = STDF([get_fixed_sized_point_cloud(frame, 200) for frame in frames[:2] + frames[3:5]], 10, 2)
+
+    # the accumulated filters must give the same masks as STDF
+    accumulator = STDFAccumulator(10, 2)
+    for frame in frames[:2] + frames[3:5]: accumulator.add(get_fixed_sized_point_cloud(frame, 200))
+    for sparse in [False, True]:
+        assert np.array_equal(accumulator.get_filter(sparse)(query, 0.3), expected_filter(query, 0.3)), f'Accumulated filter differs from STDF with sparse: {sparse}'
+
+    # BGFilterSTDF gathers 2 x 2 frames with 1 skipped frame after each gather iteration
+    func = __import__('algo.lidar', fromlist=['BGFilterSTDF']).BGFilterSTDF
+    cfg_dict['proc'] = {'lidar': {'BGFilterSTDF': {'number_of_frame_gather_iters': 2, 'number_of_frames_in_each_gather_iter': 2, 'number_of_skip_frames_after_each_iter': 1,
+                                                   'number_of_points_per_frame': 200, 'lidar_range_in_unit_length': 10, 'bins_per_unit_length': 2, 'background_density_threshold': 0.3}}}
+    for frame_index, frame in enumerate(frames):
+        data_dict['current_frame_index'] = frame_index
+        data_dict['current_point_cloud_numpy'] = frame
+        func(data_dict, cfg_dict)
+    assert 'BGFilterSTDF_query_frames_0' in data_dict and not isinstance(data_dict['BGFilterSTDF_query_frames_0'], list), 'Expected the frames to be accumulated, not stored'
+    accumulated_frames_indices = data_dict['BGFilterSTDF_query_frames_0_accumulated_frames_indices'] + data_dict['BGFilterSTDF_query_frames_1_accumulated_frames_indices']
+    expected_filter = STDF([get_fixed_sized_point_cloud(frames[i], 200) for i in accumulated_frames_indices], 10, 2)
+    data_dict['current_point_cloud_numpy'] = query
+    func(data_dict, cfg_dict)
+    assert np.array_equal(data_dict['current_point_cloud_numpy'], get_fixed_sized_point_cloud(query, 200)[expected_filter(get_fixed_sized_point_cloud(query, 200), 0.3)]), 'Expected the accumulated filter to be applied'
+
+def test_BGFilterRIBF():
+    # create dummy configuration and data dictionaries
+    cfg_dict = {'logging': {'level': 0, 'path': 'logs'}}
+    data_dict = {}
+
+    # create a logger object as it is required by some algorithms
+    logger:Logger = Logger()
+    logger.reset(cfg_dict)
+
+    data_dict['logger'] = logger # add logger object to data_dict
+
+    # import the function
+    func = __import__('algo.lidar', fromlist=['BGFilterRIBF']).BGFilterRIBF
+    cfg_dict['proc'] = {'lidar': {'BGFilterRIBF': {'image_height': 4, 'image_width': 16, 'ring_major_order': True, 'vertical_fov': [-10, 10], 'number_of_learning_frames': 3,
+                                                   'background_percentile': 90, 'update_step': 0.0, 'range_threshold': 0.5}}}
+
+    # create a 4 x 16 ring-major frame of a background at range 10, the last ring has no returns
+    elevation, azimuth = np.meshgrid(np.radians([7.5, 2.5, -2.5, -7.5]), np.linspace(-np.pi, np.pi, 16, endpoint=False) + np.pi / 16, indexing='ij')
+    directions = np.stack((np.cos(elevation) * np.cos(azimuth), np.cos(elevation) * np.sin(azimuth), np.sin(elevation)), axis=-1).reshape(-1, 3)
+    ranges = np.full(64, 10.0)
+    ranges[48:] = 0
+
+    # learn the background, frames are not filtered while learning
+    for frame_index in range(3):
+        data_dict['current_frame_index'] = frame_index
+        data_dict['current_point_cloud_numpy'] = (directions * ranges[:, None]).astype(np.float32)
+        func(data_dict, cfg_dict)
+        assert len(data_dict['current_point_cloud_numpy']) == 64, 'Expected frames not to be filtered while learning'
+
+    # an object at range 5 in front of the background and a return in the ring without background are foreground
+    object_ranges = ranges.copy()
+    object_ranges[[3, 4, 20]] = 5
+    object_ranges[50] = 8
+    data_dict['current_frame_index'] = 3
+    data_dict['current_point_cloud_numpy'] = (directions * object_ranges[:, None]).astype(np.float32)
+    func(data_dict, cfg_dict)
+    assert np.allclose(data_dict['current_point_cloud_numpy'], (directions * object_ranges[:, None])[[3, 4, 20, 50]], atol=1e-5), 'Expected only the object points to be foreground'
+
+    # a frame that is not in ring-major order is not filtered
+    data_dict['current_frame_index'] = 4
+    data_dict['current_point_cloud_numpy'] = (directions * object_ranges[:, None]).astype(np.float32)[object_ranges > 0]
+    func(data_dict, cfg_dict)
+    assert len(data_dict['current_point_cloud_numpy']) == np.count_nonzero(object_ranges), 'Expected the frame not to be filtered'
+
+    # without ring-major order, the points are mapped to the range image by their angles
+    cfg_dict['proc']['lidar']['BGFilterRIBF']['ring_major_order'] = False
+    for frame_index in range(5, 9):
+        data_dict['current_frame_index'] = frame_index
+        frame_ranges = ranges if frame_index < 8 else object_ranges
+        data_dict['current_point_cloud_numpy'] = (directions * frame_ranges[:, None]).astype(np.float32)[frame_ranges > 0]
+        func(data_dict, cfg_dict)
+    assert np.allclose(data_dict['current_point_cloud_numpy'], (directions * object_ranges[:, None])[[3, 4, 20, 50]], atol=1e-5), 'Expected only the object points to be foreground'
+
+def test_stdf_spherical_bins(tmp_path):
+    from algo.non_nn.STDF import STDFAccumulator, STDFFilter, SphericalBins, are_bins_equal
+
+    # a static background of rays hitting a sphere of radius 30 around the lidar
+    rng = np.random.default_rng(0)
+    azimuth, elevation = rng.uniform(-np.pi, np.pi, 2000), np.radians(rng.uniform(-20, 2, 2000))
+    directions = np.stack((np.cos(elevation) * np.cos(azimuth), np.cos(elevation) * np.sin(azimuth), np.sin(elevation)), axis=1)
+    background = (directions * 30).astype(np.float32)
+    obj = (directions[:20] * 10).astype(np.float32)
+
+    # accumulate the background with spherical bins
+    bins = SphericalBins(50, 1, 32, 256, [-25, 3], 32)
+    accumulator = STDFAccumulator(50, 2, bins)
+    for _ in range(3): accumulator.add(background)
+    for sparse in [False, True]:
+        stdf_filter = accumulator.get_filter(sparse)
+        assert not np.any(stdf_filter(background, 0.5)), 'Expected the background points to be filtered'
+        assert np.all(stdf_filter(obj, 0.5)), 'Expected the object points to be foreground'
+
+    # the spherical bins are saved with the filter
+    stdf_filter.save(str(tmp_path / 'filter.npz'))
+    loaded_filter, _ = STDFFilter.load(str(tmp_path / 'filter.npz'))
+    assert are_bins_equal(loaded_filter.bins, bins), 'Expected the loaded filter to have the same spherical bins'
+    assert np.array_equal(loaded_filter(background, 0.5), stdf_filter(background, 0.5)), 'Saved and loaded masks differ'
+
+def test_grid_dbscan():
+    from algo.non_nn.GridDBSCAN import GridDBSCAN
+
+    # blobs and uniform noise
+    rng = np.random.default_rng(0)
+    points = np.vstack([rng.normal(center, 0.4, (100, 3)) for center in rng.uniform(-10, 10, (5, 3))] + [rng.uniform(-12, 12, (100, 3))])
+    eps, min_samples = 0.5, 5
+
+    # brute-force DBSCAN, border points get the cluster of their lowest-index core neighbor
+    neighbors = np.linalg.norm(points[:, None] - points[None], axis=2) <= eps
+    core_mask = neighbors.sum(axis=1) >= min_samples
+    expected_labels = np.full(len(points), -1)
+    number_of_clusters = 0
+    for seed in np.flatnonzero(core_mask):
+        if expected_labels[seed] >= 0: continue
+        stack = [seed]
+        expected_labels[seed] = number_of_clusters
+        while stack:
+            for neighbor in np.flatnonzero(neighbors[stack.pop()] & core_mask & (expected_labels < 0)):
+                expected_labels[neighbor] = number_of_clusters
+                stack.append(neighbor)
+        number_of_clusters += 1
+    for border in np.flatnonzero(~core_mask & np.any(neighbors & core_mask, axis=1)):
+        expected_labels[border] = expected_labels[np.flatnonzero(neighbors[border] & core_mask).min()]
+
+    # the kd-tree and grid neighbor searches, with and without tiles, must give the same clusters
+    for use_scipy in [True, False]:
+        for num_threads in [1, 3]:
+            labels, core = GridDBSCAN(points, eps, min_samples, num_threads, use_scipy)
+            assert np.array_equal(core, core_mask), f'Core points differ with use_scipy: {use_scipy} and num_threads: {num_threads}'
+            assert np.array_equal(labels, expected_labels), f'Labels differ with use_scipy: {use_scipy} and num_threads: {num_threads}'
+
+    # many features with a small eps give more grid cells than an int64 key can index, the cells are keyed by their coordinates instead
+    from algo.non_nn.GridDBSCAN import get_grid_neighbor_pairs
+    points = np.vstack([rng.normal(center, 0.2, (20, 8)) for center in rng.uniform(-1000, 1000, (10, 8))])
+    neighbors = np.linalg.norm(points[:, None] - points[None], axis=2) <= 0.5
+    expected_pairs = np.argwhere(np.triu(neighbors, 1))
+    pairs = get_grid_neighbor_pairs(points, 0.5)
+    assert np.array_equal(pairs[np.lexsort(pairs.T[::-1])], expected_pairs), 'Pairs differ with byte keys'
+
+def test_cluster2object():
+    # create dummy configuration and data dictionaries
+    cfg_dict = {'logging': {'level': 0, 'path': 'logs'}}
+    data_dict = {}
+
+    # create a logger object as it is required by some algorithms
+    logger:Logger = Logger()
+    logger.reset(cfg_dict)
+
+    data_dict['logger'] = logger # add logger object to data_dict
+
+    # import the function
+    func = __import__('algo.lidar', fromlist=['Cluster2Object']).Cluster2Object
+    cfg_dict['proc'] = {'lidar': {'Cluster2Object': {'oriented': False,
+                                                     'size_constraints': {'Pedestrian': {'base_length': [0.35, 1.5], 'height': [1.0, 1.8]}, 'Car': {'base_length': [4.0, 4.8], 'height': [1.6, 1.8]}},
+                                                     'class_colors': {'Pedestrian': [1, 0, 0], 'Car': [0, 0, 1]}}}}
+
+    # a pedestrian sized, a car sized and an unclassifiable cluster
+    rng = np.random.default_rng(0)
+    pedestrian = rng.uniform([0, 0, 0], [0.5, 0.5, 1.7], (50, 3))
+    car = rng.uniform([10, 0, 0], [14.5, 2, 1.6], (50, 3))
+    other = rng.uniform([20, 0, 0], [22.5, 2, 2], (50, 3))
+    data_dict['current_point_cloud_numpy'] = np.vstack((pedestrian, car, other)).astype(np.float32)
+    data_dict['current_point_cloud_cluster_point_indices'] = np.arange(150)
+    data_dict['current_point_cloud_cluster_offsets'] = np.array([0, 50, 100, 150])
+
+    # run the function
+    func(data_dict, cfg_dict)
+
+    # check the bounding boxes added for the classified clusters
+    label_list = data_dict['current_label_list']
+    boxes = [label for label in label_list if 'lidar_bbox' in label]
+    assert [label['class'] for label in boxes] == ['Pedestrian', 'Car'], f'Expected Pedestrian and Car boxes, got {[label["class"] for label in boxes]}'
+    assert [label['lidar_cluster_id'] for label in boxes] == [0, 1], 'Expected the boxes to keep the ids of their clusters'
+    for label, cluster in zip(boxes, [pedestrian, car]):
+        assert np.allclose(label['lidar_bbox']['lidar_xyz_center'], (cluster.min(axis=0) + cluster.max(axis=0)) / 2, atol=1e-5), 'Expected the box center to be the center of the cluster bounds'
+        assert np.allclose(label['lidar_bbox']['lidar_xyz_extent'], cluster.max(axis=0) - cluster.min(axis=0), atol=1e-5), 'Expected the box extent to be the size of the cluster bounds'
+
+def test_tracker_cv_kalman():
+    # create dummy configuration and data dictionaries
+    cfg_dict = {'logging': {'level': 0, 'path': 'logs'}}
+    data_dict = {}
+
+    # create a logger object as it is required by some algorithms
+    logger:Logger = Logger()
+    logger.reset(cfg_dict)
+
+    data_dict['logger'] = logger # add logger object to data_dict
+
+    # import the function
+    func = __import__('algo.lidar', fromlist=['Tracker_CV_Kalman']).Tracker_CV_Kalman
+    from lbl.columnar import ColumnarLabelList
+
+    for use_hungarian in [True, False]:
+        cfg_dict['proc'] = {'lidar': {'Tracker_CV_Kalman': {'max_distance': 2.0, 'max_age': 2, 'min_hits': 2, 'process_noise': 0.5, 'measurement_noise': 0.2, 'use_hungarian': use_hungarian}}}
+        for key in [key for key in data_dict if key.startswith('Tracker_CV_Kalman')]: data_dict.pop(key)
+        track_ids = []
+        for frame_index in range(10):
+            # two cars moving 1.5 units per frame towards each other on parallel lanes 1.5 units apart, listed in a different order every frame
+            centers = np.array([[-10 + 1.5 * frame_index, 0, 0], [10 - 1.5 * frame_index, 1.5, 0]], dtype=np.float32)
+            order = [0, 1] if frame_index % 2 == 0 else [1, 0]
+            label_list = ColumnarLabelList()
+            label_list.extend_boxes(centers[order], np.tile([4.5, 1.8, 1.5], (2, 1)), np.zeros(2), ['Car', 'Car'], extras=[{'lidar_cluster_id': i} for i in order])
+            data_dict['current_point_cloud_cluster_track_ids'] = np.full(2, -1, dtype=np.int64)
+            data_dict['current_frame_index'] = frame_index
+            data_dict['current_label_list'] = label_list
+            func(data_dict, cfg_dict)
+            track_ids.append([next((extras.get('track_id', -1) for extras in label_list.extras if extras['lidar_cluster_id'] == i)) for i in range(2)])
+            # the clusters get the track ids of their boxes
+            assert data_dict['current_point_cloud_cluster_track_ids'].tolist() == track_ids[-1], 'Expected the clusters to have the track ids of their boxes'
+
+        # ids are reported from the second frame and stay the same when the cars pass each other
+        assert track_ids[0] == [-1, -1], f'Expected no track ids before min_hits, got {track_ids[0]}'
+        assert all(ids == track_ids[1] for ids in track_ids[1:]) and track_ids[1][0] != track_ids[1][1] and min(track_ids[1]) >= 0, f'Expected consistent track ids, got {track_ids}'
+
+        # processing a frame again with other boxes gives the same tracker state as processing it once
+        tracker = data_dict['Tracker_CV_Kalman_tracker']
+        state = tracker.get_state()
+        data_dict['current_frame_index'] = 10
+        for number_of_boxes in [1, 2]:
+            data_dict['current_label_list'] = label_list = ColumnarLabelList()
+            label_list.extend_boxes(centers[:number_of_boxes] + [1.5, 0, 0], np.tile([4.5, 1.8, 1.5], (number_of_boxes, 1)), np.zeros(number_of_boxes), ['Car'] * number_of_boxes)
+            func(data_dict, cfg_dict)
+        reprocessed_state = tracker.get_state()
+        tracker.set_state(state)
+        tracker(centers + [1.5, 0, 0], np.tile([4.5, 1.8, 1.5], (2, 1)).astype(np.float32), np.zeros(2), ['Car', 'Car'], 10)
+        for key, value in tracker.get_state().items(): assert np.array_equal(value, reprocessed_state[key]) if isinstance(value, np.ndarray) else value == reprocessed_state[key], f'Expected the same {key} after processing the frame again'
+
+    # with min_iou, a box at the same center but rotated by 90 degrees does not continue the track
+    from algo.non_nn.CVTracker import CVTracker
+    for min_iou, expected_track_id in [(0.0, 0), (0.5, 1)]:
+        tracker = CVTracker(2.0, 2, 1, min_iou=min_iou)
+        tracker(np.zeros((1, 3)), [[4.5, 1.8, 1.5]], [0.0], ['Car'], 0)
+        track_ids = tracker(np.zeros((1, 3)), [[4.5, 1.8, 1.5]], [np.pi / 2], ['Car'], 1)
+        assert track_ids.tolist() == [expected_track_id], f'Expected track id {expected_track_id} with min_iou {min_iou}, got {track_ids}'
@@ -39,3 +39,16 @@ def test_gather_skip_gather_combine():
     assert len(data_dict['global_skip']) == 4 # 2 for skip_1 and 2 for skip_2
     combine(data_dict, cfg_dict, 'combined', ['set_1', 'set_2'])
     assert len(data_dict['combined']) == 6 # 3 for set_1 and 3 for set_2
+
+def test_get_cached_model():
+    from algo.utils import get_cached_model, clear_cached_models, models
+    created = []
+    create_fn = lambda: created.append(object()) or created[-1]
+    # the model is created once per key and survives a new data_dict
+    model = get_cached_model('test_get_cached_model', 1, create_fn)
+    assert get_cached_model('test_get_cached_model', 1, create_fn) is model and len(created) == 1
+    # a new key evicts the previous model of the algo
+    assert get_cached_model('test_get_cached_model', 2, create_fn) is not model and len(created) == 2
+    assert get_cached_model('test_get_cached_model', 1, create_fn) is not model and len(created) == 3
+    clear_cached_models('test_get_cached_model')
+    assert 'test_get_cached_model' not in models
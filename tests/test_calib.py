@@ -11,4 +11,20 @@ def test_handler_validity():
             # check if the handler has a calib_file_extension attribute
             assert handler_calib_file_extension[0] == '.', f"calib_file_extension is not a valid file extension"
             # check if the handler is callable
-            assert callable(handler), f"{handler} is not callable"
\ No newline at end of file
+            assert callable(handler), f"{handler} is not callable"
+
+def test_file_io_shared_composite_transforms():
+    import numpy as np
+    from calib.file_io import FileIO
+    cfg = {'data': {'path': 'examples/data/kitti', 'calib_subdir': 'calib', 'size': 10, 'calib': {'clb_type': 'kitti'}}, 'threads': {'io_sleep': 0.0}}
+    clb_io = FileIO(cfg)
+    calibs = [clb_io[idx][1] for idx in range(len(clb_io))]
+    clb_io.close()
+    # identical calibration files share one dictionary
+    assert calibs[1] is calibs[2]
+    assert len(clb_io.unique_calibs) == len(set(id(calib) for calib in calibs))
+    # composites match the per-frame chain
+    calib = calibs[0]
+    assert calib['Tr_velo_to_pixel'].dtype == np.float32 and calib['Tr_velo_to_pixel'].shape == (3, 4)
+    assert np.allclose(calib['Tr_velo_to_pixel'], calib['P2'] @ calib['R0_rect'] @ calib['Tr_velo_to_cam'], atol=1e-4)
+    assert np.allclose(calib['Tr_cam_to_velo'] @ calib['Tr_velo_to_cam'], np.eye(4), atol=1e-5)
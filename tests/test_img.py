@@ -10,4 +10,111 @@ def test_handler_validity():
             assert isinstance(handler, type), f"{handler} is not a class"
             # handler must have a close method
             assert hasattr(handler, 'close'), f"{handler} does not have a close method"
-            
\ No newline at end of file
+            
+def test_replay_handler():
+    from img.handler_file_replay import Handler
+    cfg = {'data': {'path': 'examples/data/kitti', 'camera_subdir': 'image_2', 'size': 3, 'camera': {'img_type': '.png'}},
+           'sensors': {'camera': {'manufacturer': 'File', 'model': 'Replay', 'serial_number': '0', 'replay_hz': 100, 'replay_loop': False, 'replay_buffer_size': 3}}}
+    handler = Handler(cfg)
+    # frames are emitted every 10 ms
+    assert len(handler.files) == 3
+    assert handler.emit_offsets[1] == 0.01
+    # all frames are read in order as BGR images and the reader stops after the last frame
+    frames = list(handler.reader)
+    assert len(frames) == 3
+    assert frames[0].ndim == 3 and frames[0].shape[2] == 3
+    assert handler.stats['emitted'] == 3
+    assert handler.stats['consumed'] + handler.stats['dropped'] == 3
+    handler.close()
+
+def test_file_io_parallel_reduced_decoding():
+    import time
+    from img.file_io import FileIO
+    cfg = {'data': {'path': 'examples/data/kitti', 'camera_subdir': 'image_2', 'size': 10, 'camera': {'img_type': '.png', 'decode_threads': 4, 'decode_scale': 2}},
+           'threads': {'io_sleep': 0.0}}
+    img_io = FileIO(cfg)
+    # wait for the background decoding to finish
+    for _ in range(100):
+        if len(img_io.data) == len(img_io): break
+        time.sleep(0.05)
+    assert len(img_io.data) == len(img_io)
+    # images are decoded in order and at half resolution
+    for idx in range(len(img_io)):
+        file_abs_path, img_np = img_io[idx]
+        assert file_abs_path == img_io.get_abs_path(idx)
+        full_file_abs_path, full_img_np = img_io.get_full_resolution(idx)
+        assert full_file_abs_path == file_abs_path
+        assert abs(img_np.shape[0] - full_img_np.shape[0] / 2) <= 1 and abs(img_np.shape[1] - full_img_np.shape[1] / 2) <= 1
+        # the full resolution images of the next frames are decoded ahead, only those are kept
+        assert set(img_io.full_resolution_futures.keys()) == set(range(idx, min(idx + img_io.decode_threads + 1, len(img_io))))
+    img_io.close()
+
+def test_file_io_decoded_cache(tmp_path):
+    import time
+    import shutil
+    import numpy as np
+    from img.file_io import FileIO
+    shutil.copytree('examples/data/kitti/image_2', os.path.join(tmp_path, 'image_2'))
+    cfg = {'data': {'path': str(tmp_path), 'camera_subdir': 'image_2', 'size': 10, 'camera': {'img_type': '.png', 'decode_threads': 2, 'decoded_cache': True}},
+           'threads': {'io_sleep': 0.0}}
+    # the first open decodes the images and fills the cache, the second open reads them from the cache
+    for _ in range(2):
+        img_io = FileIO(cfg)
+        for _ in range(100):
+            if len(img_io.data) == len(img_io): break
+            time.sleep(0.05)
+        img_io.close()
+        assert img_io.cache_writer is None and None not in img_io.cache_index
+    assert img_io.cache_frames is not None
+    for idx in range(len(img_io)):
+        file_abs_path, img_np = img_io[idx]
+        # cached frames are returned as writable copies identical to the decoded images
+        assert img_np.flags.writeable
+        assert np.array_equal(img_np, img_io.reader(file_abs_path))
+
+def test_file_io_decoded_cache_16_bit(tmp_path):
+    import time
+    import cv2
+    import numpy as np
+    from img.file_io import FileIO
+    # 16-bit images keep their depth in the cache
+    os.makedirs(os.path.join(tmp_path, 'image_2'))
+    images = [np.random.default_rng(idx).integers(0, 65535, (4, 6, 3), dtype=np.uint16) for idx in range(3)]
+    for idx, image in enumerate(images): cv2.imwrite(os.path.join(tmp_path, 'image_2', f'{idx:06d}.png'), image)
+    cfg = {'data': {'path': str(tmp_path), 'camera_subdir': 'image_2', 'size': 3, 'camera': {'img_type': '.png', 'decoded_cache': True}},
+           'threads': {'io_sleep': 0.0}}
+    for _ in range(2):
+        img_io = FileIO(cfg)
+        for _ in range(100):
+            if len(img_io.data) == len(img_io): break
+            time.sleep(0.05)
+        for idx, image in enumerate(images): assert np.array_equal(img_io[idx][1], image[:, :, ::-1])
+        img_io.close()
+    assert img_io.cache_frames is not None
+
+def test_video_io_seek(tmp_path):
+    import cv2
+    import numpy as np
+    from img.video_io import VideoIO
+    # two videos of 15 frames each, every frame is filled with a value telling its index
+    os.makedirs(os.path.join(tmp_path, 'video'))
+    for video_idx in range(2):
+        writer = cv2.VideoWriter(os.path.join(tmp_path, 'video', f'{video_idx:06d}.mp4'), cv2.VideoWriter_fourcc(*'mp4v'), 10, (64, 48))
+        for frame_idx in range(15): writer.write(np.full((48, 64, 3), (video_idx * 15 + frame_idx) * 8, dtype=np.uint8))
+        writer.release()
+    cfg = {'data': {'path': str(tmp_path), 'camera_subdir': 'video', 'size': 100, 'camera': {'img_type': '.mp4', 'read_ahead': 4}},
+           'threads': {'io_sleep': 0.01}}
+    img_io = VideoIO(cfg)
+    assert len(img_io) == 30
+    # sequential and random access across video boundaries
+    for idx in [0, 1, 2, 14, 15, 29, 3, 20, 20, 7]:
+        file_abs_path, img_np = img_io[idx]
+        assert file_abs_path.endswith(f'{idx // 15:06d}.mp4')
+        assert img_np.shape == (48, 64, 3)
+        assert abs(float(img_np.mean()) - idx * 8) < 4
+    # frames that can not be decoded, e.g. with an overestimated frame count, are skipped instead of stored as empty frames
+    img_io.frame_offsets[-1] += 2
+    img_io.img_count += 2
+    assert img_io[30][1] is None and 30 in img_io.failed_frames and 30 not in img_io.data
+    assert abs(float(img_io[28][1].mean()) - 28 * 8) < 4
+    img_io.close()
@@ -15,4 +15,135 @@ def test_handler_validity():
             # label_file_extension must start with a period
             assert handler.label_file_extension[0] == '.', f"{handler.label_file_extension} is not a valid file extension"
             # check if the handler is callable
-            assert callable(handler.Handler), f"{handler.Handler} is not callable"
\ No newline at end of file
+            assert callable(handler.Handler), f"{handler.Handler} is not callable"
+
+def test_file_io_parsed_cache(tmp_path):
+    import time
+    import shutil
+    import numpy as np
+    from calib.file_io import FileIO as CLB_File_IO
+    from lbl.file_io import FileIO as LBL_File_IO
+    for subdir in ['calib', 'label_2']: shutil.copytree(os.path.join('examples/data/kitti', subdir), os.path.join(tmp_path, subdir))
+    cfg = {'data': {'path': str(tmp_path), 'calib_subdir': 'calib', 'label_subdir': 'label_2', 'size': 10,
+                    'calib': {'clb_type': 'kitti', 'cache_parsed': True}, 'label': {'lbl_type': 'kitti', 'cache_parsed': True}},
+           'threads': {'io_sleep': 0.0}}
+    def read_all(parse_fn=None):
+        clb_io = CLB_File_IO(cfg)
+        lbl_io = LBL_File_IO(cfg, clb_io.__getitem__)
+        # wait for the caches to be written
+        for _ in range(100):
+            if os.path.exists(os.path.join(tmp_path, 'cache', 'calib', 'parsed_kitti.npz')) and os.path.exists(os.path.join(tmp_path, 'cache', 'label_2', 'parsed_kitti.npz')): break
+            time.sleep(0.05)
+        annotations = [lbl_io[idx][1] for idx in range(len(lbl_io))]
+        clb_io.close()
+        lbl_io.close()
+        return annotations
+    parsed_annotations = read_all()
+    # the second open reads the caches, parsing again would fail
+    def fail(*args): raise AssertionError('file parsed again')
+    import lbl.handler_kitti, calib.handler_kitti
+    lbl_handler, clb_handler = lbl.handler_kitti.Handler, calib.handler_kitti.Handler
+    lbl.handler_kitti.Handler, calib.handler_kitti.Handler = fail, fail
+    try: cached_annotations = read_all()
+    finally: lbl.handler_kitti.Handler, calib.handler_kitti.Handler = lbl_handler, clb_handler
+    assert len(cached_annotations) == len(parsed_annotations)
+    from lbl.columnar import ColumnarLabelList
+    for parsed_annotation, cached_annotation in zip(parsed_annotations, cached_annotations):
+        assert isinstance(cached_annotation, ColumnarLabelList) and len(parsed_annotation) == len(cached_annotation)
+        for parsed_label, cached_label in zip(parsed_annotation, cached_annotation):
+            assert parsed_label['class'] == cached_label['class']
+            assert parsed_label['truncation'] == cached_label['truncation']
+            assert np.array_equal(parsed_label['lidar_bbox']['lidar_xyz_center'], cached_label['lidar_bbox']['lidar_xyz_center'])
+
+def test_kitti_handler_batched_parsing(tmp_path):
+    import numpy as np
+    from lbl.handler_kitti import Handler, read_label_array
+    from lbl.columnar import ColumnarLabelList
+    from calib.handler_kitti import Handler as CLB_Handler
+    calib = CLB_Handler('examples/data/kitti/calib/000000.txt')
+    label_path = 'examples/data/kitti/label_2/000000.txt'
+    with open(label_path) as f: lines = [line.split() for line in f.readlines() if len(line.strip()) > 0]
+    labels = Handler(label_path, calib)
+    # the labels are built as columns, without label dictionaries
+    assert isinstance(labels, ColumnarLabelList)
+    assert len(labels) == len(read_label_array(label_path)) == len(lines)
+    # centers match the per-object transform
+    transform_from_image_0_to_lidar = np.linalg.inv(calib['Tr_velo_to_cam'])
+    for label, line in zip(labels, lines):
+        assert label['class'] == line[0]
+        lidar_xyz_center = (transform_from_image_0_to_lidar @ np.array([float(x) for x in line[11:14]] + [1.0]))[:3]
+        lidar_xyz_center[2] += float(line[8]) / 2.0
+        assert np.allclose(label['lidar_bbox']['lidar_xyz_center'], lidar_xyz_center, atol=1e-4)
+        assert label['lidar_bbox']['lidar_xyz_center'].dtype == np.float32
+    # empty label files have no labels
+    empty_label_path = os.path.join(tmp_path, '000000.txt')
+    open(empty_label_path, 'w').close()
+    assert len(Handler(empty_label_path, calib)) == 0
+
+def test_columnar_label_list():
+    import numpy as np
+    from lbl.columnar import ColumnarLabelList
+    from lbl.handler_kitti import Handler
+    from calib.handler_kitti import Handler as CLB_Handler
+    label_list = Handler('examples/data/kitti/label_2/000000.txt', CLB_Handler('examples/data/kitti/calib/000000.txt')).to_label_list()
+    label_list.append({'lidar_cluster': {'point_indices': np.array([0, 1, 2])}})
+    columnar_label_list = ColumnarLabelList.from_label_list(label_list)
+    assert len(columnar_label_list) == len(label_list)
+    # columns hold the bbox of every label, labels without a bbox are flagged
+    assert columnar_label_list.centers.shape == (len(label_list), 3)
+    assert columnar_label_list.has_lidar_bbox.tolist() == ['lidar_bbox' in label for label in label_list]
+    # the dictionary view is equivalent to the original labels
+    for label, columnar_label in zip(label_list, columnar_label_list):
+        assert label.keys() == columnar_label.keys()
+        if 'lidar_bbox' not in label: continue
+        assert label['class'] == columnar_label['class'] and label['truncation'] == columnar_label['truncation']
+        for bbox_type in ['lidar_bbox', 'camera_bbox']:
+            for k, v in label[bbox_type].items(): assert np.allclose(v, columnar_label[bbox_type][k], atol=1e-5)
+    # in-place modifications of a view are reflected in the columns
+    columnar_label_list[0]['lidar_bbox']['lidar_xyz_center'][2] += 1.0
+    assert np.isclose(columnar_label_list.centers[0, 2], label_list[0]['lidar_bbox']['lidar_xyz_center'][2] + 1.0)
+    # assignments to a view and to its bboxes are written back too
+    columnar_label_list[0]['class'] = 'Van'
+    columnar_label_list[0]['lidar_bbox']['lidar_xyz_center'] = np.array([1.0, 2.0, 3.0])
+    columnar_label_list[0]['lidar_bbox']['predicted'] = True
+    for columnar_label in columnar_label_list: columnar_label['visited'] = True
+    assert columnar_label_list.classes[0] == 'Van' and columnar_label_list.centers[0].tolist() == [1.0, 2.0, 3.0] and columnar_label_list.predicted[0]
+    assert not columnar_label_list[0]['camera_bbox']['predicted'] and all(columnar_label['visited'] for columnar_label in columnar_label_list)
+    # masks select labels, batches of boxes are appended at once
+    selected = columnar_label_list[columnar_label_list.has_lidar_bbox]
+    assert len(selected) == len(label_list) - 1
+    # selected labels do not share their extras with the source
+    selected[0]['image_0_bbox2d'].append(0.0)
+    assert len(columnar_label_list[0]['image_0_bbox2d']) == 4
+    selected.extend_boxes(np.zeros((2, 3)), np.ones((2, 3)), np.array([0.1, 0.2]), ['Car', 'Truck'], np.array([0, 1, 0]), scores=np.array([0.9, 0.8]))
+    assert selected.classes[-2:] == ['Car', 'Truck'] and np.allclose(selected.yaws[-2:], [0.1, 0.2])
+    assert selected[-1]['score'] == np.float32(0.8) and selected[-1]['camera_bbox']['rgb_bbox_color'].tolist() == [0, 255, 0]
+    assert len(selected.to_label_list()) == len(selected)
+    # dictionary methods of a view and of its bboxes update the columns
+    columnar_label_list[0].update({'class': 'Truck', 'score': 0.5})
+    columnar_label_list[0]['lidar_bbox'].update(lidar_xyz_extent=np.array([4.0, 2.0, 1.5]))
+    columnar_label_list[0].setdefault('track_id', 7)
+    assert columnar_label_list.classes[0] == 'Truck' and np.isclose(columnar_label_list.scores[0], 0.5)
+    assert columnar_label_list.extents[0].tolist() == [4.0, 2.0, 1.5] and columnar_label_list[0]['track_id'] == 7
+    columnar_label_list[0].pop('score')
+    del columnar_label_list[0]['track_id']
+    assert np.isnan(columnar_label_list.scores[0]) and 'track_id' not in columnar_label_list.extras[0]
+    # removing the camera_bbox of a view clears its column flag
+    del columnar_label_list[0]['camera_bbox']
+    assert not columnar_label_list.has_camera_bbox[0] and columnar_label_list.has_lidar_bbox[0]
+
+def test_columnar_label_list_removal():
+    import numpy as np
+    from lbl.handler_kitti import Handler
+    from calib.handler_kitti import Handler as CLB_Handler
+    columnar_label_list = Handler('examples/data/kitti/label_2/000001.txt', CLB_Handler('examples/data/kitti/calib/000001.txt'))
+    classes, extras, centers = columnar_label_list.classes, list(columnar_label_list.extras), columnar_label_list.centers.copy()
+    # labels are removed in place, the remaining labels keep their order
+    popped = columnar_label_list.pop(0)
+    assert popped['class'] == classes[0] and columnar_label_list.classes == classes[1:]
+    del columnar_label_list[-1]
+    assert columnar_label_list.classes == classes[1:-1] and columnar_label_list.extras == extras[1:-1]
+    columnar_label_list.remove_mask(np.arange(len(columnar_label_list)) % 2 == 0)
+    assert columnar_label_list.classes == classes[1:-1][1::2] and np.array_equal(columnar_label_list.centers, centers[1:-1][1::2])
+    del columnar_label_list[:]
+    assert len(columnar_label_list) == 0 and len(columnar_label_list.centers) == 0
@@ -9,4 +9,32 @@ def test_handler_validity():
             # handler must be a class not a function
             assert isinstance(handler, type), f"{handler} is not a class"
             # handler must have a close method
-            assert hasattr(handler, 'close'), f"{handler} does not have a close method"
\ No newline at end of file
+            assert hasattr(handler, 'close'), f"{handler} does not have a close method"
+
+def test_replay_handler():
+    from pcd.handler_file_replay import Handler
+    cfg = {'data': {'path': 'examples/data/kitti', 'lidar_subdir': 'velodyne', 'size': 3, 'lidar': {'pcd_type': '.bin'}},
+           'sensors': {'lidar': {'manufacturer': 'File', 'model': 'Replay', 'serial_number': '0', 'hostname': 'localhost', 'replay_hz': 100, 'replay_loop': False, 'replay_buffer_size': 3}}}
+    handler = Handler(cfg)
+    # frames are emitted every 10 ms
+    assert len(handler.files) == 3
+    assert handler.emit_offsets[1] == 0.01
+    # all frames are read in order and the reader stops after the last frame
+    frames = list(handler.reader)
+    assert len(frames) == 3
+    assert frames[0].shape[1] == 4
+    assert handler.stats['emitted'] == 3
+    assert handler.stats['consumed'] + handler.stats['dropped'] == 3
+    handler.close()
+
+def test_replay_read_error():
+    import pytest
+    from utils.replay import FileReplay
+    def read_fn(file_abs_path):
+        if file_abs_path == 'b': raise IOError('cannot read b')
+        return file_abs_path
+    replay = FileReplay(['a', 'b', 'c'], read_fn, 100, False, 3, '.')
+    # the frame read before the error is yielded, then the error is raised instead of blocking forever
+    assert next(replay.reader) == 'a'
+    with pytest.raises(IOError): next(replay.reader)
+    replay.close()
@@ -63,4 +63,82 @@ def test_get_fixed_sized_point_cloud():
     number_of_points = 2
     fixed_sized_point_cloud = get_fixed_sized_point_cloud(point_cloud, number_of_points)
     assert fixed_sized_point_cloud.shape == (number_of_points, 3)
-    assert np.allclose(fixed_sized_point_cloud, point_cloud[:number_of_points])
\ No newline at end of file
+    assert np.allclose(fixed_sized_point_cloud, point_cloud[:number_of_points])
+
+def test_points_in_boxes():
+    import open3d as o3d
+    from pcd.utils import points_in_boxes, get_rotation_matrices_from_xyz
+    rng = np.random.default_rng(0)
+    points = rng.uniform(-20, 20, (20000, 4)).astype(np.float32)
+    # overlapping rotated boxes
+    centers = rng.uniform(-15, 15, (20, 3))
+    extents = rng.uniform(1, 8, (20, 3))
+    euler_angles = np.column_stack((rng.uniform(-0.3, 0.3, 20), rng.uniform(-0.3, 0.3, 20), rng.uniform(-np.pi, np.pi, 20)))
+    point_indices, box_offsets = points_in_boxes(points, centers, extents, euler_angles, bev_cell_size=3.0)
+    assert len(box_offsets) == 21
+    # same points as open3d for every box
+    rotation_matrices = get_rotation_matrices_from_xyz(euler_angles)
+    for k in range(20):
+        assert np.allclose(rotation_matrices[k], o3d.geometry.OrientedBoundingBox.get_rotation_matrix_from_xyz(euler_angles[k]))
+        bbox = o3d.geometry.OrientedBoundingBox(centers[k], rotation_matrices[k], extents[k])
+        expected = np.sort(np.asarray(bbox.get_point_indices_within_bounding_box(o3d.utility.Vector3dVector(points[:, :3].astype(np.float64)))))
+        assert np.array_equal(point_indices[box_offsets[k]:box_offsets[k + 1]], expected)
+    # no boxes
+    point_indices, box_offsets = points_in_boxes(points, np.zeros((0, 3)), np.zeros((0, 3)), np.zeros((0, 3)))
+    assert len(point_indices) == 0 and box_offsets.tolist() == [0]
+
+def test_points_in_boxes_degenerate_boxes():
+    from pcd.utils import points_in_boxes, points_in_boxes_per_box
+    rng = np.random.default_rng(0)
+    points = rng.uniform(-20, 20, (5000, 4)).astype(np.float32)
+    centers = np.array([[0, 0, 0], [np.nan, 0, 0], [5, 5, 0], [0, 0, 0]], dtype=np.float32)
+    extents = np.array([[4, 4, 4], [4, 4, 4], [np.inf, 2, 2], [4, 4, 4]], dtype=np.float32)
+    euler_angles = np.array([[0, 0, 0.5], [0, 0, 0], [0, 0, 0], [0, 0, np.nan]], dtype=np.float32)
+    # boxes with non-finite parameters contain no points, the other boxes are not affected
+    point_indices, box_offsets = points_in_boxes(points, centers, extents, euler_angles)
+    expected_indices, expected_offsets = points_in_boxes_per_box(points, centers[:1], extents[:1], euler_angles[:1])
+    assert np.diff(box_offsets).tolist() == [len(expected_indices), 0, 0, 0] and np.array_equal(point_indices, expected_indices)
+    # a huge box would need a huge grid, the boxes are processed one by one instead
+    centers, extents, euler_angles = np.array([[0, 0, 0], [5, 5, 0]]), np.array([[1e9, 1e9, 1e9], [4, 4, 4]]), np.zeros((2, 3))
+    point_indices, box_offsets = points_in_boxes(points, centers, extents, euler_angles)
+    assert box_offsets[1] == len(points) and np.array_equal(point_indices[:len(points)], np.arange(len(points)))
+    expected_indices, expected_offsets = points_in_boxes_per_box(points, centers, extents, euler_angles)
+    assert np.array_equal(point_indices, expected_indices) and np.array_equal(box_offsets, expected_offsets)
+
+def test_get_bev_ious():
+    from pcd.utils import get_bev_ious
+    # identical, half-overlapping, rotated by 45 degrees, and disjoint squares
+    centers_a, extents_a, yaws_a = np.zeros((4, 3)), np.tile([2.0, 2.0, 1.0], (4, 1)), np.zeros(4)
+    centers_b, extents_b, yaws_b = np.array([[0, 0, 0], [1, 0, 0], [0, 0, 0], [5, 0, 0]]), np.tile([2.0, 2.0, 1.0], (4, 1)), np.array([0, 0, np.pi / 4, 0])
+    ious = get_bev_ious(centers_a, extents_a, yaws_a, centers_b, extents_b, yaws_b)
+    assert np.allclose(ious, [1.0, 1 / 3, np.sqrt(2) / 2, 0.0])
+    # the IoU is symmetric
+    assert np.allclose(get_bev_ious(centers_b, extents_b, yaws_b, centers_a, extents_a, yaws_a), ious)
+
+def test_get_cluster_point_indices():
+    from pcd.utils import get_cluster_point_indices
+    cluster_labels = np.array([1, -1, 0, 1, 2, -1, 0, 1], dtype=np.int32)
+    point_indices, cluster_offsets = get_cluster_point_indices(cluster_labels)
+    assert cluster_offsets.tolist() == [0, 2, 5, 6]
+    assert point_indices.tolist() == [2, 6, 0, 3, 7, 4]
+    # only noise
+    point_indices, cluster_offsets = get_cluster_point_indices(np.full(4, -1, dtype=np.int32))
+    assert len(point_indices) == 0 and cluster_offsets.tolist() == [0]
+
+def test_fit_bev_oriented_boxes():
+    from pcd.utils import fit_bev_oriented_boxes
+    # points inside 4.5 x 1.8 x 1.5 boxes with known yaws, including their bev corners
+    rng = np.random.default_rng(0)
+    yaws = np.array([0.0, 0.4, -1.2, 1.5])
+    clusters = []
+    for k, yaw in enumerate(yaws):
+        u, v = rng.uniform(-2.25, 2.25, 50), rng.uniform(-0.9, 0.9, 50)
+        u[:4], v[:4] = [2.25, 2.25, -2.25, -2.25], [0.9, -0.9, 0.9, -0.9]
+        clusters.append(np.column_stack((u * np.cos(yaw) - v * np.sin(yaw) + 10 * k, u * np.sin(yaw) + v * np.cos(yaw) + 20, np.linspace(0, 1.5, 50))))
+    centers, extents, euler_angles = fit_bev_oriented_boxes(np.vstack(clusters), np.arange(len(yaws) + 1) * 50)
+    assert np.allclose(centers, [[10 * k, 20, 0.75] for k in range(len(yaws))], atol=1e-4)
+    assert np.allclose(extents, [[4.5, 1.8, 1.5]] * len(yaws), atol=1e-4)
+    assert np.allclose(euler_angles[:, :2], 0) and np.allclose(euler_angles[:, 2], yaws, atol=1e-4)
+    # pca gives the same yaws up to the sampling of the points
+    _, _, euler_angles = fit_bev_oriented_boxes(np.vstack(clusters), np.arange(len(yaws) + 1) * 50, 'pca')
+    assert np.allclose(euler_angles[:, 2], yaws, atol=0.2)
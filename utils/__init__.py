@@ -0,0 +1,3 @@
+"""
+The utils package contains the helpers that are shared between the packages of the framework (e.g. pcd and img, or calib and lbl).
+"""
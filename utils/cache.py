@@ -0,0 +1,186 @@
+import os
+import json
+import threading
+
+import numpy as np
+
+class ParsedCache:
+    """
+    Class for caching parsed calibration and label files in a binary sidecar file, so that unchanged files are not parsed again when a dataset is reopened.
+
+    Every entry is keyed by the path of the parsed file and is valid as long as the size and modification time of the file, and of the file it depends on
+    (e.g. the calibration file a label file is transformed with), do not change. The cache file is an `.npz` file written with `np.savez` and read with
+    `allow_pickle=False`: the bytes of all the numpy arrays are packed into a single uint8 array and the structure of the entries (dictionaries, lists, scalars,
+    and the index, shape and dtype of each array) is stored as JSON, so loading a cache never executes code. Objects shared between entries
+    (e.g. a calibration shared by many frames) stay shared after loading. Entries containing other objects than the ones above are not written, so other objects
+    (e.g. a ColumnarLabelList) have to be converted to dictionaries of arrays by the caller.
+
+    Args:
+        cache_path (str): Path of the cache file.
+
+    Attributes:
+        cache_path (str): Path of the cache file.
+        entries (dict): Dictionary mapping file paths to tuples containing the signature and the parsed data.
+        lock (threading.Lock): Lock for thread-safe access to the entries.
+        modified (bool): True if entries were added since the cache was loaded.
+
+    Methods:
+        __init__(self, cache_path: str): Initializes the ParsedCache object and loads the cache file if it exists.
+        get_signature(file_path: str): Returns the signature of a file.
+        get(self, file_path: str, dependency_path: str): Returns the cached parsed data of a file.
+        put(self, file_path: str, parsed, dependency_path: str): Adds the parsed data of a file to the cache.
+        save(self): Writes the cache file if it was modified.
+        __encode__(obj, memo: dict, arrays: list): Returns the JSON compatible structure of an object.
+        __decode__(obj, memo: dict, data: np.ndarray, offsets: np.ndarray): Returns the object of a JSON compatible structure.
+
+    """
+    def __init__(self, cache_path: str):
+        self.cache_path = cache_path
+        self.entries = {}
+        self.lock = threading.Lock()
+        self.modified = False
+        if os.path.exists(self.cache_path):
+            # a corrupted or incompatible cache is ignored and rebuilt
+            try:
+                with np.load(self.cache_path, allow_pickle=False) as cache:
+                    index, data, offsets = json.loads(cache['index'].tobytes().decode('utf-8')), cache['data'], cache['offsets']
+                memo = {}
+                self.entries = {file_path: self.__decode__(entry, memo, data, offsets) for file_path, entry in index}
+            except Exception: self.entries = {}
+
+    @staticmethod
+    def get_signature(file_path: str):
+        """
+        Returns the signature of a file, i.e., its size and modification time.
+
+        Args:
+            file_path (str): Path of the file.
+
+        Returns:
+            tuple: Tuple containing the size and the modification time in nanoseconds, or None if the file does not exist.
+
+        """
+        if file_path is None or not os.path.exists(file_path): return None
+        file_stat = os.stat(file_path)
+        return (file_stat.st_size, file_stat.st_mtime_ns)
+
+    def get(self, file_path: str, dependency_path: str = None):
+        """
+        Returns the cached parsed data of a file if neither the file nor its dependency changed.
+
+        Args:
+            file_path (str): Path of the parsed file.
+            dependency_path (str, optional): Path of the file the parsed data depends on. Defaults to None.
+
+        Returns:
+            tuple: Tuple containing True and the parsed data on a cache hit, or False and None on a cache miss.
+
+        """
+        signature = (self.get_signature(file_path), self.get_signature(dependency_path))
+        with self.lock: entry = self.entries.get(file_path, None)
+        if entry is None or entry[0] != signature: return False, None
+        return True, entry[1]
+
+    def put(self, file_path: str, parsed, dependency_path: str = None):
+        """
+        Adds the parsed data of a file to the cache.
+
+        Args:
+            file_path (str): Path of the parsed file.
+            parsed: Parsed data.
+            dependency_path (str, optional): Path of the file the parsed data depends on. Defaults to None.
+
+        """
+        signature = (self.get_signature(file_path), self.get_signature(dependency_path))
+        with self.lock:
+            self.entries[file_path] = (signature, parsed)
+            self.modified = True
+
+    def save(self):
+        """
+        Writes the cache file if it was modified, the file is replaced atomically so that a concurrent reader never sees a partial cache.
+
+        """
+        with self.lock:
+            if not self.modified: return
+            memo, arrays, index = {}, [], []
+            for file_path, entry in self.entries.items():
+                # an entry that cannot be encoded is skipped, the dictionaries and arrays it registered are rolled back
+                memo_count, arrays_count = len(memo), len(arrays)
+                try: index.append([file_path, self.__encode__(entry, memo, arrays)])
+                except TypeError:
+                    for key in [key for key, ref in memo.items() if ref >= memo_count]: del memo[key]
+                    del arrays[arrays_count:]
+            # the arrays are packed into a single byte array, offsets holds the start of each array
+            offsets = np.cumsum([0] + [array.nbytes for array in arrays], dtype=np.int64)
+            data = np.concatenate([np.ascontiguousarray(array).reshape(-1).view(np.uint8) for array in arrays]) if len(arrays) else np.zeros(0, dtype=np.uint8)
+            index = np.frombuffer(json.dumps(index).encode('utf-8'), dtype=np.uint8)
+            os.makedirs(os.path.dirname(self.cache_path), exist_ok=True)
+            with open(self.cache_path + '.tmp', 'wb') as f: np.savez(f, index=index, data=data, offsets=offsets)
+            os.replace(self.cache_path + '.tmp', self.cache_path)
+            self.modified = False
+
+    @staticmethod
+    def __encode__(obj, memo: dict, arrays: list):
+        """
+        Returns the JSON compatible structure of an object, the arrays are appended to arrays and replaced by their index, shape and dtype.
+
+        Args:
+            obj: Object made of None, bools, numbers, strings, numpy arrays and scalars, lists, tuples, and dictionaries.
+            memo (dict): Dictionary mapping the ids of the arrays and dictionaries already encoded to their reference number.
+            arrays (list): List of the arrays already encoded.
+
+        Returns:
+            The JSON compatible structure of the object.
+
+        Raises:
+            TypeError: If the object cannot be stored in the cache.
+
+        """
+        if isinstance(obj, np.generic):
+            if obj.dtype.hasobject: raise TypeError(f'cannot cache {type(obj)}')
+            return {'scalar': obj.item(), 'dtype': obj.dtype.str}
+        if obj is None or isinstance(obj, (bool, int, float, str)): return obj
+        if isinstance(obj, list): return [ParsedCache.__encode__(item, memo, arrays) for item in obj]
+        if isinstance(obj, tuple): return {'tuple': [ParsedCache.__encode__(item, memo, arrays) for item in obj]}
+        # shared arrays and dictionaries are encoded once and referenced afterwards
+        if id(obj) in memo: return {'ref': memo[id(obj)]}
+        if isinstance(obj, np.ndarray):
+            if obj.dtype.hasobject: raise TypeError('cannot cache arrays of objects')
+            memo[id(obj)] = len(memo)
+            arrays.append(obj)
+            return {'id': memo[id(obj)], 'array': [len(arrays) - 1, list(obj.shape), obj.dtype.str]}
+        if isinstance(obj, dict):
+            memo[id(obj)] = len(memo)
+            return {'id': memo[id(obj)], 'dict': [[ParsedCache.__encode__(k, memo, arrays), ParsedCache.__encode__(v, memo, arrays)] for k, v in obj.items()]}
+        raise TypeError(f'cannot cache {type(obj)}')
+
+    @staticmethod
+    def __decode__(obj, memo: dict, data: np.ndarray, offsets: np.ndarray):
+        """
+        Returns the object of a JSON compatible structure returned by __encode__.
+
+        Args:
+            obj: JSON compatible structure.
+            memo (dict): Dictionary mapping the reference numbers to the arrays and dictionaries already decoded.
+            data (np.ndarray): Packed bytes of the arrays.
+            offsets (np.ndarray): Offset of each array in data.
+
+        Returns:
+            The decoded object.
+
+        """
+        if isinstance(obj, list): return [ParsedCache.__decode__(item, memo, data, offsets) for item in obj]
+        if not isinstance(obj, dict): return obj
+        if 'scalar' in obj: return np.dtype(obj['dtype']).type(obj['scalar'])
+        if 'tuple' in obj: return tuple(ParsedCache.__decode__(item, memo, data, offsets) for item in obj['tuple'])
+        if 'ref' in obj: return memo[obj['ref']]
+        if 'array' in obj:
+            array_index, shape, dtype = obj['array']
+            # the array is copied out of the packed bytes, so it is writable and does not keep them alive
+            array = data[offsets[array_index]:offsets[array_index + 1]].view(np.dtype(dtype)).reshape(shape).copy()
+            memo[obj['id']] = array
+            return array
+        output = memo[obj['id']] = {}
+        for k, v in obj['dict']: output[ParsedCache.__decode__(k, memo, data, offsets)] = ParsedCache.__decode__(v, memo, data, offsets)
+        return output
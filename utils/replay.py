@@ -0,0 +1,136 @@
+import os
+import time
+import threading
+import collections
+
+import numpy as np
+
+class FileReplay:
+    """
+    A class that replays files from disk as if they were streamed by a live sensor, it is shared by the file replay handlers of the pcd and img packages.
+
+    The files are emitted by a background (daemon) thread either at a fixed rate or at their original timestamps (`replay_hz: 0`, falling back to 10 Hz if all timestamps are identical).
+    Emitted frames are pushed into a bounded buffer; if the consumer is not fast enough, the oldest frames are dropped just like a sensor dropping packets.
+
+    The original timestamps are read from a `timestamps.txt` file (one timestamp per line, either in seconds or in `YYYY-MM-DD HH:MM:SS.fffffffff` format)
+    located in the directory of the files or, if it is not present, from the modification times of the files.
+
+    Args:
+        files (list): List of absolute paths of the replayed files, in emission order.
+        read_fn (callable): Function that reads a file given its absolute path and returns the frame.
+        replay_hz (float): Rate at which the files are emitted, 0 to use their original timestamps.
+        replay_loop (bool): True to restart the replay after the last file.
+        buffer_size (int): Number of frames buffered before the oldest one is dropped.
+        timestamps_dir (str): Directory of the optional `timestamps.txt` file.
+
+    Attributes:
+        files (list): List of absolute paths of the replayed files.
+        emit_offsets (numpy.ndarray): Emission time of each file in seconds relative to the start of the replay.
+        stats (dict): Replay statistics, i.e., number of emitted, consumed and dropped frames, and consumer latencies in seconds.
+        error (Exception): Exception raised while reading a file, it stops the replay and is raised by the reader.
+        reader (generator): Generator that yields the frames, it blocks until the next frame is emitted.
+    """
+    def __init__(self, files: list, read_fn, replay_hz: float, replay_loop: bool, buffer_size: int, timestamps_dir: str):
+        self.files = files
+        self.read_fn = read_fn
+        self.replay_hz = replay_hz
+        self.replay_loop = replay_loop
+        self.emit_offsets = self.__get_emit_offsets__(timestamps_dir)
+
+        # Bounded buffer shared between the emitting thread and the reader
+        self.buffer = collections.deque(maxlen=max(1, buffer_size))
+        self.buffer_condition = threading.Condition()
+        self.stats = {'emitted': 0, 'consumed': 0, 'dropped': 0, 'latencies': collections.deque(maxlen=1000)}
+        self.emitting_done = False
+        self.error = None
+        self.stop = threading.Event()
+
+        # Start emitting frames, the thread does not keep the interpreter alive if close is not called
+        threading.Thread(target=self.__emit_fn__, daemon=True).start()
+        self.reader = self.__get_reader__()
+
+    def __get_emit_offsets__(self, timestamps_dir: str):
+        """
+        Computes the emission time of each file relative to the start of the replay.
+
+        Args:
+            timestamps_dir (str): Directory of the optional `timestamps.txt` file.
+
+        Returns:
+            numpy.ndarray: Emission offsets in seconds.
+        """
+        if self.replay_hz > 0: return np.arange(len(self.files), dtype=np.float64) / self.replay_hz
+
+        timestamps_path = os.path.join(timestamps_dir, 'timestamps.txt')
+        if os.path.exists(timestamps_path):
+            with open(timestamps_path) as f: lines = [line.strip() for line in f.readlines() if len(line.strip()) > 0]
+            try: timestamps = np.array([float(line) for line in lines], dtype=np.float64)
+            except ValueError: timestamps = np.array([np.datetime64(line.replace(' ', 'T'), 'ns') for line in lines]).astype(np.int64) / 1e9
+            timestamps = timestamps[:len(self.files)]
+        else:
+            timestamps = np.array([os.path.getmtime(file) for file in self.files], dtype=np.float64)
+        emit_offsets = timestamps - timestamps[0]
+        # identical timestamps (e.g. files copied at once) carry no timing information, fall back to 10 Hz
+        if len(emit_offsets) > 1 and emit_offsets[-1] <= 0: emit_offsets = np.arange(len(self.files), dtype=np.float64) / 10.0
+        return emit_offsets
+
+    def __emit_fn__(self):
+        """
+        Emits the frames at their scheduled times into the bounded buffer, dropping the oldest frame if the buffer is full.
+        """
+        try:
+            while not self.stop.is_set():
+                start_time = time.perf_counter()
+                for file_abs_path, emit_offset in zip(self.files, self.emit_offsets):
+                    # wait until the frame is due, the wait is interrupted if the replay is closed
+                    delay = start_time + emit_offset - time.perf_counter()
+                    if delay > 0 and self.stop.wait(delay): break
+                    if self.stop.is_set(): break
+                    frame = self.read_fn(file_abs_path)
+                    with self.buffer_condition:
+                        if len(self.buffer) == self.buffer.maxlen: self.stats['dropped'] += 1
+                        self.buffer.append((time.perf_counter(), frame))
+                        self.stats['emitted'] += 1
+                        self.buffer_condition.notify()
+                if not self.replay_loop: break
+                # keep the sensor period between the last and the first frame of consecutive loops
+                if len(self.emit_offsets) > 1: self.stop.wait(float(np.mean(np.diff(self.emit_offsets))))
+        except Exception as e:
+            # the error is raised by the reader once the frames emitted before it are consumed
+            self.error = e
+        finally:
+            # the reader must never wait for frames that will not come
+            with self.buffer_condition:
+                self.emitting_done = True
+                self.buffer_condition.notify_all()
+
+    def __get_reader__(self):
+        """
+        Generator function that yields the frames, it blocks until the next frame is emitted.
+
+        Yields:
+            The next frame.
+
+        Raises:
+            Exception: The exception raised while reading a file, once the frames emitted before it are consumed.
+        """
+        while True:
+            with self.buffer_condition:
+                while len(self.buffer) == 0 and not self.emitting_done: self.buffer_condition.wait()
+                if len(self.buffer) == 0:
+                    if self.error is not None: raise self.error
+                    return
+                emit_time, frame = self.buffer.popleft()
+                self.stats['consumed'] += 1
+                self.stats['latencies'].append(time.perf_counter() - emit_time)
+            yield frame
+
+    def close(self):
+        """
+        Stops the replay and closes the reader.
+        """
+        self.stop.set()
+        with self.buffer_condition:
+            self.emitting_done = True
+            self.buffer_condition.notify_all()
+        self.reader.close()